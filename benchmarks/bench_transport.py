@@ -0,0 +1,160 @@
+"""
+元数据传输基准测试：以 _get_json 的并发方式（线程池同时发出大量小请求）比较
+
+  requests.get        每个请求单独建立连接（未设置传输时的行为）
+  HTTP/1.1 连接池      PooledTransport
+  HTTP/2              Http2Transport（需要安装 httpx[http2]）
+
+默认对本地缓存服务器 (cache_server) 测试。服务器为每个新连接模拟握手延迟 (--connect-latency)、
+为每个请求模拟往返延迟 (--rtt)，以近似访问远程镜像的情况。本地缓存服务器只支持 HTTP/1.1，
+因此 HTTP/2 传输在本地会协商为 HTTP/1.1；使用 --base-url 可以对支持 HTTP/2 的真实镜像测试。
+
+    python benchmarks/bench_transport.py --requests 200 --concurrency 16
+    python benchmarks/bench_transport.py --base-url https://bmclapi2.bangbang93.com --requests 60
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.cache_server import CacheServer, CacheRequestHandler  # noqa: E402
+from src.store import MetadataCache  # noqa: E402
+from src.transport import HTTP2_AVAILABLE, PooledTransport, Http2Transport  # noqa: E402
+
+
+# 对真实镜像测试时请求的路径（BMCL API 的 Forge 版本列表）
+REMOTE_PATHS = [f"/forge/minecraft/1.{minor}.{patch}" for minor, patch in (
+    (12, 2), (16, 5), (18, 2), (19, 2), (19, 4), (20, 1), (20, 2), (20, 4), (20, 6), (21, 1),
+)]
+
+
+class BenchServer(CacheServer):
+    """为每个新连接和每个请求加入模拟延迟的缓存服务器，并记录建立的连接数"""
+
+    def __init__(self, address, store_dir, metadata_cache, connect_latency, rtt):
+        super().__init__(address, store_dir, metadata_cache, upstream=None)
+        self.RequestHandlerClass = self._handler_class(rtt)
+        self.connect_latency = connect_latency
+        self.connections = 0
+        self._count_lock = threading.Lock()
+
+    @staticmethod
+    def _handler_class(rtt):
+        class Handler(CacheRequestHandler):
+            def handle_one_request(self):
+                time.sleep(rtt)
+                super().handle_one_request()
+        return Handler
+
+    def process_request_thread(self, request, client_address):
+        with self._count_lock:
+            self.connections += 1
+        time.sleep(self.connect_latency)
+        super().process_request_thread(request, client_address)
+
+
+class _PerRequestTransport:
+    NAME = "requests.get"
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        return requests.get(url, headers=headers, params=params, timeout=timeout)
+
+    def close(self):
+        pass
+
+
+def _run(transport, urls, concurrency):
+    def fetch(url):
+        start = time.perf_counter()
+        response = transport.get(url, headers={"User-Agent": "bench"}, timeout=30)
+        response.raise_for_status()
+        response.json()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(fetch, urls))
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def _start_local_server(root, entries, connect_latency, rtt):
+    metadata_cache = MetadataCache(os.path.join(root, "metadata"))
+    for i in range(entries):
+        # 与 BMCL 的 Forge 版本列表大小相近的 JSON
+        metadata_cache.put(f"/bench/{i}", [
+            {"version": f"47.{i}.{build}", "mcversion": "1.20.1", "build": build, "modified": "2023-07-01T00:00:00Z"}
+            for build in range(20)
+        ])
+    server = BenchServer(("127.0.0.1", 0), os.path.join(root, "store"), metadata_cache, connect_latency, rtt)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="比较元数据请求的传输方式")
+    parser.add_argument("--requests", type=int, default=200, help="每种传输发出的请求数 (默认: 200)")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发线程数 (默认: 16)")
+    parser.add_argument("--connect-latency", type=float, default=0.03, help="本地服务器模拟的建立连接延迟，秒 (默认: 0.03)")
+    parser.add_argument("--rtt", type=float, default=0.01, help="本地服务器模拟的请求往返延迟，秒 (默认: 0.01)")
+    parser.add_argument("--base-url", help="对指定的镜像测试，而不是本地缓存服务器")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as root:
+        server = None
+        if args.base_url:
+            base = args.base_url.rstrip('/')
+            urls = [base + REMOTE_PATHS[i % len(REMOTE_PATHS)] for i in range(args.requests)]
+        else:
+            server = _start_local_server(root, 50, args.connect_latency, args.rtt)
+            base = f"http://127.0.0.1:{server.server_address[1]}"
+            urls = [f"{base}/bench/{i % 50}" for i in range(args.requests)]
+
+        transports = [_PerRequestTransport(), PooledTransport(args.concurrency)]
+        if HTTP2_AVAILABLE:
+            transports.append(Http2Transport(args.concurrency))
+        else:
+            print("未安装 httpx[http2]，跳过 HTTP/2 传输", file=sys.stderr)
+
+        results = []
+        for transport in transports:
+            # 先发一个请求预热（DNS、连接池），不计入结果
+            transport.get(urls[0], timeout=30).raise_for_status()
+            connections_before = server.connections if server else None
+            total, latencies = _run(transport, urls, args.concurrency)
+            transport.close()
+            results.append({
+                "transport": transport.NAME,
+                "total": round(total, 3),
+                "requests_per_second": round(len(urls) / total, 1),
+                "p50_ms": round(statistics.median(latencies) * 1000, 1),
+                "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+                "connections": server.connections - connections_before if server else None,
+            })
+        if server:
+            server.shutdown()
+            server.server_close()
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=1))
+        return 0
+    print(f"{args.requests} 个请求, 并发 {args.concurrency}, 目标 {base}")
+    print(f"{'传输':<16}{'总耗时(s)':>10}{'请求/秒':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'新建连接':>10}")
+    for result in results:
+        connections = "-" if result["connections"] is None else result["connections"]
+        print(f"{result['transport']:<16}{result['total']:>10}{result['requests_per_second']:>10}"
+              f"{result['p50_ms']:>10}{result['p95_ms']:>10}{connections:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,14 @@
 import sys
-from src.main_app import MinecraftServerDownloaderApp
-from PyQt5.QtWidgets import QApplication
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # 带参数运行时进入命令行模式，无需图形界面
+        from src.cli import main
+        sys.exit(main(sys.argv[1:]))
+
+    from src.main_app import MinecraftServerDownloaderApp
+    from PyQt5.QtWidgets import QApplication
+
     app = QApplication(sys.argv)
     window = MinecraftServerDownloaderApp()
     window.show()
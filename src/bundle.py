@@ -0,0 +1,194 @@
+import os
+import json
+import mmap
+import time
+import shutil
+import hashlib
+import zipfile
+import threading
+
+from src.paths import cache_path, unique_tmp_path
+from src.zipindex import ZipFormatError, read_directory, read_entry, data_offset
+
+
+BUNDLE_MANIFEST = "bundle.json"
+BUNDLE_SUFFIX = ".mcbundle"
+BUNDLE_VERSION = 1
+
+
+def export_bundle(path, backends, store=None, artifact_filter=None, log=None):
+    """
+    把各后端的元数据缓存和本地仓库中选定的文件导出为一个离线资源包，返回 (元数据条目数, 文件数)。
+
+    资源包是一个 zip 文件：
+      bundle.json                      资源包说明和文件索引（来源链接、SHA256、大小、压缩包元数据）
+      metadata/<后端>/<缓存相对路径>     元数据 JSON，Deflate 压缩
+      artifacts/<仓库相对路径>           服务端核心，不压缩存储，导入后可以直接从映射的内存中复制
+    artifact_filter(键, 索引记录) 返回 False 的文件不导出；store 为 None 时只导出元数据。
+    """
+    log = log or (lambda message: None)
+    artifacts = {}
+    metadata_count = 0
+    tmp_path = unique_tmp_path(path)
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as bundle:
+        for name, backend in backends.items():
+            for key, file_path in backend.metadata_cache.keys():
+                bundle.write(file_path, f"metadata/{name}/{key}")
+                metadata_count += 1
+        if store is not None:
+            for key, entry in store.entries():
+                if artifact_filter and not artifact_filter(key, entry):
+                    continue
+                file_path = os.path.join(store.store_dir, entry["file_name"])
+                if not os.path.isfile(file_path):
+                    continue
+                arcname = "artifacts/" + entry["file_name"].replace(os.sep, '/')
+                bundle.write(file_path, arcname, compress_type=zipfile.ZIP_STORED)
+                artifacts[entry["url"]] = dict(entry, key=key, path=arcname)
+        manifest = {
+            "version": BUNDLE_VERSION,
+            "created_at": int(time.time()),
+            "metadata": metadata_count,
+            "artifacts": artifacts,
+        }
+        bundle.writestr(BUNDLE_MANIFEST, json.dumps(manifest, ensure_ascii=False, indent=1))
+    os.replace(tmp_path, path)
+    log(f"资源包已导出: {path} (元数据 {metadata_count} 条, 文件 {len(artifacts)} 个, "
+        f"{os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+    return metadata_count, len(artifacts)
+
+
+class MetadataBundle:
+    """
+    以 mmap 打开的离线资源包。打开时只解析一次 zip 中央目录作为索引，
+    之后查询元数据只需解压对应的一个小条目，获取文件则直接从映射的内存中按块复制，
+    不需要先解压整个资源包。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._view = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            _, entries = read_directory(self._view)
+            self._entries = {entry.name: entry for entry in entries}
+            manifest_entry = self._entries.get(BUNDLE_MANIFEST)
+            if manifest_entry is None:
+                raise ZipFormatError("缺少 bundle.json")
+            self.manifest = json.loads(read_entry(self._view, manifest_entry, limit=None))
+        except (ValueError, OSError):
+            self.close()
+            raise
+        self.artifacts = self.manifest.get("artifacts", {})
+
+    def close(self):
+        view = getattr(self, "_view", None)
+        if view is not None:
+            view.close()
+        self._file.close()
+
+    def get_json(self, namespace, key):
+        """按 后端名称 和 元数据缓存的相对路径 查询，不存在时返回 None"""
+        entry = self._entries.get(f"metadata/{namespace}/{key}")
+        if entry is None:
+            return None
+        try:
+            return json.loads(read_entry(self._view, entry, limit=None))
+        except (ValueError, ZipFormatError):
+            return None
+
+    def artifact(self, url):
+        return self.artifacts.get(url)
+
+    def copy_artifact(self, url, dest_path, chunk_size=1024 * 1024, progress=None):
+        """把资源包中 url 对应的文件复制到 dest_path（先写 .part 再改名），并校验 SHA256"""
+        info = self.artifacts[url]
+        entry = self._entries[info["path"]]
+        if entry.method != zipfile.ZIP_STORED:
+            raise ZipFormatError(f"{entry.name} 不是以存储方式保存的")
+        start = data_offset(self._view, entry)
+        end = start + entry.compressed_size
+        digest = hashlib.sha256()
+        part_path = f"{dest_path}.part"
+        with open(part_path, 'wb') as f:
+            for position in range(start, end, chunk_size):
+                chunk = self._view[position:min(position + chunk_size, end)]
+                f.write(chunk)
+                digest.update(chunk)
+                if progress:
+                    progress(position + len(chunk) - start, entry.compressed_size)
+        if info.get("sha256") and digest.hexdigest() != info["sha256"].lower():
+            os.remove(part_path)
+            raise ValueError(f"资源包中的 {info['file_name']} SHA256 校验失败")
+        os.replace(part_path, dest_path)
+
+
+class BundleSet:
+    """
+    已导入的离线资源包集合，保存在 bundle_dir 下（*.mcbundle）。
+    按导入时间从新到旧查询，较新的资源包优先。
+    """
+
+    def __init__(self, bundle_dir=None):
+        self.bundle_dir = bundle_dir or cache_path("bundles")
+        self._lock = threading.Lock()
+        self._bundles = []
+        self.reload()
+
+    def reload(self):
+        bundles = []
+        if os.path.isdir(self.bundle_dir):
+            names = [name for name in os.listdir(self.bundle_dir) if name.endswith(BUNDLE_SUFFIX)]
+            paths = sorted((os.path.join(self.bundle_dir, name) for name in names), key=os.path.getmtime, reverse=True)
+            for path in paths:
+                try:
+                    bundles.append(MetadataBundle(path))
+                except (ValueError, OSError):
+                    continue
+        with self._lock:
+            old, self._bundles = self._bundles, bundles
+        for bundle in old:
+            bundle.close()
+
+    def __bool__(self):
+        return bool(self._bundles)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._bundles))
+
+    def get_json(self, namespace, key):
+        for bundle in self:
+            data = bundle.get_json(namespace, key)
+            if data is not None:
+                return data
+        return None
+
+    def find_artifact(self, url):
+        """返回包含 url 对应文件的资源包，没有时返回 None"""
+        for bundle in self:
+            if bundle.artifact(url):
+                return bundle
+        return None
+
+    def import_bundle(self, path):
+        """检查资源包后复制到 bundle_dir，返回导入后的 MetadataBundle"""
+        MetadataBundle(path).close()
+        os.makedirs(self.bundle_dir, exist_ok=True)
+        name = os.path.basename(path)
+        if not name.endswith(BUNDLE_SUFFIX):
+            name += BUNDLE_SUFFIX
+        target = os.path.join(self.bundle_dir, name)
+        tmp_path = unique_tmp_path(target)
+        shutil.copyfile(path, tmp_path)
+        # 先关闭已映射的同名资源包（Windows 上无法替换仍被映射的文件）
+        with self._lock:
+            old, self._bundles = self._bundles, []
+        for bundle in old:
+            bundle.close()
+        os.replace(tmp_path, target)
+        self.reload()
+        for bundle in self:
+            if os.path.abspath(bundle.path) == os.path.abspath(target):
+                return bundle
+        return None
@@ -0,0 +1,228 @@
+import os
+import re
+import mimetypes
+import threading
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, unquote
+
+from src.store import StoreIndex, MetadataCache
+
+
+# 元数据中需要改写为本地缓存服务器地址的上游站点
+UPSTREAM_ORIGINS = (
+    "https://bmclapi2.bangbang93.com",
+    "https://launchermeta.mojang.com",
+    "https://launcher.mojang.com",
+    "https://piston-meta.mojang.com",
+    "https://piston-data.mojang.com",
+)
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class CacheServer(ThreadingHTTPServer):
+    """
+    局域网缓存服务器：以与 BMCL API 相同的 URL 结构，提供本地 server_cores 仓库中的文件
+    和元数据缓存，其他节点只需把 BMCLAPIDownloader.BASE_URL 指向本服务器即可。
+
+    查找顺序：
+    1. 仓库索引中记录的文件（按原始下载链接的路径匹配），支持 Range 请求，使用 sendfile 零拷贝发送
+    2. 元数据缓存中的 JSON（其中的上游地址会被改写为本服务器地址）
+    3. 未命中时，若设置了 upstream，则 302 重定向到上游镜像
+    """
+    daemon_threads = True
+
+    def __init__(self, address, store_dir=None, metadata_cache=None, upstream=None,
+                 rewrite_urls=True):
+        super().__init__(address, CacheRequestHandler)
+        self.store = StoreIndex(store_dir)
+        self.metadata_cache = metadata_cache or MetadataCache()
+        self.upstream = upstream.rstrip('/') if upstream else None
+        self.rewrite_urls = rewrite_urls
+        self._artifact_paths = {}
+        self._index_mtime = None
+        self._index_lock = threading.Lock()
+
+    def _refresh_artifacts(self):
+        """仓库索引文件变化时重建 URL 路径 -> 本地文件 的映射"""
+        try:
+            mtime = os.path.getmtime(self.store.index_path)
+        except OSError:
+            mtime = None
+        with self._index_lock:
+            if mtime == self._index_mtime:
+                return
+            self.store.load()
+            self._artifact_paths = {
+                urlsplit(entry["url"]).path: os.path.join(self.store.store_dir, entry["file_name"])
+                for _, entry in self.store.entries()
+            }
+            self._index_mtime = mtime
+
+    def find_artifact(self, path):
+        self._refresh_artifacts()
+        file_path = self._artifact_paths.get(path)
+        if file_path and os.path.isfile(file_path):
+            return file_path
+        return None
+
+
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MinecraftServerjarCache/1.0"
+    # 响应头和响应体分两次写出；关闭 Nagle 算法，避免复用的连接上第二次写入等待客户端的延迟确认（约 40ms）
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def _own_origin(self):
+        host = self.headers.get("Host") or "%s:%s" % self.server.server_address[:2]
+        return f"http://{host}"
+
+    def _handle(self, send_body):
+        parts = urlsplit(self.path)
+        path = unquote(parts.path)
+
+        file_path = self.server.find_artifact(path)
+        if file_path:
+            return self._send_file(file_path, send_body)
+
+        cache_path = self.server.metadata_cache.path_for(self.path)
+        if cache_path and os.path.isfile(cache_path):
+            return self._send_metadata(cache_path, send_body)
+
+        if self.server.upstream:
+            self.send_response(302)
+            self.send_header("Location", self.server.upstream + self.path)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_error(404, "Not cached")
+
+    def _send_metadata(self, cache_path, send_body):
+        stat = os.stat(cache_path)
+        etag = f'"{int(stat.st_mtime)}-{stat.st_size}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        with open(cache_path, 'rb') as f:
+            body = f.read()
+        if self.server.rewrite_urls:
+            origin = self._own_origin().encode()
+            for upstream in UPSTREAM_ORIGINS:
+                body = body.replace(upstream.encode(), origin)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _parse_range(self, size):
+        """解析单个 Range 请求头，返回 (start, end)；多段 Range 按完整文件处理"""
+        header = self.headers.get("Range")
+        if not header:
+            return None
+        match = _RANGE_RE.match(header.strip())
+        if not match:
+            return None
+        start, end = match.groups()
+        if not start and not end:
+            return None
+        if not start:
+            # bytes=-N 表示最后 N 个字节
+            length = int(end)
+            if length == 0:
+                return False
+            return max(0, size - length), size - 1
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+        if start >= size or start > end:
+            return False
+        return start, end
+
+    def _send_file(self, file_path, send_body):
+        stat = os.stat(file_path)
+        size = stat.st_size
+        etag = f'"{int(stat.st_mtime)}-{size}"'
+        byte_range = self._parse_range(size)
+        if self.headers.get("If-Range") not in (None, etag):
+            byte_range = None
+
+        if byte_range is False:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if byte_range:
+            start, end = byte_range
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            start, end = 0, size - 1
+            self.send_response(200)
+
+        length = end - start + 1 if size else 0
+        content_type = mimetypes.guess_type(file_path)[0] or "application/java-archive"
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(stat.st_mtime, usegmt=True))
+        self.end_headers()
+        if not send_body or length == 0:
+            return
+
+        with open(file_path, 'rb') as f:
+            self._copy_range(f, start, length)
+
+    def _copy_range(self, f, offset, length):
+        """优先使用 os.sendfile 零拷贝发送，不支持时退回普通读写"""
+        if hasattr(os, "sendfile"):
+            try:
+                sock_fd = self.connection.fileno()
+                while length > 0:
+                    sent = os.sendfile(sock_fd, f.fileno(), offset, min(length, 1 << 30))
+                    if sent == 0:
+                        break
+                    offset += sent
+                    length -= sent
+                return
+            except (OSError, ValueError) as e:
+                # 套接字已关闭等情况直接放弃，其他情况退回普通读写
+                if isinstance(e, (BrokenPipeError, ConnectionResetError)):
+                    return
+        f.seek(offset)
+        while length > 0:
+            chunk = f.read(min(length, 1024 * 1024))
+            if not chunk:
+                break
+            self.wfile.write(chunk)
+            length -= len(chunk)
+
+
+def serve(host="0.0.0.0", port=8080, store_dir=None, metadata_dir=None, upstream=None,
+          log=print):
+    """启动缓存服务器并阻塞运行"""
+    metadata_cache = MetadataCache(metadata_dir) if metadata_dir else None
+    server = CacheServer((host, port), store_dir, metadata_cache, upstream)
+    log(f"缓存服务器已启动: http://{host}:{server.server_address[1]} (仓库: {server.store.store_dir})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,94 @@
+import threading
+from contextlib import contextmanager
+
+
+class DownloadCancelled(Exception):
+    """操作已被取消"""
+
+
+class CancellationToken:
+    """
+    协作式的取消与暂停标记。下载循环在每个数据块之间、元数据请求在发出前后调用 check()：
+    - 已取消时抛出 DownloadCancelled，调用方就地关闭连接和文件后返回；
+    - 已暂停时阻塞，直到继续或取消。暂停期间连接和已写入的偏移都保持不变。
+    resumable 为 True 表示这次取消是因为程序退出，任务应在下次启动时继续。
+    parent 不为 None 时，父标记的取消和暂停同样作用于这个标记（用于只取消一次操作中的一部分请求）。
+    """
+
+    def __init__(self, parent=None):
+        self._condition = threading.Condition()
+        self._cancelled = False
+        self._paused = False
+        self.resumable = False
+        self.parent = parent
+
+    @property
+    def cancelled(self):
+        return self._cancelled or (self.parent is not None and self.parent.cancelled)
+
+    @property
+    def paused(self):
+        return self._paused
+
+    def cancel(self, resumable=False):
+        with self._condition:
+            self._cancelled = True
+            self.resumable = resumable
+            self._condition.notify_all()
+
+    def pause(self):
+        with self._condition:
+            self._paused = True
+
+    def resume(self):
+        with self._condition:
+            self._paused = False
+            self._condition.notify_all()
+
+    def check(self):
+        """已取消时抛出 DownloadCancelled；暂停时等待继续"""
+        if self.parent is not None:
+            self.parent.check()
+        with self._condition:
+            while self._paused and not self._cancelled:
+                self._condition.wait()
+            if self._cancelled:
+                raise DownloadCancelled()
+
+
+# 当前线程正在执行的操作所属的标记。元数据请求分布在很多层调用中，
+# 通过作用域传递标记，而不必修改每个查询方法的参数。
+_local = threading.local()
+
+
+@contextmanager
+def cancellation_scope(token):
+    """在 with 块中，当前线程发出的元数据请求都受 token 控制"""
+    previous = getattr(_local, "token", None)
+    _local.token = token
+    try:
+        yield token
+    finally:
+        _local.token = previous
+
+
+def current_token():
+    return getattr(_local, "token", None)
+
+
+def check_cancelled():
+    token = current_token()
+    if token is not None:
+        token.check()
+
+
+def bind_token(fn, token=None):
+    """把调用者当前的标记（或指定的 token）带到线程池中执行的函数里"""
+    token = token or current_token()
+    if token is None:
+        return fn
+
+    def bound(*args, **kwargs):
+        with cancellation_scope(token):
+            return fn(*args, **kwargs)
+    return bound
@@ -0,0 +1,302 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from PyQt5.QtCore import Qt
+
+from src.downloader import BACKEND_REGISTRY, UnifiedDownloader
+from src.paths import data_path
+from src.store import StoreIndex
+
+
+def _split(value):
+    return [item.strip() for item in value.split(',') if item.strip()] if value else None
+
+
+def _cmd_sync(args, downloader):
+    from src.sync import MirrorSync
+
+    sync = MirrorSync(
+        downloader,
+        store_dir=args.dest,
+        sources=_split(args.sources),
+        mc_versions=_split(args.versions),
+        channels=_split(args.channels),
+        server_types=_split(args.types),
+        latest_n=args.latest,
+        max_workers=args.workers,
+        delta=not args.no_delta,
+    )
+    stats = sync.run(resume=not args.restart)
+    return 1 if stats["failed"] else 0
+
+
+def _cmd_serve(args, downloader):
+    from src.cache_server import serve
+
+    upstream = None if args.no_upstream or downloader.offline else downloader.bmcl_downloader.BASE_URL
+    serve(args.host, args.port, args.store, args.metadata, upstream, log=downloader.signals.log_message.emit)
+    return 0
+
+
+def _parse_watch_target(value):
+    parts = value.split(':')
+    if len(parts) != 3:
+        raise argparse.ArgumentTypeError("监视目标格式应为 来源:服务端类型:MC版本，例如 bmcl:forge:1.20.1")
+    source = parts[0].lower()
+    if source not in BACKEND_REGISTRY:
+        raise argparse.ArgumentTypeError(f"未知的下载源 {parts[0]}，可用: {', '.join(BACKEND_REGISTRY)}")
+    return source, parts[1].lower(), parts[2]
+
+
+def _print_event(event):
+    print(json.dumps(event, ensure_ascii=False), flush=True)
+
+
+def _cmd_watch(args, downloader):
+    from src.watcher import BuildWatcher
+
+    callback = _print_event if args.json else None
+    watcher = BuildWatcher(
+        downloader,
+        args.target,
+        interval=args.interval,
+        download_dir=args.download_dir,
+        callback=callback,
+    )
+    try:
+        watcher.run(iterations=1 if args.once else None)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _cmd_install(args, downloader):
+    from src.installer import ServerInstaller
+
+    installer = ServerInstaller(downloader, java=args.java)
+    return 0 if installer.install(args.type, args.mc, args.jar, args.dir, args.core) else 1
+
+
+def _cmd_export_bundle(args, downloader):
+    from src.bundle import export_bundle
+    from src.store import StoreIndex
+
+    sources, types, versions = _split(args.sources), _split(args.types), _split(args.versions)
+
+    def wanted(key, entry):
+        source, server_type, mc_version, _ = key.split('/', 3)
+        return ((not sources or source in sources) and (not types or server_type in types)
+                and (not versions or mc_version in versions))
+
+    store = None if args.no_artifacts else StoreIndex(args.store)
+    export_bundle(args.output, downloader.backends, store, wanted, log=downloader.signals.log_message.emit)
+    return 0
+
+
+def _cmd_import_bundle(args, downloader):
+    if args.list:
+        for bundle in downloader.bundles:
+            manifest = bundle.manifest
+            print(f"{os.path.basename(bundle.path)}\t元数据 {manifest.get('metadata', 0)} 条\t"
+                  f"文件 {len(bundle.artifacts)} 个\t导出于 {time.strftime('%Y-%m-%d %H:%M', time.localtime(manifest.get('created_at', 0)))}")
+        return 0
+    if not args.path:
+        downloader.signals.log_message.emit("请指定要导入的资源包")
+        return 2
+    try:
+        bundle = downloader.bundles.import_bundle(args.path)
+    except (ValueError, OSError) as e:
+        downloader.signals.log_message.emit(f"无法导入资源包: {e}")
+        return 1
+    downloader.signals.log_message.emit(
+        f"资源包已导入: {bundle.path} (元数据 {bundle.manifest.get('metadata', 0)} 条, 文件 {len(bundle.artifacts)} 个)"
+    )
+    return 0
+
+
+def _cmd_java(args, downloader):
+    runtimes = downloader.java_runtimes
+    if args.list:
+        for runtime in runtimes.list_installed():
+            print(f"Java{runtime['major']}\t{runtime['release']}\t{runtime['java']}")
+        return 0
+    if args.available:
+        for java_version in downloader.get_java_versions():
+            print(java_version)
+        return 0
+    if args.major is None and not args.mc:
+        downloader.signals.log_message.emit("请指定 --mc 或 --major")
+        return 2
+    major = args.major if args.major is not None else downloader.required_java(args.mc)
+    if args.mc:
+        downloader.signals.log_message.emit(f"Minecraft {args.mc} 需要 Java {major}")
+    java = runtimes.ensure(major)
+    if not java:
+        return 1
+    print(java)
+    return 0
+
+
+def _cmd_resolve(args, downloader):
+    from src.libraries import LibraryStore, DependencyResolver
+
+    store = LibraryStore(args.libraries, mirror_base=downloader.bmcl_downloader.BASE_URL,
+                         signals=downloader.signals, max_workers=args.workers, offline=downloader.offline)
+    resolver = DependencyResolver(downloader, store)
+    for mc_version in _split(args.vanilla) or []:
+        resolver.add_vanilla(mc_version)
+    for spec in _split(args.fabric) or []:
+        mc_version, _, loader_version = spec.partition(':')
+        resolver.add_fabric(mc_version, loader_version)
+    return 1 if resolver.fetch_missing() else 0
+
+
+def _cmd_download(args, downloader):
+    # 先继续上次中断的下载
+    if not args.no_resume:
+        downloader.resume_pending()
+    if args.source:
+        downloader.switch_source(args.source)
+    if args.race:
+        downloader.set_resolution_mode(downloader.MODE_RACE)
+        success = downloader.download_racing(args.mc, args.type, args.core, args.dest)
+    else:
+        info = downloader.get_download_info(args.mc, args.type, args.core)
+        if not info:
+            downloader.signals.log_message.emit("未能获取到下载链接")
+            return 1
+        success = downloader.download_file(
+            info["url"], args.dest, info["file_name"], info.get("sha256"), info.get("source"),
+            index_key=StoreIndex.make_key(info["source"], args.type, args.mc, args.core),
+        )
+    return 0 if success else 1
+
+
+def _cmd_resume(args, downloader):
+    if args.list:
+        for job in downloader.journal.recent(args.limit):
+            progress = f"{job.offset}/{job.total_size}" if job.total_size else str(job.offset)
+            print(f"{job.id}\t{job.status}\t{progress}\t{job.dest_folder}/{job.file_name}")
+        return 0
+    _, failed = downloader.resume_pending()
+    return 1 if failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="run.py", description="Minecraft 服务端核心下载器（命令行模式）")
+    parser.add_argument("--stats", action="store_true", help="结束时输出元数据请求计数")
+    parser.add_argument("--offline", action="store_true", help="离线模式：只使用本地缓存和已导入的资源包，不访问网络")
+    parser.add_argument("--http1", action="store_true", help="元数据请求不使用 HTTP/2，只使用 HTTP/1.1 连接池")
+    subparsers = parser.add_subparsers(dest="command")
+
+    download_parser = subparsers.add_parser("download", help="下载一个服务端核心")
+    download_parser.add_argument("--mc", required=True, help="Minecraft 版本")
+    download_parser.add_argument("--type", required=True, help="服务端类型")
+    download_parser.add_argument("--core", required=True, help="核心版本")
+    download_parser.add_argument("--dest", default=data_path("server_cores"), help="下载目录 (默认: 数据目录下的 server_cores)")
+    download_parser.add_argument("--source", help="下载源名称，例如 bmcl、msl、all")
+    download_parser.add_argument("--race", action="store_true", help="竞速模式：并发询问所有镜像并选择最快的下载")
+    download_parser.add_argument("--no-resume", action="store_true", help="不自动继续上次未完成的下载")
+    download_parser.set_defaults(handler=_cmd_download)
+
+    resume_parser = subparsers.add_parser("resume", help="继续任务日志中未完成的下载")
+    resume_parser.add_argument("--list", action="store_true", help="只列出最近的下载任务，不继续下载")
+    resume_parser.add_argument("--limit", type=int, default=20, help="--list 时列出的任务数 (默认: 20)")
+    resume_parser.set_defaults(handler=_cmd_resume)
+
+    sync_parser = subparsers.add_parser("sync", help="将镜像源上的服务端核心同步到本地仓库")
+    sync_parser.add_argument("--dest", default=data_path("server_cores"), help="本地仓库目录 (默认: 数据目录下的 server_cores)")
+    sync_parser.add_argument("--sources", default="bmcl,msl", help="同步的镜像源，逗号分隔 (默认: bmcl,msl)")
+    sync_parser.add_argument("--versions", help="只同步这些 Minecraft 版本，逗号分隔")
+    sync_parser.add_argument("--channels", help="同步这些版本通道 (release,snapshot,old_beta,old_alpha)，逗号分隔 (默认: release)")
+    sync_parser.add_argument("--types", help="只同步这些服务端类型，逗号分隔")
+    sync_parser.add_argument("--latest", type=int, default=1, help="每个组合保留最新的 N 个核心版本 (默认: 1)")
+    sync_parser.add_argument("--workers", type=int, default=4, help="并发下载数 (默认: 4)")
+    sync_parser.add_argument("--restart", action="store_true", help="忽略检查点，从头开始同步")
+    sync_parser.add_argument("--no-delta", action="store_true", help="不以上一个构建为基础增量更新，总是完整下载")
+    sync_parser.set_defaults(handler=_cmd_sync)
+
+    serve_parser = subparsers.add_parser("serve", help="以 BMCL API 的 URL 结构在局域网内提供本地缓存")
+    serve_parser.add_argument("--host", default="0.0.0.0", help="监听地址 (默认: 0.0.0.0)")
+    serve_parser.add_argument("--port", type=int, default=8080, help="监听端口 (默认: 8080)")
+    serve_parser.add_argument("--store", default=data_path("server_cores"), help="本地仓库目录 (默认: 数据目录下的 server_cores)")
+    serve_parser.add_argument("--metadata", help="元数据缓存目录 (默认: 数据目录下的 cache/metadata)")
+    serve_parser.add_argument("--no-upstream", action="store_true", help="缓存未命中时返回 404，而不是重定向到 BMCL API")
+    serve_parser.set_defaults(handler=_cmd_serve)
+
+    watch_parser = subparsers.add_parser("watch", help="监视新构建并输出变化事件")
+    watch_parser.add_argument("--target", type=_parse_watch_target, action="append", required=True,
+                              help="监视目标 来源:服务端类型:MC版本，可重复指定，例如 bmcl:neoforge:1.20.4")
+    watch_parser.add_argument("--interval", type=int, default=600, help="轮询间隔秒数 (默认: 600)")
+    watch_parser.add_argument("--once", action="store_true", help="只轮询一次")
+    watch_parser.add_argument("--json", action="store_true", help="以 JSON Lines 格式向标准输出写出事件")
+    watch_parser.add_argument("--download-dir", help="发现新构建时自动下载到该目录")
+    watch_parser.set_defaults(handler=_cmd_watch)
+
+    install_parser = subparsers.add_parser("install", help="将已下载的服务端核心处理为可运行的服务端目录")
+    install_parser.add_argument("--type", required=True, help="服务端类型，例如 forge、neoforge、fabric、vanilla")
+    install_parser.add_argument("--mc", required=True, help="Minecraft 版本")
+    install_parser.add_argument("--jar", required=True, help="已下载的安装器或服务端 jar")
+    install_parser.add_argument("--dir", required=True, help="服务端目录")
+    install_parser.add_argument("--core", help="核心版本（Fabric 为加载器版本），用于预取依赖库")
+    install_parser.add_argument("--java", default="java",
+                                help="用于运行安装器的 java 可执行文件；auto 表示按 MC 版本自动准备共享的 Java 运行时 (默认: java)")
+    install_parser.set_defaults(handler=_cmd_install)
+
+    java_parser = subparsers.add_parser("java", help="准备运行指定 Minecraft 版本所需的 Java 运行时")
+    java_parser.add_argument("--mc", help="Minecraft 版本，按其要求选择 Java 主版本")
+    java_parser.add_argument("--major", type=int, help="直接指定 Java 主版本，例如 17")
+    java_parser.add_argument("--list", action="store_true", help="列出已安装的运行时")
+    java_parser.add_argument("--available", action="store_true", help="列出可下载的 Java 版本")
+    java_parser.set_defaults(handler=_cmd_java)
+
+    export_parser = subparsers.add_parser("export-bundle", help="把元数据缓存和本地仓库中的文件导出为离线资源包")
+    export_parser.add_argument("output", help="输出文件，例如 mirror.mcbundle")
+    export_parser.add_argument("--store", default=data_path("server_cores"), help="本地仓库目录 (默认: 数据目录下的 server_cores)")
+    export_parser.add_argument("--sources", help="只导出这些来源的文件，逗号分隔")
+    export_parser.add_argument("--types", help="只导出这些服务端类型的文件，逗号分隔")
+    export_parser.add_argument("--versions", help="只导出这些 Minecraft 版本的文件，逗号分隔")
+    export_parser.add_argument("--no-artifacts", action="store_true", help="只导出元数据")
+    export_parser.set_defaults(handler=_cmd_export_bundle)
+
+    import_parser = subparsers.add_parser("import-bundle", help="导入离线资源包，之后无网络时从中读取元数据和文件")
+    import_parser.add_argument("path", nargs="?", help="资源包文件")
+    import_parser.add_argument("--list", action="store_true", help="列出已导入的资源包")
+    import_parser.set_defaults(handler=_cmd_import_bundle)
+
+    resolve_parser = subparsers.add_parser("resolve", help="解析并下载原版 / Fabric 服务端的依赖库到共享仓库")
+    resolve_parser.add_argument("--vanilla", help="原版 Minecraft 版本，逗号分隔")
+    resolve_parser.add_argument("--fabric", help="Fabric 的 MC版本:加载器版本，逗号分隔，例如 1.20.1:0.15.0")
+    resolve_parser.add_argument("--libraries", default=data_path("libraries"), help="共享库仓库目录 (默认: 数据目录下的 libraries)")
+    resolve_parser.add_argument("--workers", type=int, default=8, help="并发下载数 (默认: 8)")
+    resolve_parser.set_defaults(handler=_cmd_resolve)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not getattr(args, "handler", None):
+        parser.print_help()
+        return 2
+
+    downloader = UnifiedDownloader(offline=args.offline, http2=False if args.http1 else None)
+    # 日志写到标准错误，标准输出留给 --json 等机器可读的输出。
+    # 命令行没有 Qt 事件循环，必须直接连接：否则线程池中发出的日志会排队等待永远不会运行的事件循环而丢失
+    downloader.signals.log_message.connect(lambda message: print(message, file=sys.stderr, flush=True),
+                                           Qt.DirectConnection)
+    try:
+        return args.handler(args, downloader)
+    finally:
+        if args.stats:
+            stats = downloader.request_stats()
+            print(f"元数据请求 ({downloader.transport.NAME}): 实际发出 {stats['requests']} 个, "
+                  f"共享并发请求 {stats['shared']} 次, 短期缓存命中 {stats['memo_hits']} 次", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
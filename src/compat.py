@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.cancellation import bind_token
+from src.paths import cache_path, unique_tmp_path
+
+
+class CompatibilityMatrix:
+    """
+    服务端类型兼容性矩阵：Minecraft 版本 -> 在镜像上至少有一个构建的服务端类型。
+
+    每一列（一个服务端类型）来自镜像上真实的版本索引（由后端的 compat_index 提供），
+    与刷新时间一起保存在磁盘上。启动后直接从磁盘读取，服务端类型下拉框无需等待网络；
+    每列单独判断是否过期，只重新获取过期的列（索引本身以条件请求获取，未变化时服务器返回 304）。
+    """
+    REFRESH_INTERVAL = 6 * 3600
+
+    def __init__(self, backend, path=None):
+        self.backend = backend
+        self.server_types = list(backend.CAPABILITIES.server_types or ())
+        self.path = path or cache_path("compat", f"{backend.NAME}.json")
+        self._lock = threading.Lock()
+        self._columns = {}
+        self._rows = None
+        self.load()
+
+    def load(self):
+        """从磁盘读取矩阵，文件不存在或损坏时使用空矩阵"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                columns = json.load(f).get("columns", {})
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self._columns = columns
+            self._rows = None
+
+    def save(self):
+        with self._lock:
+            data = {"columns": self._columns}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = unique_tmp_path(self.path)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def stale_types(self):
+        now = time.time()
+        with self._lock:
+            return [
+                server_type for server_type in self.server_types
+                if now - self._columns.get(server_type, {}).get("refreshed_at", 0) > self.REFRESH_INTERVAL
+            ]
+
+    def refresh(self, force=False):
+        """并发重新获取过期（force 时为全部）的列，返回内容有变化的服务端类型"""
+        server_types = list(self.server_types) if force else self.stale_types()
+        if not server_types:
+            return []
+        with ThreadPoolExecutor(max_workers=len(server_types)) as executor:
+            futures = [executor.submit(bind_token(self.backend.compat_index), server_type) for server_type in server_types]
+            indexes = [self._column_result(future) for future in futures]
+
+        changed = []
+        now = int(time.time())
+        with self._lock:
+            for server_type, versions in zip(server_types, indexes):
+                if versions is None:
+                    # 获取失败时保留旧的列，下次再试
+                    continue
+                versions = sorted(set(versions))
+                if self._columns.get(server_type, {}).get("versions") != versions:
+                    changed.append(server_type)
+                self._columns[server_type] = {"versions": versions, "refreshed_at": now}
+            if changed:
+                self._rows = None
+        self.save()
+        return changed
+
+    @staticmethod
+    def _column_result(future):
+        """单列的获取结果；出错或被取消时为 None，该列保留旧数据"""
+        try:
+            return future.result()
+        except Exception:
+            return None
+
+    def _build_rows(self):
+        rows = {}
+        for server_type, column in self._columns.items():
+            for mc_version in column.get("versions", []):
+                rows.setdefault(mc_version, set()).add(server_type)
+        return rows
+
+    def lookup(self, mc_version):
+        """
+        返回 {服务端类型: 是否有构建}，只包含矩阵中已有数据的列；
+        没有数据的列由调用者自行判断。
+        """
+        with self._lock:
+            if self._rows is None:
+                self._rows = self._build_rows()
+            present = self._rows.get(mc_version, set())
+            return {server_type: server_type in present for server_type in self.server_types if server_type in self._columns}
@@ -0,0 +1,218 @@
+import os
+import zipfile
+
+import requests
+
+from src.cancellation import check_cancelled
+from src.store import sha256_of_file
+from src.zipindex import (
+    LOCAL_HEADER_SIZE, TAIL_SIZE, ZipFormatError, find_directory, parse_central_directory, read_central_directory,
+    entry_spans, local_header_matches,
+)
+
+
+class DeltaUnavailable(Exception):
+    """无法（或不值得）增量更新，调用者应改为完整下载"""
+
+
+class JarDelta:
+    """
+    相邻构建之间的增量更新：以本地仓库中上一个构建的 jar 为基础，
+    只通过 Range 请求获取新构建中发生变化的条目，再按新构建的布局重新组装并校验。
+
+    1. 用一个后缀 Range 请求取回远端压缩包末尾，解析目录结尾记录和中央目录；
+    2. 名称、压缩方式、CRC32、大小、修改时间和所占字节数都相同的条目，
+       直接从本地 jar 复制原始字节（本地文件头 + 压缩数据）；
+    3. 其余条目的字节范围合并相邻的区间后按 Range 请求下载；
+    4. 组装完成后用 SHA256 确认与远端文件完全一致；没有 SHA256 时检查文件大小、中央目录
+       与远端一致，每个本地文件头与中央目录相符，并逐条目校验 CRC32。
+
+    JarDelta 持有一个 HTTP 会话，用完后调用 close()，或作为上下文管理器使用。
+
+    服务器不支持 Range、需要下载的部分超过 MAX_FETCH_RATIO 或校验失败时抛出 DeltaUnavailable。
+    """
+    # 两个需要下载的区间相隔不超过这么多字节时合并为一个请求
+    MERGE_GAP = 64 * 1024
+    # 需要下载的字节数超过新文件的这个比例时，直接完整下载更划算
+    MAX_FETCH_RATIO = 0.7
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, headers=None, timeout=30, log=None):
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        self.log = log or (lambda message: None)
+        self.session = requests.Session()
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _get_range(self, url, range_header):
+        headers = dict(self.headers)
+        headers['Range'] = range_header
+        response = self.session.get(url, headers=headers, stream=True, timeout=self.timeout)
+        if response.status_code != 206:
+            response.close()
+            raise DeltaUnavailable(f"服务器不支持 Range 请求 (HTTP {response.status_code})")
+        return response
+
+    @staticmethod
+    def _content_range(response):
+        """解析 Content-Range，返回 (起始位置, 完整大小)"""
+        value = response.headers.get('Content-Range', '')
+        try:
+            span, total = value.split(' ', 1)[1].split('/')
+            return int(span.split('-')[0]), int(total)
+        except (IndexError, ValueError):
+            raise DeltaUnavailable(f"无法解析 Content-Range: {value!r}")
+
+    def _read_range(self, url, start, end):
+        """下载 [start, end) 范围的字节"""
+        response = self._get_range(url, f"bytes={start}-{end - 1}")
+        try:
+            if self._content_range(response)[0] != start:
+                raise DeltaUnavailable("服务器返回的范围与请求不符")
+            data = bytearray()
+            for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                check_cancelled()
+                data += chunk
+        finally:
+            response.close()
+        if len(data) != end - start:
+            raise DeltaUnavailable("Range 响应长度与请求不符")
+        return bytes(data)
+
+    def remote_directory(self, url):
+        """获取远端压缩包的 (文件大小, 中央目录起始位置, 中央目录及之后的原始字节, ZipEntry 列表)"""
+        response = self._get_range(url, f"bytes=-{TAIL_SIZE}")
+        try:
+            tail_offset, total = self._content_range(response)
+            tail = response.content
+        finally:
+            response.close()
+        try:
+            directory, _ = find_directory(tail, tail_offset)
+        except ZipFormatError as e:
+            raise DeltaUnavailable(str(e))
+        if directory.cd_offset < tail_offset:
+            # 中央目录比末尾的数据更长，补齐前面的部分
+            tail = self._read_range(url, directory.cd_offset, tail_offset) + tail
+            tail_offset = directory.cd_offset
+        start = directory.cd_offset - tail_offset
+        try:
+            entries = parse_central_directory(tail[start:start + directory.cd_size], directory.entry_count)
+        except ZipFormatError as e:
+            raise DeltaUnavailable(str(e))
+        return total, directory.cd_offset, tail[start:], entries
+
+    @staticmethod
+    def _same_entry(old, new, old_length, new_length):
+        return (
+            old.method == new.method and old.crc32 == new.crc32
+            and old.compressed_size == new.compressed_size and old.file_size == new.file_size
+            and old.dos_time == new.dos_time and old.dos_date == new.dos_date
+            and old_length == new_length
+        )
+
+    def plan(self, base_path, new_entries, cd_offset):
+        """
+        比对两个中央目录，返回 (可复用的 [(本地起始, 新位置, 长度)], 需要下载的 [(起始, 结束)])。
+        需要下载的区间已合并。
+        """
+        base_directory, base_entries = read_central_directory(base_path)
+        base_spans = {entry.name: (entry, start, end) for entry, start, end in entry_spans(base_entries, base_directory.cd_offset)}
+
+        reuse = []
+        fetch = []
+        spans = entry_spans(new_entries, cd_offset)
+        if spans and spans[0][1] > 0:
+            # 第一个条目之前的数据（例如自解压头），总是下载
+            fetch.append((0, spans[0][1]))
+        for entry, start, end in spans:
+            base = base_spans.get(entry.name)
+            if base and self._same_entry(base[0], entry, base[2] - base[1], end - start):
+                reuse.append((base[1], start, end - start))
+            else:
+                fetch.append((start, end))
+
+        merged = []
+        for start, end in fetch:
+            if merged and start - merged[-1][1] <= self.MERGE_GAP:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return reuse, merged
+
+    @staticmethod
+    def _verify(path, expected_sha256, total, entries):
+        """
+        确认组装结果与远端文件一致。有 SHA256 时直接比较；
+        没有时检查大小和中央目录与远端相同、各本地文件头与中央目录相符，并校验每个条目的 CRC32。
+        """
+        if expected_sha256:
+            return sha256_of_file(path) == expected_sha256.lower()
+        try:
+            if os.path.getsize(path) != total:
+                return False
+            _, local_entries = read_central_directory(path)
+            if local_entries != entries:
+                return False
+            with open(path, 'rb') as f:
+                for entry in entries:
+                    f.seek(entry.header_offset)
+                    if not local_header_matches(f.read(LOCAL_HEADER_SIZE), entry):
+                        return False
+            with zipfile.ZipFile(path) as archive:
+                return archive.testzip() is None
+        except (zipfile.BadZipFile, ZipFormatError, OSError):
+            return False
+
+    def update(self, url, base_path, dest_path, expected_sha256=None):
+        """
+        以 base_path 为基础组装 url 指向的新构建并写入 dest_path，返回本次下载的字节数。
+        失败时不会留下 dest_path，并抛出 DeltaUnavailable。
+        """
+        try:
+            total, cd_offset, directory_bytes, entries = self.remote_directory(url)
+            reuse, fetch = self.plan(base_path, entries, cd_offset)
+        except (OSError, ZipFormatError, requests.exceptions.RequestException) as e:
+            raise DeltaUnavailable(str(e))
+
+        fetch_bytes = sum(end - start for start, end in fetch)
+        if fetch_bytes > total * self.MAX_FETCH_RATIO:
+            raise DeltaUnavailable(f"变化的内容过多 ({fetch_bytes / max(total, 1):.0%})")
+
+        part_path = f"{dest_path}.delta"
+        try:
+            with open(base_path, 'rb') as base, open(part_path, 'wb') as out:
+                out.truncate(total)
+                for base_start, start, length in reuse:
+                    base.seek(base_start)
+                    out.seek(start)
+                    out.write(base.read(length))
+                for start, end in fetch:
+                    check_cancelled()
+                    out.seek(start)
+                    out.write(self._read_range(url, start, end))
+                out.seek(cd_offset)
+                out.write(directory_bytes)
+            if not self._verify(part_path, expected_sha256, total, entries):
+                raise DeltaUnavailable("组装后的文件校验失败")
+            os.replace(part_path, dest_path)
+        except (OSError, requests.exceptions.RequestException) as e:
+            raise DeltaUnavailable(str(e))
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+        downloaded = fetch_bytes + len(directory_bytes)
+        self.log(
+            f"增量更新 {os.path.basename(dest_path)}: 复用 {len(reuse)} 个条目, "
+            f"下载 {downloaded / 1024 / 1024:.2f} MB / {total / 1024 / 1024:.2f} MB"
+        )
+        return downloaded
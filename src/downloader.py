@@ -5,6 +5,28 @@ from PyQt5.QtCore import pyqtSignal, QObject
 import re 
 from bs4 import BeautifulSoup
 import uuid
+from collections import namedtuple
+import time
+import hashlib
+import threading
+from concurrent.futures import (
+    ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
+)
+from urllib.parse import urlencode
+import xml.etree.ElementTree as ElementTree
+from src.store import MetadataCache, StoreIndex, sha256_of_file
+from src.zipindex import ZipFormatError, inspect_archive
+from src.java import JavaRuntimeManager, required_java_major, parse_java_major
+from src.bundle import BundleSet
+from src.jobs import JobJournal
+from src.compat import CompatibilityMatrix
+from src.locking import lock_for
+from src.transport import OfflineError, create_transport
+from src.paths import data_path, cache_path, unique_tmp_path
+from src.cancellation import (
+    CancellationToken, DownloadCancelled, cancellation_scope, current_token, check_cancelled, bind_token
+)
+from src.versions import RELEASE, SNAPSHOT, CHANNELS, VersionManifest, guess_channel
 
 class DownloaderSignals(QObject):
     """
@@ -17,22 +39,442 @@ class DownloaderSignals(QObject):
     server_types_loaded = pyqtSignal(list) # 服务端类型加载完成信号
     core_versions_loaded = pyqtSignal(list) # 核心版本加载完成信号
 
-class BMCLAPIDownloader:
-    BASE_URL = "https://bmclapi2.bangbang93.com"
+# 后端能力描述：
+# server_types     支持的服务端类型，None 表示由 get_server_types 动态提供（与 Minecraft 版本无关）
+# min_mc_version   支持的最低 Minecraft 版本（只对正式版版本号生效），None 表示不限
+# max_mc_version   支持的最高 Minecraft 版本，None 表示不限
+# hashes           下载信息中能提供的校验算法，例如 ("sha1",)
+# range_requests   下载链接是否支持 Range 请求
+# channels         能提供的 Minecraft 版本通道，例如 ("release", "snapshot")
+BackendCapabilities = namedtuple(
+    "BackendCapabilities",
+    ["server_types", "min_mc_version", "max_mc_version", "hashes", "range_requests", "channels"],
+    defaults=(None, None, None, (), True, (RELEASE,)),
+)
+
+# 下载完成后需要检查压缩包结构的文件类型
+ARCHIVE_SUFFIXES = (".jar", ".zip")
+
+
+class DownloadResult(namedtuple("DownloadResult", ["success", "path", "archive"])):
+    """
+    下载结果，布尔值即是否成功（可以像以前的 True / False 一样直接判断）。
+    archive 为下载后检查 jar / zip 得到的元数据 (inspect_archive)，其他文件或没有检查时为 None。
+    """
+    __slots__ = ()
+
+    def __bool__(self):
+        return self.success
+
+# 已注册的镜像后端，名称 -> 类；UnifiedDownloader 按注册顺序（即优先级）使用
+BACKEND_REGISTRY = {}
+
+
+def register_backend(cls):
+    """类装饰器：把镜像后端加入 BACKEND_REGISTRY"""
+    BACKEND_REGISTRY[cls.NAME] = cls
+    return cls
+
+
+class SingleFlight:
+    """
+    会话级的请求去重 (single-flight)：
+    同一个键（URL + 查询参数）同时只有一个请求在进行，其他并发调用者等待并共享同一个解析结果；
+    成功的结果在 MEMO_TTL 秒内继续复用，覆盖 "先列出核心版本、再解析下载链接" 这种紧接着的重复请求。
+    共享的结果是同一个对象，调用者不应修改它。
+    stats 记录实际发出的请求数 (requests)、搭便车的并发调用数 (shared) 和命中短期缓存的次数 (memo_hits)。
+    """
+    MEMO_TTL = 30
+    MEMO_LIMIT = 256
+
+    def __init__(self, memo_ttl=MEMO_TTL):
+        self.memo_ttl = memo_ttl
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._memo = {}
+        self.stats = {"requests": 0, "shared": 0, "memo_hits": 0}
+
+    def do(self, key, fn):
+        """执行 fn()，同一 key 的并发调用只执行一次"""
+        with self._lock:
+            memo = self._memo.get(key)
+            if memo and memo[0] > time.monotonic():
+                self.stats["memo_hits"] += 1
+                return memo[1]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"event": threading.Event(), "result": None}
+                self.stats["requests"] += 1
+            else:
+                self.stats["shared"] += 1
+        if not leader:
+            # 等待期间仍然响应取消
+            while not call["event"].wait(0.2):
+                check_cancelled()
+            return call["result"]
+        try:
+            call["result"] = fn()
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call["result"] is not None and self.memo_ttl > 0:
+                    self._remember(key, call["result"])
+            call["event"].set()
+        return call["result"]
+
+    def _remember(self, key, result):
+        now = time.monotonic()
+        if len(self._memo) >= self.MEMO_LIMIT:
+            self._memo = {k: v for k, v in self._memo.items() if v[0] > now}
+        self._memo[key] = (now + self.memo_ttl, result)
+
+    def forget(self, key=None):
+        """丢弃短期缓存（key 为 None 时全部丢弃）"""
+        with self._lock:
+            if key is None:
+                self._memo.clear()
+            else:
+                self._memo.pop(key, None)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+# 所有镜像后端共用的请求去重层
+REQUEST_FLIGHTS = SingleFlight()
 
-    def __init__(self):
+
+def _neoforge_mc_version(version):
+    """NeoForge 版本号对应的 Minecraft 版本，例如 20.4.80 -> 1.20.4，21.0.0-beta -> 1.21"""
+    parts = version.split('.')
+    if len(parts) < 2 or not parts[0].isdigit() or not parts[1].isdigit():
+        return None
+    return f"1.{parts[0]}" if parts[1] == "0" else f"1.{parts[0]}.{parts[1]}"
+
+
+def _release_version_key(version):
+    """正式版版本号转换为可比较的元组，快照等其他格式返回 None"""
+    if not version or not re.match(r'^\d+(\.\d+)*$', version):
+        return None
+    return tuple(int(part) for part in version.split('.'))
+
+
+class MirrorBackend:
+    """
+    镜像后端基类。每个后端声明自己的名称和能力 (CAPABILITIES)，
+    并以统一的参数顺序实现以下查询：
+      get_minecraft_versions(channel="release")
+      get_server_types(mc_version=None)
+      get_core_versions(mc_version, server_type)
+      get_download_url_and_filename(mc_version, server_type, core_version_info)
+    """
+    NAME = ""
+    DISPLAY_NAME = ""
+    BASE_URL = ""
+    TIMEOUT = 10
+    CAPABILITIES = BackendCapabilities()
+    # 元数据缓存目录（相对数据目录下的 cache/），None 表示使用默认目录（与 BMCL API 的 URL 结构一致，供本地缓存服务器使用）
+    METADATA_CACHE_DIR = None
+    # Mojang 格式版本清单相对 BASE_URL 的路径，None 表示该后端没有版本清单
+    MANIFEST_PATH = None
+    # 解析后的版本清单在这段时间（秒）内直接复用
+    MANIFEST_TTL = 600
+    # 下载时每写入这么多字节记录一次断点
+    CHECKPOINT_BYTES = 1024 * 1024
+    # 已导入的离线资源包 (BundleSet)，由 UnifiedDownloader 设置；offline 为 True 时不访问网络
+    bundles = None
+    offline = False
+    # 元数据请求共用的传输（HTTP/2 或 HTTP/1.1 连接池），由 UnifiedDownloader 设置；None 时每个请求单独建立连接
+    transport = None
+
+    def __init__(self, metadata_cache=None):
         self.signals = DownloaderSignals()
+        self.headers = {}
+        # 获取到的元数据会同时写入缓存，供本地缓存服务器 (cache_server) 和条件请求使用
+        if metadata_cache is None:
+            metadata_cache = MetadataCache(cache_path(self.METADATA_CACHE_DIR) if self.METADATA_CACHE_DIR else None)
+        self.metadata_cache = metadata_cache
+        self._manifest = None
+        self._manifest_loaded_at = 0
+        self._manifest_lock = threading.Lock()
+
+    def supports(self, server_type=None, mc_version=None):
+        """根据能力描述判断是否支持指定的服务端类型和 Minecraft 版本"""
+        capabilities = self.CAPABILITIES
+        if server_type and capabilities.server_types is not None and server_type not in capabilities.server_types:
+            return False
+        version_key = _release_version_key(mc_version)
+        if version_key is not None:
+            if capabilities.min_mc_version and version_key < _release_version_key(capabilities.min_mc_version):
+                return False
+            if capabilities.max_mc_version and version_key > _release_version_key(capabilities.max_mc_version):
+                return False
+        return True
 
-    def _get_json(self, url):
-        """通用方法，用于发送GET请求并返回JSON数据"""
+    def _get_json(self, url, params=None):
+        """
+        通用方法，用于发送GET请求并返回JSON数据。
+        相同 URL 的并发调用通过 REQUEST_FLIGHTS 共享同一个请求和解析结果。
+        """
+        cache_key = url if not params else f"{url}?{urlencode(params)}"
+        # 当前操作已取消时不再发出新的请求，也不把结果交给调用者
+        check_cancelled()
+        data = REQUEST_FLIGHTS.do(cache_key, lambda: self._fetch_json(url, params, cache_key))
+        check_cancelled()
+        return data
+
+    def _fetch_json(self, url, params, cache_key):
+        """
+        实际发送请求。缓存中有 ETag / Last-Modified 时发送条件请求，服务器返回 304 时直接使用缓存。
+        """
+        if self.offline:
+            data = self._offline_json(cache_key)
+            if data is None:
+                self.signals.log_message.emit(f"离线模式下没有缓存: {url}")
+            return data
+        headers = dict(self.headers)
+        validators = self.metadata_cache.get_validators(cache_key)
+        if validators.get("etag"):
+            headers['If-None-Match'] = validators["etag"]
+        if validators.get("last_modified"):
+            headers['If-Modified-Since'] = validators["last_modified"]
         try:
-            response = requests.get(url, timeout=10) 
+            response = self._http_get(url, headers, params)
+            if response.status_code == 304:
+                data = self.metadata_cache.get(cache_key)
+                if data is not None:
+                    return data
+                response = self._http_get(url, self.headers, params)
             response.raise_for_status() 
-            return response.json()
+            data = response.json()
+            validators = {}
+            if response.headers.get('ETag'):
+                validators["etag"] = response.headers['ETag']
+            if response.headers.get('Last-Modified'):
+                validators["last_modified"] = response.headers['Last-Modified']
+            self.metadata_cache.put(cache_key, data, validators)
+            return data
         except requests.exceptions.RequestException as e:
+            data = self._offline_json(cache_key)
+            if data is not None:
+                self.signals.log_message.emit(f"网络请求失败，使用本地缓存: {url}")
+                return data
             self.signals.log_message.emit(f"网络请求失败: {url} - {e}")
             return None
 
+    def _http_get(self, url, headers, params=None):
+        """发送元数据请求，优先使用共享的传输（连接复用，HTTP/2 时多个请求共用一个连接）"""
+        if self.transport is not None:
+            return self.transport.get(url, headers=headers, params=params, timeout=self.TIMEOUT)
+        return requests.get(url, headers=headers, params=params, timeout=self.TIMEOUT)
+
+    def _offline_json(self, cache_key):
+        """不访问网络，从元数据缓存或离线资源包中读取"""
+        data = self.metadata_cache.get(cache_key)
+        if data is None and self.bundles:
+            key = MetadataCache.key_for(cache_key)
+            data = self.bundles.get_json(self.NAME, key) if key else None
+        return data
+
+    def version_manifest(self, refresh=False):
+        """
+        返回解析后的版本清单索引 (VersionManifest)，获取失败或没有清单时返回 None。
+        清单只下载、解析一次，MANIFEST_TTL 内的后续调用（例如切换版本通道）直接复用。
+        """
+        if not self.MANIFEST_PATH:
+            return None
+        with self._manifest_lock:
+            expired = time.monotonic() - self._manifest_loaded_at > self.MANIFEST_TTL
+            if self._manifest is None or expired or refresh:
+                url = f"{self.BASE_URL}{self.MANIFEST_PATH}"
+                if refresh:
+                    REQUEST_FLIGHTS.forget(url)
+                data = self._get_json(url)
+                if data:
+                    self._manifest = VersionManifest(data)
+                    self._manifest_loaded_at = time.monotonic()
+            return self._manifest
+
+    def _version_detail_from_manifest(self, mc_version):
+        manifest = self.version_manifest()
+        url = manifest.detail_url(mc_version) if manifest else None
+        return self._get_json(url) if url else None
+
+    def get_minecraft_versions(self, channel=RELEASE):
+        return []
+
+    def get_server_types(self, mc_version=None):
+        return [t for t in (self.CAPABILITIES.server_types or ()) if self.supports(t, mc_version)]
+
+    def compat_index(self, server_type):
+        """
+        返回镜像索引中该服务端类型有构建的 Minecraft 版本列表，用于构建兼容性矩阵；
+        不支持或获取失败时返回 None。
+        """
+        return None
+
+    def get_core_versions(self, mc_version, server_type):
+        return []
+
+    def watch_builds(self, mc_version, server_type):
+        """
+        新构建监视器 (BuildWatcher) 比对的构建列表，返回 (构建列表, {构建: 下载信息})。
+        默认为完整的核心版本列表；只提供最新构建的后端可以改为返回最新构建的文件名。
+        """
+        return self.get_core_versions(mc_version, server_type), {}
+
+    def get_download_url_and_filename(self, mc_version, server_type, core_version_info):
+        return None, None
+
+    def get_download_info(self, mc_version, server_type, core_version_info):
+        """
+        获取下载信息，返回包含 url、file_name 和 sha256 的字典，失败时返回 None。
+        不提供 SHA256 的后端 sha256 为 None。
+        """
+        url, file_name = self.get_download_url_and_filename(mc_version, server_type, core_version_info)
+        if not url:
+            return None
+        return {"url": url, "file_name": file_name, "sha256": None}
+
+    def check_archive(self, path, file_name):
+        """
+        jar / zip 下载完成后检查压缩包结构并读取 MANIFEST.MF、version.json 中的元数据 (inspect_archive)，
+        其他文件返回 None。结构无效时删除文件并抛出 ValueError。
+        """
+        if not file_name.lower().endswith(ARCHIVE_SUFFIXES):
+            return None
+        try:
+            archive = inspect_archive(path)
+        except (ZipFormatError, OSError) as e:
+            os.remove(path)
+            raise ValueError(f"{file_name} 不是有效的压缩包 ({e})，可能下载到了错误页面")
+        details = [f"{archive['entries']} 个条目"]
+        if archive["main_class"]:
+            details.append(f"Main-Class: {archive['main_class']}")
+        version = archive["implementation_version"] or (archive["version"] or {}).get("id")
+        if version:
+            details.append(f"版本: {version}")
+        self.signals.log_message.emit(f"压缩包检查通过: {file_name} ({', '.join(details)})")
+        return archive
+
+    @staticmethod
+    def _total_size(response, offset):
+        """从响应头得到文件的完整大小，未知时返回 None"""
+        if response.status_code == 206:
+            total = response.headers.get('Content-Range', '').rsplit('/', 1)[-1]
+            return int(total) if total.isdigit() else None
+        length = int(response.headers.get('content-length', 0))
+        return length or None
+
+    @staticmethod
+    def _validator(response):
+        """响应的强 ETag，没有时用 Last-Modified；都没有时返回 None（弱 ETag 不能用于 If-Range）"""
+        etag = response.headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            return etag
+        return response.headers.get('Last-Modified')
+
+    def download_file(self, url, dest_folder, file_name, expected_sha256=None, offset=None, progress=None, token=None,
+                      validator=None):
+        """
+        下载文件。内容先写入 <文件名>.part，完成（并通过 SHA256 校验）后再改名。
+        offset 为已知可信的 .part 字节数（来自任务日志），不为 None 时以 Range 请求从该位置继续；
+        validator 为写入这些字节时服务器返回的 ETag 或 Last-Modified，作为 If-Range 发送，
+        文件在此期间变化时服务器返回完整内容，从头下载。既没有 validator 也没有 SHA256 时无法确认
+        已写入的部分仍然有效，不继续下载而是从头开始。
+        progress(已写入字节数, 总大小, validator) 在每写入 CHECKPOINT_BYTES 并刷新到磁盘后调用，用于记录断点。
+        token 为 CancellationToken（默认取当前作用域的标记），每个数据块之间检查取消和暂停。
+        返回 DownloadResult，其中带有压缩包检查的结果，调用者可以直接写入索引而不必再次读取文件。
+        """
+        self.signals.log_message.emit(f"开始下载: {file_name}")
+        
+        os.makedirs(dest_folder, exist_ok=True)
+        file_path = os.path.join(dest_folder, file_name)
+        part_path = f"{file_path}.part"
+        token = token or current_token()
+        
+        try:
+            resume_from = 0
+            if offset and (validator or expected_sha256) and os.path.exists(part_path):
+                resume_from = min(offset, os.path.getsize(part_path))
+            if self.offline:
+                raise OfflineError(url)
+            headers = dict(self.headers)
+            if resume_from:
+                headers['Range'] = f"bytes={resume_from}-"
+                if validator:
+                    headers['If-Range'] = validator
+            response = requests.get(url, headers=headers, stream=True, timeout=30)
+            if response.status_code == 416 and resume_from:
+                # 上次中断时已经下载完毕，只差改名
+                response.close()
+                total_size = resume_from
+            else:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    resume_from = 0
+                else:
+                    self.signals.log_message.emit(f"从 {resume_from / 1024 / 1024:.1f} MB 处继续下载")
+                total_size = self._total_size(response, resume_from)
+                validator = self._validator(response) or (validator if resume_from else None)
+                downloaded = resume_from
+                checkpoint = downloaded
+                
+                try:
+                    with open(part_path, 'r+b' if resume_from else 'wb') as file:
+                        file.truncate(resume_from)
+                        file.seek(resume_from)
+                        for chunk in response.iter_content(chunk_size=8192):
+                            if token:
+                                token.check()
+                            if chunk:
+                                file.write(chunk)
+                                downloaded += len(chunk)
+                                if total_size:
+                                    self.signals.progress_update.emit(int((downloaded / total_size) * 100))
+                                if progress and downloaded - checkpoint >= self.CHECKPOINT_BYTES:
+                                    file.flush()
+                                    progress(downloaded, total_size, validator)
+                                    checkpoint = downloaded
+                        file.flush()
+                finally:
+                    # 无论完成还是取消，都记录最终写入的位置，并立即释放连接
+                    response.close()
+                    if progress:
+                        progress(downloaded, total_size, validator)
+
+            if expected_sha256 and sha256_of_file(part_path) != expected_sha256.lower():
+                os.remove(part_path)
+                raise ValueError(f"SHA256 校验失败 (期望 {expected_sha256})")
+            archive = self.check_archive(part_path, file_name)
+            os.replace(part_path, file_path)
+            
+            self.signals.log_message.emit(f"下载完成: {file_name}")
+            self.signals.download_finished.emit(file_path, True)
+            return DownloadResult(True, file_path, archive)
+        except DownloadCancelled:
+            self.signals.log_message.emit(f"下载已取消: {file_name}（已下载的部分会保留）")
+            self.signals.download_finished.emit(file_path, False)
+            return DownloadResult(False, file_path, None)
+        except Exception as e:
+            self.signals.log_message.emit(f"下载失败: {e}")
+            self.signals.download_finished.emit(file_path, False)
+            return DownloadResult(False, file_path, None)
+
+@register_backend
+class BMCLAPIDownloader(MirrorBackend):
+    NAME = "bmcl"
+    DISPLAY_NAME = "BMCL API"
+    BASE_URL = "https://bmclapi2.bangbang93.com"
+    CAPABILITIES = BackendCapabilities(
+        server_types=("vanilla", "forge", "fabric", "neoforge", "optifine"),
+        hashes=("sha1",),
+        channels=CHANNELS,
+    )
+    MANIFEST_PATH = "/mc/game/version_manifest.json"
+
     # Helper function for version parsing (new)
     def _parse_version_string(self, version_str):
         """
@@ -87,14 +529,14 @@ class BMCLAPIDownloader:
         except Exception:
             return ([version_str], [], "")
 
-    def get_minecraft_versions(self):
-        """获取 Minecraft 版本列表"""
+    def get_minecraft_versions(self, channel=RELEASE):
+        """获取指定通道的 Minecraft 版本列表（按发布时间降序）"""
         self.signals.log_message.emit("正在获取 Minecraft 版本列表...")
         
         try:
-            data = self._get_json(f"{self.BASE_URL}/mc/game/version_manifest.json")
-            if data:
-                versions = [version['id'] for version in data['versions'] if version['type'] == 'release']
+            manifest = self.version_manifest()
+            if manifest:
+                versions = manifest.versions(channel)
                 self.signals.log_message.emit(f"获取到 {len(versions)} 个版本")
                 return versions
             else:
@@ -104,27 +546,92 @@ class BMCLAPIDownloader:
             self.signals.log_message.emit(f"获取 Minecraft 版本列表失败: {e}")
             return []
 
-    def get_server_types(self, mc_version):
-        """获取指定 Minecraft 版本的服务端类型"""
-        self.signals.log_message.emit(f"正在获取 {mc_version} 版本的服务端类型...")
-        
-        # 根据版本确定可用的服务端类型
+    def __init__(self, metadata_cache=None):
+        super().__init__(metadata_cache)
+        self.compat_matrix = CompatibilityMatrix(self)
+
+    def compat_index(self, server_type):
+        """从镜像的版本索引得到每种服务端类型有构建的 Minecraft 版本"""
+        if server_type == "vanilla":
+            manifest = self.version_manifest()
+            if not manifest:
+                return None
+            return [version for channel in manifest.channels() for version in manifest.versions(channel)]
+        if server_type == "forge":
+            data = self._get_json(f"{self.BASE_URL}/forge/minecraft")
+            return list(data) if isinstance(data, list) else None
+        if server_type == "fabric":
+            data = self._get_json(f"{self.BASE_URL}/fabric-meta/v2/versions/game")
+            return [entry['version'] for entry in data] if isinstance(data, list) else None
+        if server_type == "optifine":
+            data = self._get_json(f"{self.BASE_URL}/optifine/versionList")
+            return [entry['mcversion'] for entry in data if entry.get('mcversion')] if isinstance(data, list) else None
+        if server_type == "neoforge":
+            # 1.20.1 的 NeoForge 发布为 net.neoforged:forge (1.20.1-47.1.x)，之后为 net.neoforged:neoforge (20.2.x ...)
+            current = self._get_maven_versions("net/neoforged/neoforge")
+            legacy = self._get_maven_versions("net/neoforged/forge")
+            if current is None and legacy is None:
+                return None
+            versions = [_neoforge_mc_version(v) for v in current or []] + [v.split('-')[0] for v in legacy or []]
+            return [v for v in versions if v]
+        return None
+
+    def _get_maven_versions(self, artifact_path):
+        """读取 BMCL Maven 镜像中某个构件的 maven-metadata.xml，返回版本列表"""
+        url = f"{self.BASE_URL}/maven/{artifact_path}/maven-metadata.xml"
+        check_cancelled()
+        try:
+            response = self._http_get(url, self.headers)
+            response.raise_for_status()
+            root = ElementTree.fromstring(response.content)
+        except (requests.exceptions.RequestException, ElementTree.ParseError) as e:
+            self.signals.log_message.emit(f"网络请求失败: {url} - {e}")
+            return None
+        return [node.text for node in root.iter("version") if node.text]
+
+    def _guess_server_types(self, mc_version):
+        """兼容性矩阵缺少数据时，根据版本号推测可用的服务端类型"""
+        # 快照只有原版和 Fabric，远古版本只有原版
+        manifest = self.version_manifest()
+        channel = (manifest.channel_of(mc_version) if manifest else None) or guess_channel(mc_version)
+        if channel != RELEASE:
+            return ["vanilla", "fabric"] if channel == SNAPSHOT else ["vanilla"]
+
         available_types = []
+        version_key = _release_version_key(mc_version) or (0,)
         
         # 所有版本都支持原版
         available_types.append("vanilla")
         
-        # 根据版本添加其他服务端类型
-        if mc_version >= "1.14":
+        # 根据版本添加其他服务端类型（按数值比较，1.8 < 1.14）
+        if version_key >= (1, 14):
             available_types.extend(["fabric", "forge", "neoforge"])
-        elif mc_version >= "1.12":
+        elif version_key >= (1, 12):
             available_types.extend(["fabric", "forge"])
-        elif mc_version >= "1.7":
+        elif version_key >= (1, 7):
             available_types.append("forge")
         
         # 插件服务端
-        if mc_version >= "1.8":
+        if version_key >= (1, 8):
             available_types.append("optifine")
+        return available_types
+
+    def get_server_types(self, mc_version=None):
+        """
+        获取指定 Minecraft 版本的服务端类型：只列出镜像上确实有构建的类型。
+        结果来自兼容性矩阵（磁盘缓存），矩阵中缺少某一列时才按版本号推测该列。
+        """
+        self.signals.log_message.emit(f"正在获取 {mc_version} 版本的服务端类型...")
+        
+        if not mc_version:
+            return list(self.CAPABILITIES.server_types)
+
+        known = self.compat_matrix.lookup(mc_version)
+        guessed = self._guess_server_types(mc_version) if len(known) < len(self.CAPABILITIES.server_types) else []
+        available_types = [
+            server_type for server_type in self.CAPABILITIES.server_types
+            if known.get(server_type, server_type in guessed)
+        ]
         
         self.signals.log_message.emit(f"获取到 {len(available_types)} 个服务端类型")
         return available_types
@@ -179,6 +686,10 @@ class BMCLAPIDownloader:
             self.signals.log_message.emit(f"获取核心版本失败: {e}")
             return []
 
+    def get_version_detail(self, mc_version):
+        """获取指定 Minecraft 版本的详细信息 JSON（包含服务端下载信息、依赖库和 Java 版本）"""
+        return self._version_detail_from_manifest(mc_version)
+
     def get_download_url_and_filename(self, mc_version, server_type, core_version_info):
         """获取下载链接和文件名"""
         self.signals.log_message.emit(f"正在获取 {server_type} {mc_version} 的下载链接...")
@@ -186,14 +697,10 @@ class BMCLAPIDownloader:
         try:
             if server_type == "vanilla":
                 # 原版服务端
-                version_data = self._get_json(f"{self.BASE_URL}/mc/game/version_manifest.json")
-                if version_data:
-                    for version in version_data['versions']:
-                        if version['id'] == mc_version:
-                            version_detail = self._get_json(version['url'])
-                            if version_detail and 'downloads' in version_detail and 'server' in version_detail['downloads']:
-                                server_info = version_detail['downloads']['server']
-                                return server_info['url'], f"minecraft_server-{mc_version}.jar"
+                version_detail = self.get_version_detail(mc_version)
+                if version_detail and 'downloads' in version_detail and 'server' in version_detail['downloads']:
+                    server_info = version_detail['downloads']['server']
+                    return server_info['url'], f"minecraft_server-{mc_version}.jar"
                 return None, None
             elif server_type == "forge":
                 # Forge 服务端
@@ -237,143 +744,218 @@ class BMCLAPIDownloader:
             self.signals.log_message.emit(f"获取下载链接失败: {e}")
             return None, None
 
-    def download_file(self, url, dest_folder, file_name):
-        """下载文件"""
-        self.signals.log_message.emit(f"开始下载: {file_name}")
-        
-        os.makedirs(dest_folder, exist_ok=True)
-        file_path = os.path.join(dest_folder, file_name)
-        
-        try:
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-            
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
-            
-            with open(file_path, 'wb') as file:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        file.write(chunk)
-                        downloaded += len(chunk)
-                        if total_size > 0:
-                            progress = int((downloaded / total_size) * 100)
-                            self.signals.progress_update.emit(progress)
-            
-            self.signals.log_message.emit(f"下载完成: {file_name}")
-            self.signals.download_finished.emit(file_path, True)
-            return True
-        except Exception as e:
-            self.signals.log_message.emit(f"下载失败: {e}")
-            self.signals.download_finished.emit(file_path, False)
-            return False
-
 # Worker classes for threading
-class DataLoaderWorker(QObject):
-    data_loaded = pyqtSignal(list)
+
+# 列表数据分批发送给界面，每批作为单独的事件处理，避免一次插入大量数据阻塞界面线程
+BATCH_SIZE = 200
+
+
+def _emit_in_batches(signal, items, token=None):
+    for start in range(0, len(items), BATCH_SIZE):
+        if token is not None and token.cancelled:
+            return
+        signal.emit(items[start:start + BATCH_SIZE])
+
+
+class CancellableWorker(QObject):
+    """
+    可取消的后台任务基类：work() 中的网络请求都在 self.token 的作用域内执行，
+    cancel() 让正在进行的请求和下载在下一个检查点结束，而不需要强制终止线程。
+    run() 作为槽函数被调用，不能让异常逃出（PyQt5 会因槽函数中未捕获的异常直接终止程序）：
+    取消和其他错误都在这里处理，随后总会发出 finished。
+    """
     finished = pyqtSignal()
-    
+
     def __init__(self, downloader):
         super().__init__()
         self.downloader = downloader
-    
+        self.token = CancellationToken()
+
+    def cancel(self, resumable=False):
+        self.token.cancel(resumable)
+
+    def work(self):
+        """子类在这里执行实际的任务并通过自己的信号发出结果；基类不做任何事"""
+
+    def interrupted(self):
+        """work() 因取消或错误没有正常结束时调用，子类可在这里通知界面恢复状态"""
+
     def run(self):
-        data = self.downloader.get_minecraft_versions()
+        try:
+            with cancellation_scope(self.token):
+                self.work()
+        except DownloadCancelled:
+            self.interrupted()
+        except Exception as e:
+            self.downloader.signals.log_message.emit(f"后台任务出错: {e}")
+            self.interrupted()
+        finally:
+            self.finished.emit()
+
+
+class DataLoaderWorker(CancellableWorker):
+    data_loaded = pyqtSignal(list)
+    batch_loaded = pyqtSignal(list)
+    
+    def __init__(self, downloader, channel=RELEASE):
+        super().__init__(downloader)
+        self.channel = channel
+    
+    def work(self):
+        data = self.downloader.get_minecraft_versions(self.channel)
+        check_cancelled()
+        _emit_in_batches(self.batch_loaded, data, self.token)
+        check_cancelled()
         self.data_loaded.emit(data)
-        self.finished.emit()
+        # 版本列表显示后再刷新兼容性矩阵，选择版本时服务端类型可以直接从矩阵得到
+        self.downloader.refresh_compatibility()
+
+    def interrupted(self):
+        if not self.token.cancelled:
+            self.data_loaded.emit([])
 
-class ServerTypeLoaderWorker(QObject):
+class ServerTypeLoaderWorker(CancellableWorker):
     server_types_loaded = pyqtSignal(list)
-    finished = pyqtSignal()
     
     def __init__(self, downloader, mc_version):
-        super().__init__()
-        self.downloader = downloader
+        super().__init__(downloader)
         self.mc_version = mc_version
     
-    def run(self):
+    def work(self):
         server_types = self.downloader.get_server_types(self.mc_version)
+        check_cancelled()
         self.server_types_loaded.emit(server_types)
-        self.finished.emit()
 
-class CoreVersionLoaderWorker(QObject):
+    def interrupted(self):
+        if not self.token.cancelled:
+            self.server_types_loaded.emit([])
+
+class CoreVersionLoaderWorker(CancellableWorker):
     core_versions_loaded = pyqtSignal(list)
-    finished = pyqtSignal()
+    batch_loaded = pyqtSignal(list)
     
     def __init__(self, downloader, mc_version, server_type):
-        super().__init__()
-        self.downloader = downloader
+        super().__init__(downloader)
         self.mc_version = mc_version
         self.server_type = server_type
     
-    def run(self):
+    def work(self):
         core_versions = self.downloader.get_core_versions(self.mc_version, self.server_type)
+        check_cancelled()
+        _emit_in_batches(self.batch_loaded, core_versions, self.token)
+        check_cancelled()
         self.core_versions_loaded.emit(core_versions)
-        self.finished.emit()
 
-class DownloadWorker(QObject):
-    download_finished = pyqtSignal(str, bool)
-    finished = pyqtSignal()
+    def interrupted(self):
+        if not self.token.cancelled:
+            self.core_versions_loaded.emit([])
+
+class DownloadWorker(CancellableWorker):
+    """下载一个文件；结果由下载器的 signals.download_finished 通知界面"""
     
-    def __init__(self, downloader, url, dest_folder, file_name):
-        super().__init__()
-        self.downloader = downloader
+    def __init__(self, downloader, url, dest_folder, file_name, race_target=None, expected_sha256=None, source=None,
+                 index_key=None):
+        super().__init__(downloader)
         self.url = url
         self.dest_folder = dest_folder
         self.file_name = file_name
+        # (MC版本, 服务端类型, 核心版本)，设置时使用竞速下载
+        self.race_target = race_target
+        self.expected_sha256 = expected_sha256
+        self.source = source
+        # 仓库索引中的键，下载成功后记录文件和压缩包元数据（竞速下载自行生成）
+        self.index_key = index_key
     
-    def run(self):
-        success = self.downloader.download_file(self.url, self.dest_folder, self.file_name)
-        self.download_finished.emit(os.path.join(self.dest_folder, self.file_name), success)
-        self.finished.emit()
+    def pause(self):
+        self.token.pause()
+
+    def resume(self):
+        self.token.resume()
+
+    def work(self):
+        if self.race_target:
+            self.downloader.download_racing(*self.race_target, self.dest_folder, self.file_name)
+        else:
+            self.downloader.download_file(
+                self.url, self.dest_folder, self.file_name, self.expected_sha256, self.source,
+                index_key=self.index_key,
+            )
+
+    def interrupted(self):
+        # 下载器内部没有机会发出结果（例如在等待文件锁时被取消），由这里通知界面恢复
+        self.downloader.signals.download_finished.emit(
+            os.path.join(self.dest_folder, self.file_name or ""), False
+        )
+
+class ResumeWorker(CancellableWorker):
+    """继续任务日志中未完成的下载"""
+    resume_finished = pyqtSignal(int, int)
+
+    def work(self):
+        succeeded, failed = self.downloader.resume_pending()
+        self.resume_finished.emit(succeeded, failed)
+
+    def interrupted(self):
+        self.resume_finished.emit(0, 0)
 
-class MSLAPIDownloader:
+@register_backend
+class MSLAPIDownloader(MirrorBackend):
     """
     MSL API 下载器，基于 MSL API V3 文档实现
     """
+    NAME = "msl"
+    DISPLAY_NAME = "MSL API"
     BASE_URL = "https://api.mslmc.cn/v3"
+    TIMEOUT = 30
+    # 服务端类型由 get_server_types 动态提供；下载信息带有 SHA256
+    CAPABILITIES = BackendCapabilities(server_types=None, hashes=("sha256",))
+    METADATA_CACHE_DIR = os.path.join("upstream", "msl")
     
-    def __init__(self):
-        self.signals = DownloaderSignals()
+    def __init__(self, metadata_cache=None):
+        super().__init__(metadata_cache)
         self.device_id = self._get_or_create_device_id()
         self.headers = {
             'deviceID': self.device_id,
             'User-Agent': 'MinecraftServerjarDownloader/1.0'
         }
+        # Java 运行时由 UnifiedDownloader 提供的 JavaRuntimeManager 查询（来源为 Adoptium）
+        self.java_runtimes = None
         self.signals.log_message.emit(f"MSL API 已初始化，设备ID: {self.device_id}")
 
+    @staticmethod
+    def _read_device_id(path):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f).get('device_id')
+        except (OSError, ValueError, AttributeError):
+            return None
+
     def _get_or_create_device_id(self):
-        """获取或创建设备ID"""
-        device_id_file = "device_id.json"
-        
-        if os.path.exists(device_id_file):
-            try:
-                with open(device_id_file, 'r') as f:
-                    data = json.load(f)
-                    return data.get('device_id')
-            except:
-                pass
-        
-        # 创建新的设备ID
-        device_id = str(uuid.uuid4())
+        """
+        获取或创建设备ID。设备ID保存在数据目录中，同一用户的所有实例共用；
+        加锁后再创建，避免多个实例同时启动时各自生成不同的ID。
+        旧版本保存在工作目录下的 device_id.json 会被迁移到数据目录。
+        """
+        device_id_file = data_path("device_id.json")
+        device_id = self._read_device_id(device_id_file)
+        if device_id:
+            return device_id
+
         try:
-            with open(device_id_file, 'w') as f:
-                json.dump({'device_id': device_id}, f)
-        except:
-            pass
+            with lock_for(device_id_file):
+                device_id = self._read_device_id(device_id_file) or self._read_device_id("device_id.json")
+                if not device_id:
+                    # 创建新的设备ID
+                    device_id = str(uuid.uuid4())
+                tmp_path = unique_tmp_path(device_id_file)
+                with open(tmp_path, 'w') as f:
+                    json.dump({'device_id': device_id}, f)
+                os.replace(tmp_path, device_id_file)
+        except OSError:
+            device_id = device_id or str(uuid.uuid4())
         
         return device_id
 
-    def _get_json(self, url):
-        """通用方法，用于发送GET请求并返回JSON数据"""
-        try:
-            response = requests.get(url, headers=self.headers, timeout=30)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            self.signals.log_message.emit(f"MSL API 请求失败: {url} - {e}")
-            return None
-
     def get_notice(self):
         """获取公告信息"""
         self.signals.log_message.emit("正在从 MSL API 获取公告...")
@@ -390,8 +972,8 @@ class MSLAPIDownloader:
             self.signals.log_message.emit("获取公告失败")
             return ""
 
-    def get_server_types(self):
-        """获取 MSL 支持的所有服务端类型"""
+    def get_server_types(self, mc_version=None):
+        """获取 MSL 支持的所有服务端类型（与 Minecraft 版本无关）"""
         self.signals.log_message.emit("正在从 MSL API 获取支持的服务端类型...")
         
         url = f"{self.BASE_URL}/query/available_server_types"
@@ -472,19 +1054,63 @@ class MSLAPIDownloader:
         else:
             return ["latest"]
 
+    def get_core_versions(self, mc_version, server_type):
+        """获取核心版本"""
+        return self.get_server_builds(server_type, mc_version)
+
+    def watch_builds(self, mc_version, server_type):
+        """MSL API 只提供最新构建，比对最新构建的文件名"""
+        info = self.get_download_info(mc_version, server_type, "latest")
+        if not info:
+            return [], {}
+        return [info["file_name"]], {info["file_name"]: info}
+
+    def get_minecraft_versions(self, channel=RELEASE):
+        """MSL API 通过服务端类型获取版本，需要聚合所有服务端类型的版本（只有正式版）"""
+        if channel != RELEASE:
+            return []
+        try:
+            server_types = self.get_server_types()
+            if not server_types:
+                self.signals.log_message.emit("无法获取服务端类型列表")
+                return []
+            
+            all_versions = set()
+            for server_type in server_types:
+                versions = self.get_available_versions(server_type)
+                all_versions.update(versions)
+            
+            # 转换为列表并排序（版本号降序）
+            return sorted(all_versions, key=lambda x: _release_version_key(x) or (0,), reverse=True)
+        except Exception as e:
+            self.signals.log_message.emit(f"获取MSL API版本列表失败: {str(e)}")
+            return []
+
     def get_java_versions(self):
-        """获取支持的Java版本列表"""
-        self.signals.log_message.emit("MSL API 暂不支持Java版本查询，返回常用版本")
-        # 返回常用的Java版本
-        return ["Java8", "Java11", "Java17", "Java21"]
+        """获取可下载的Java版本列表，例如 ["Java21", "Java17", ...]"""
+        if self.java_runtimes is None:
+            return []
+        return [f"Java{major}" for major in self.java_runtimes.available_majors()]
 
     def get_java_download_url(self, java_version):
-        """获取特定Java版本的下载地址"""
-        self.signals.log_message.emit(f"MSL API 暂不支持Java下载功能")
-        return ""
+        """获取特定Java版本（例如 "Java17"）在当前平台上的下载地址"""
+        major = parse_java_major(java_version)
+        if self.java_runtimes is None or major is None:
+            return ""
+        package = self.java_runtimes.package(major)
+        return package["url"] if package else ""
 
-    def get_download_url_and_filename(self, server_type, mc_version, core_version_info):
+    def get_download_url_and_filename(self, mc_version, server_type, core_version_info):
         """获取下载链接和文件名"""
+        info = self.get_download_info(mc_version, server_type, core_version_info)
+        if info:
+            return info["url"], info["file_name"]
+        return None, None
+
+    def get_download_info(self, mc_version, server_type, core_version_info):
+        """
+        获取下载信息，返回包含 url、file_name 和 sha256 的字典，失败时返回 None。
+        """
         self.signals.log_message.emit(f"正在从 MSL API 获取 {server_type} {mc_version} 的下载链接...")
         
         # 使用新的 download/server API 端点
@@ -498,9 +1124,7 @@ class MSLAPIDownloader:
             params['build'] = 'latest'
         
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
+            data = self._get_json(url, params=params)
             
             if data and data.get("code") == 200:
                 download_data = data.get("data", {})
@@ -517,21 +1141,18 @@ class MSLAPIDownloader:
                     if sha256:
                         self.signals.log_message.emit(f"SHA256 校验码: {sha256}")
                     
-                    return download_url, filename
+                    return {"url": download_url, "file_name": filename, "sha256": sha256 or None}
                 else:
                     self.signals.log_message.emit(f"未找到 {server_type} {mc_version} 的下载链接")
-                    return None, None
+                    return None
             else:
                 error_msg = data.get("message", "未知错误") if data else "响应格式错误"
                 self.signals.log_message.emit(f"获取 {server_type} {mc_version} 下载链接失败: {error_msg}")
-                return None, None
+                return None
                 
-        except requests.exceptions.RequestException as e:
-            self.signals.log_message.emit(f"网络请求失败: {e}")
-            return None, None
         except Exception as e:
             self.signals.log_message.emit(f"获取 {server_type} {mc_version} 下载链接失败: {e}")
-            return None, None
+            return None
 
     def get_server_description(self, server_type):
         """获取服务端简介信息（从分类信息中获取）"""
@@ -544,50 +1165,184 @@ class MSLAPIDownloader:
         
         return f"{server_type} 服务端"
 
-    def download_file(self, url, dest_folder, file_name):
-        """下载文件"""
-        self.signals.log_message.emit(f"开始下载: {file_name}")
-        
-        os.makedirs(dest_folder, exist_ok=True)
-        file_path = os.path.join(dest_folder, file_name)
-        
-        try:
-            response = requests.get(url, headers=self.headers, stream=True)
-            response.raise_for_status()
-            
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
-            
-            with open(file_path, 'wb') as file:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        file.write(chunk)
-                        downloaded += len(chunk)
-                        if total_size > 0:
-                            progress = int((downloaded / total_size) * 100)
-                            self.signals.progress_update.emit(progress)
-            
-            self.signals.log_message.emit(f"下载完成: {file_name}")
-            self.signals.download_finished.emit(file_path, True)
-            return True
-        except Exception as e:
-            self.signals.log_message.emit(f"下载失败: {e}")
-            self.signals.download_finished.emit(file_path, False)
-            return False
+@register_backend
+class MojangDownloader(MirrorBackend):
+    """
+    Mojang 官方 (piston-meta / piston-data)，只提供原版服务端，带 SHA1 校验码
+    """
+    NAME = "mojang"
+    DISPLAY_NAME = "Mojang 官方"
+    BASE_URL = "https://piston-meta.mojang.com"
+    CAPABILITIES = BackendCapabilities(server_types=("vanilla",), hashes=("sha1",), channels=CHANNELS)
+    METADATA_CACHE_DIR = os.path.join("upstream", "mojang")
+    MANIFEST_PATH = "/mc/game/version_manifest_v2.json"
+
+    def get_minecraft_versions(self, channel=RELEASE):
+        """获取指定通道的 Minecraft 版本列表（按发布时间降序）"""
+        manifest = self.version_manifest()
+        return manifest.versions(channel) if manifest else []
+
+    def get_core_versions(self, mc_version, server_type):
+        return [mc_version] if server_type == "vanilla" else []
+
+    def get_version_detail(self, mc_version):
+        return self._version_detail_from_manifest(mc_version)
+
+    def get_download_url_and_filename(self, mc_version, server_type, core_version_info):
+        if server_type != "vanilla":
+            return None, None
+        detail = self.get_version_detail(mc_version)
+        server = (detail or {}).get('downloads', {}).get('server')
+        if not server:
+            return None, None
+        return server['url'], f"minecraft_server-{mc_version}.jar"
+
+
+@register_backend
+class PaperMCDownloader(MirrorBackend):
+    """
+    PaperMC 官方 API v2，提供 Paper 与 Folia 的全部构建，带 SHA256 校验码
+    """
+    NAME = "papermc"
+    DISPLAY_NAME = "PaperMC 官方"
+    BASE_URL = "https://api.papermc.io/v2"
+    CAPABILITIES = BackendCapabilities(
+        server_types=("paper", "folia"), min_mc_version="1.8", hashes=("sha256",), channels=(RELEASE, SNAPSHOT),
+    )
+    METADATA_CACHE_DIR = os.path.join("upstream", "papermc")
+
+    def get_minecraft_versions(self, channel=RELEASE):
+        """获取 Paper 支持的 Minecraft 版本（降序），预览版归入 snapshot 通道"""
+        data = self._get_json(f"{self.BASE_URL}/projects/paper")
+        if not data:
+            return []
+        return [version for version in reversed(data.get('versions', [])) if guess_channel(version) == channel]
+
+    def _get_builds(self, mc_version, server_type):
+        data = self._get_json(f"{self.BASE_URL}/projects/{server_type}/versions/{mc_version}/builds")
+        return (data or {}).get('builds', [])
+
+    def get_core_versions(self, mc_version, server_type):
+        """获取构建号列表（最新的在前）"""
+        if server_type not in self.CAPABILITIES.server_types:
+            return []
+        return [str(build['build']) for build in reversed(self._get_builds(mc_version, server_type))]
+
+    def get_download_info(self, mc_version, server_type, core_version_info):
+        if server_type not in self.CAPABILITIES.server_types:
+            return None
+        for build in self._get_builds(mc_version, server_type):
+            if str(build['build']) == str(core_version_info):
+                application = build.get('downloads', {}).get('application')
+                if not application:
+                    return None
+                url = (f"{self.BASE_URL}/projects/{server_type}/versions/{mc_version}"
+                       f"/builds/{build['build']}/downloads/{application['name']}")
+                return {"url": url, "file_name": application['name'], "sha256": application.get('sha256')}
+        return None
+
+    def get_download_url_and_filename(self, mc_version, server_type, core_version_info):
+        info = self.get_download_info(mc_version, server_type, core_version_info)
+        if info:
+            return info["url"], info["file_name"]
+        return None, None
+
+
+@register_backend
+class FabricMetaDownloader(MirrorBackend):
+    """
+    Fabric 官方 meta 服务，提供 Fabric 服务端启动器
+    """
+    NAME = "fabric-meta"
+    DISPLAY_NAME = "Fabric 官方"
+    BASE_URL = "https://meta.fabricmc.net"
+    CAPABILITIES = BackendCapabilities(server_types=("fabric",), min_mc_version="1.14", channels=(RELEASE, SNAPSHOT))
+    METADATA_CACHE_DIR = os.path.join("upstream", "fabric-meta")
+
+    def get_minecraft_versions(self, channel=RELEASE):
+        """stable 的版本属于正式版通道，其余属于快照通道"""
+        data = self._get_json(f"{self.BASE_URL}/v2/versions/game")
+        if not data:
+            return []
+        stable = channel == RELEASE
+        return [version['version'] for version in data if bool(version.get('stable')) == stable]
+
+    def get_core_versions(self, mc_version, server_type):
+        if server_type != "fabric":
+            return []
+        data = self._get_json(f"{self.BASE_URL}/v2/versions/loader/{mc_version}")
+        return [entry['loader']['version'] for entry in data or []]
+
+    def get_download_url_and_filename(self, mc_version, server_type, core_version_info):
+        if server_type != "fabric":
+            return None, None
+        installers = self._get_json(f"{self.BASE_URL}/v2/versions/installer")
+        if not installers:
+            return None, None
+        installer = installers[0]['version']
+        url = f"{self.BASE_URL}/v2/versions/loader/{mc_version}/{core_version_info}/{installer}/server/jar"
+        filename = f"fabric-server-mc.{mc_version}-loader.{core_version_info}-installer.{installer}.jar"
+        return url, filename
+
+
+class AdoptiumMetadata(MirrorBackend):
+    """
+    Adoptium API 的元数据请求（供 JavaRuntimeManager 使用）。不注册为镜像后端：
+    响应保存在独立的元数据缓存中，不会被当作镜像元数据提供给本地缓存服务器或导出到离线资源包。
+    """
+    NAME = "adoptium"
+    DISPLAY_NAME = "Adoptium"
+    BASE_URL = "https://api.adoptium.net"
+    CAPABILITIES = BackendCapabilities(server_types=(), channels=())
+    METADATA_CACHE_DIR = os.path.join("upstream", "adoptium")
+
 
 class UnifiedDownloader:
     """
-    统一下载器，整合 BMCLAPI 和 MSL API
+    统一下载器，整合 BACKEND_REGISTRY 中注册的所有镜像后端。
+    current_source 为某个后端名称时只使用该后端；为 "all" 时把查询并发地分发给
+    所有具备相应能力的后端，并合并结果。
     """
-    def __init__(self):
+    ALL_SOURCES = "all"
+    # 解析模式：priority 按优先级依次询问；race 并发询问所有具备能力的镜像，取最先返回的有效结果
+    MODE_PRIORITY = "priority"
+    MODE_RACE = "race"
+    RACE_TIMEOUT = 15
+    # 竞速下载中第一个镜像完成测速后，再等待其他镜像完成测速的时间（秒）
+    PROBE_GRACE = 2
+    # 竞速下载时，用前 1MB 的吞吐量比较各镜像的速度
+    PROBE_BYTES = 1024 * 1024
+
+    def __init__(self, max_workers=8, journal=None, offline=False, http2=None):
         self.signals = DownloaderSignals()
-        self.bmcl_downloader = BMCLAPIDownloader()
-        self.msl_downloader = MSLAPIDownloader()
+        self.backends = {name: backend_class() for name, backend_class in BACKEND_REGISTRY.items()}
+        self.bmcl_downloader = self.backends["bmcl"]
+        self.msl_downloader = self.backends["msl"]
         self.current_source = "bmcl"  # 默认使用 BMCL
+        self.resolution_mode = self.MODE_PRIORITY
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        # 记录每个核心版本由哪些后端提供，解析下载链接时优先询问它们
+        self._core_version_sources = {}
+        # 记录每个 (MC版本, 服务端类型) 已经询问过核心版本列表的后端
+        self._core_versions_queried = {}
+        # 下载任务日志，用于重启后继续未完成的下载
+        self.journal = journal or JobJournal()
+        # 共享的 Java 运行时目录
+        self.adoptium = AdoptiumMetadata()
+        self.java_runtimes = JavaRuntimeManager(self.adoptium._get_json, log=self.signals.log_message.emit, offline=offline)
+        # 已导入的离线资源包：网络不可用（或 offline 为 True）时从中读取元数据和文件
+        self.bundles = BundleSet()
+        self.offline = offline
+        # 元数据请求的传输：已安装 httpx[http2] 时使用 HTTP/2（http2 为 False 时强制使用 HTTP/1.1 连接池）
+        self.transport = create_transport(http2, pool_size=max(16, max_workers), offline=offline)
         
         # 同步信号
-        self.bmcl_downloader.signals = self.signals
-        self.msl_downloader.signals = self.signals
+        for backend in (*self.backends.values(), self.adoptium):
+            backend.signals = self.signals
+            backend.bundles = self.bundles
+            backend.offline = offline
+            backend.transport = self.transport
+        self.msl_downloader.java_runtimes = self.java_runtimes
     
     def _parse_version_for_sorting(self, version):
         """解析版本号用于排序"""
@@ -597,63 +1352,210 @@ class UnifiedDownloader:
             return [int(part) if part.isdigit() else 0 for part in parts]
         except:
             return [0]
+
+    def source_display_name(self, source=None):
+        source = source or self.current_source
+        if source == self.ALL_SOURCES:
+            return "全部镜像"
+        backend = self.backends.get(source)
+        return backend.DISPLAY_NAME if backend else source
     
     def switch_source(self, source):
         """切换下载源"""
-        if source in ["bmcl", "msl"]:
+        if source in self.backends or source == self.ALL_SOURCES:
             self.current_source = source
-            self.signals.log_message.emit(f"已切换到 {'BMCL API' if source == 'bmcl' else 'MSL API'} 镜像源")
+            self.signals.log_message.emit(f"已切换到 {self.source_display_name()} 镜像源")
         else:
             self.signals.log_message.emit("不支持的下载源")
-    
-    def get_minecraft_versions(self):
-        """获取 Minecraft 版本列表"""
-        if self.current_source == "bmcl":
-            return self.bmcl_downloader.get_minecraft_versions()
+
+    def _capable_backends(self, server_type=None, mc_version=None):
+        """当前下载源中具备相应能力的后端（按优先级排列）"""
+        if self.current_source == self.ALL_SOURCES:
+            candidates = list(self.backends.values())
         else:
-            # MSL API 通过服务端类型获取版本，需要聚合所有服务端类型的版本
+            candidates = [self.backends[self.current_source]]
+        return [backend for backend in candidates if backend.supports(server_type, mc_version)]
+
+    def _fan_out(self, backends, method_name, *args):
+        """
+        并发地在多个后端上调用同一方法，返回 [(后端, 结果)]，顺序与 backends 一致。
+        单个后端时直接在当前线程调用。
+        """
+        if len(backends) == 1:
+            return [(backends[0], getattr(backends[0], method_name)(*args))]
+        futures = {self._executor.submit(bind_token(getattr(backend, method_name)), *args): backend for backend in backends}
+        results = {}
+        for future in as_completed(futures):
+            backend = futures[future]
             try:
-                server_types = self.msl_downloader.get_server_types()
-                if not server_types:
-                    self.signals.log_message.emit("无法获取服务端类型列表")
-                    return []
-                
-                all_versions = set()
-                for server_type in server_types:
-                    versions = self.msl_downloader.get_available_versions(server_type)
-                    all_versions.update(versions)
-                
-                # 转换为列表并排序（版本号降序）
-                version_list = sorted(list(all_versions), key=lambda x: self._parse_version_for_sorting(x), reverse=True)
-                return version_list
+                results[backend.NAME] = future.result()
+            except DownloadCancelled:
+                continue
             except Exception as e:
-                self.signals.log_message.emit(f"获取MSL API版本列表失败: {str(e)}")
-                return []
+                self.signals.log_message.emit(f"{backend.DISPLAY_NAME} 查询失败: {e}")
+        return [(backend, results[backend.NAME]) for backend in backends if backend.NAME in results]
+
+    @staticmethod
+    def _merge_unique(lists):
+        """按顺序合并多个列表并去重"""
+        seen = set()
+        merged = []
+        for items in lists:
+            for item in items or []:
+                if item not in seen:
+                    seen.add(item)
+                    merged.append(item)
+        return merged
+    
+    def _release_order(self, versions):
+        """
+        按发布时间降序排列合并后的版本列表：发布时间取自已解析的版本清单，
+        清单中没有的版本按版本号排在后面。
+        """
+        manifest = None
+        for backend in self.backends.values():
+            manifest = backend.version_manifest()
+            if manifest:
+                break
+        if not manifest:
+            return sorted(versions, key=self._parse_version_for_sorting, reverse=True)
+        known = sorted((v for v in versions if v in manifest), key=manifest.release_time, reverse=True)
+        unknown = sorted((v for v in versions if v not in manifest), key=self._parse_version_for_sorting, reverse=True)
+        return known + unknown
+
+    def get_minecraft_versions(self, channel=RELEASE):
+        """获取指定通道 (release / snapshot / old_beta / old_alpha) 的 Minecraft 版本列表"""
+        backends = [b for b in self._capable_backends() if channel in b.CAPABILITIES.channels]
+        if not backends:
+            return []
+        results = self._fan_out(backends, "get_minecraft_versions", channel)
+        if len(backends) == 1:
+            return results[0][1] if results else []
+        return self._release_order(self._merge_unique(versions for _, versions in results))
+
+    def refresh_compatibility(self, force=False):
+        """刷新各后端兼容性矩阵中过期的列"""
+        for backend in self.backends.values():
+            matrix = getattr(backend, "compat_matrix", None)
+            if matrix is not None:
+                changed = matrix.refresh(force)
+                if changed:
+                    self.signals.log_message.emit(
+                        f"{backend.DISPLAY_NAME} 兼容性矩阵已更新: {', '.join(changed)}"
+                    )
+
+    def get_channels(self):
+        """当前下载源能提供的版本通道"""
+        available = set()
+        for backend in self._capable_backends():
+            available.update(backend.CAPABILITIES.channels)
+        return [channel for channel in CHANNELS if channel in available]
     
     def get_server_types(self, mc_version=None):
         """获取服务端类型"""
-        if self.current_source == "bmcl":
-            return self.bmcl_downloader.get_server_types(mc_version)
-        else:
-            return self.msl_downloader.get_server_types()
+        backends = self._capable_backends(mc_version=mc_version)
+        results = self._fan_out(backends, "get_server_types", mc_version)
+        return self._merge_unique(types for _, types in results)
     
     def get_core_versions(self, mc_version, server_type):
         """获取核心版本"""
-        if self.current_source == "bmcl":
-            return self.bmcl_downloader.get_core_versions(mc_version, server_type)
-        else:
-            return self.msl_downloader.get_server_builds(server_type, mc_version)
+        backends = self._capable_backends(server_type, mc_version)
+        results = self._fan_out(backends, "get_core_versions", mc_version, server_type)
+        self._core_versions_queried.setdefault((mc_version, server_type), set()).update(b.NAME for b, _ in results)
+        for backend, versions in results:
+            for version in versions or []:
+                sources = self._core_version_sources.setdefault((mc_version, server_type, version), [])
+                if backend.NAME not in sources:
+                    sources.append(backend.NAME)
+        return self._merge_unique(versions for _, versions in results)
+
+    def _download_candidates(self, mc_version, server_type, core_version_info):
+        """解析下载链接时询问的后端：提供过该核心版本的后端优先"""
+        backends = self._capable_backends(server_type, mc_version)
+        preferred = self._core_version_sources.get((mc_version, server_type, core_version_info), [])
+        return sorted(backends, key=lambda b: 0 if b.NAME in preferred else 1)
+
+    def set_resolution_mode(self, mode):
+        """设置下载链接的解析模式 (priority / race)"""
+        if mode in (self.MODE_PRIORITY, self.MODE_RACE):
+            self.resolution_mode = mode
+            self.signals.log_message.emit(f"下载链接解析模式: {'竞速' if mode == self.MODE_RACE else '按优先级'}")
+
+    def _race_candidates(self, mc_version, server_type, core_version_info):
+        """
+        竞速模式下询问的后端：所有注册的后端中具备能力的那些，
+        但排除已经询问过核心版本列表、却没有列出该核心版本的后端。
+        """
+        listed = self._core_version_sources.get((mc_version, server_type, core_version_info), [])
+        queried = self._core_versions_queried.get((mc_version, server_type), set())
+        return [
+            backend for backend in self.backends.values()
+            if backend.supports(server_type, mc_version) and (backend.NAME in listed or backend.NAME not in queried)
+        ]
+
+    def _submit_download_info(self, backends, mc_version, server_type, core_version_info, token):
+        return {
+            self._executor.submit(
+                bind_token(backend.get_download_info, token), mc_version, server_type, core_version_info
+            ): backend
+            for backend in backends
+        }
+
+    def _race_download_info(self, mc_version, server_type, core_version_info):
+        """并发询问所有候选后端，返回最先得到的有效下载信息，并取消其余查询"""
+        # 其余查询共用一个子标记：已开始的查询在下一个检查点结束，不再占用线程池
+        race = CancellationToken(current_token())
+        futures = self._submit_download_info(
+            self._race_candidates(mc_version, server_type, core_version_info),
+            mc_version, server_type, core_version_info, race
+        )
+        try:
+            for future in as_completed(futures, timeout=self.RACE_TIMEOUT):
+                info = self._valid_download_info(future, futures[future])
+                if info:
+                    self.signals.log_message.emit(f"竞速解析: {futures[future].DISPLAY_NAME} 最先返回下载链接")
+                    return info
+        except FutureTimeoutError:
+            self.signals.log_message.emit("竞速解析超时")
+        finally:
+            for future in futures:
+                future.cancel()
+            race.cancel()
+        return None
+
+    @staticmethod
+    def _valid_download_info(future, backend):
+        """已完成的下载信息查询的结果，失败或没有链接时返回 None"""
+        try:
+            info = future.result()
+        except Exception:
+            return None
+        if not info or not info.get("url"):
+            return None
+        info["source"] = backend.NAME
+        return info
+
+    def get_download_info(self, mc_version, server_type, core_version_info):
+        """获取下载信息：竞速模式下取最先返回的有效结果，否则按优先级依次询问"""
+        if self.resolution_mode == self.MODE_RACE:
+            return self._race_download_info(mc_version, server_type, core_version_info)
+        for backend in self._download_candidates(mc_version, server_type, core_version_info):
+            info = backend.get_download_info(mc_version, server_type, core_version_info)
+            if info and info.get("url"):
+                info["source"] = backend.NAME
+                return info
+        return None
     
     def get_download_url_and_filename(self, mc_version, server_type, core_version_info):
         """获取下载链接和文件名"""
-        if self.current_source == "bmcl":
-            return self.bmcl_downloader.get_download_url_and_filename(mc_version, server_type, core_version_info)
-        else:
-            return self.msl_downloader.get_download_url_and_filename(server_type, mc_version, core_version_info)
+        info = self.get_download_info(mc_version, server_type, core_version_info)
+        if info:
+            return info["url"], info["file_name"]
+        return None, None
     
     def get_server_description(self, server_type):
         """获取服务端简介信息"""
-        if self.current_source == "msl":
+        if self.current_source in ("msl", self.ALL_SOURCES):
             return self.msl_downloader.get_server_description(server_type)
         else:
             # BMCL API 没有提供服务端简介接口，返回默认描述
@@ -672,36 +1574,310 @@ class UnifiedDownloader:
     
     def get_server_classify(self):
         """获取服务端分类信息（仅MSL API支持）"""
-        if self.current_source == "msl":
+        if self.current_source in ("msl", self.ALL_SOURCES):
             return self.msl_downloader.get_server_classify()
         else:
-            self.signals.log_message.emit("BMCL API 不支持服务端分类功能")
+            self.signals.log_message.emit(f"{self.source_display_name()} 不支持服务端分类功能")
             return {}
     
     def get_java_versions(self):
-        """获取支持的Java版本列表（仅MSL API支持）"""
-        if self.current_source == "msl":
-            return self.msl_downloader.get_java_versions()
-        else:
-            self.signals.log_message.emit("BMCL API 不支持Java版本查询功能")
-            return []
+        """获取可下载的Java版本列表（来自 Adoptium，与当前镜像源无关）"""
+        return self.msl_downloader.get_java_versions()
     
     def get_java_download_url(self, java_version):
-        """获取特定Java版本的下载地址（仅MSL API支持）"""
-        if self.current_source == "msl":
-            return self.msl_downloader.get_java_download_url(java_version)
-        else:
-            self.signals.log_message.emit("BMCL API 不支持Java下载功能")
-            return ""
+        """获取特定Java版本在当前平台上的下载地址"""
+        return self.msl_downloader.get_java_download_url(java_version)
+
+    def required_java(self, mc_version):
+        """运行 mc_version 服务端所需的 Java 主版本（优先使用版本清单中的 javaVersion）"""
+        return required_java_major(mc_version, self.bmcl_downloader.get_version_detail(mc_version))
+
+    def ensure_java(self, mc_version):
+        """确保共享目录中有运行 mc_version 所需的 Java，返回 java 可执行文件路径，失败时返回 None"""
+        return self.java_runtimes.ensure(self.required_java(mc_version))
     
     def get_notice(self):
         """获取公告（仅MSL API支持）"""
-        if self.current_source == "msl":
+        if self.current_source in ("msl", self.ALL_SOURCES):
             return self.msl_downloader.get_notice()
         else:
-            self.signals.log_message.emit("BMCL API 不支持公告查询功能")
+            self.signals.log_message.emit(f"{self.source_display_name()} 不支持公告查询功能")
             return ""
+
+    def request_stats(self):
+        """元数据请求计数：实际请求数、共享的并发请求数和短期缓存命中数"""
+        return REQUEST_FLIGHTS.snapshot()
     
-    def download_file(self, url, dest_folder, file_name):
-        """统一下载方法"""
-        return self.bmcl_downloader.download_file(url, dest_folder, file_name)
+    def download_file(self, url, dest_folder, file_name, expected_sha256=None, source=None, job_id=None,
+                      index_key=None):
+        """
+        统一下载方法。下载会记录在任务日志中（已写入的字节数、期望的 SHA256），
+        中断后再次下载同一文件或调用 resume_pending() 时从断点继续。
+        下载在目标文件的文件锁内进行：多个实例同时下载同一文件时只有一个实际下载，
+        其余等待它完成后直接使用下载好的文件。
+        index_key（StoreIndex.make_key 生成的键）不为 None 时，下载成功后把文件和压缩包元数据记录在
+        dest_folder 的仓库索引中。成功时返回 DownloadResult，失败时返回值为假。
+        """
+        bundle = self.bundles.find_artifact(url)
+        if bundle is not None:
+            result = self._copy_from_bundle(bundle, url, dest_folder, file_name)
+        else:
+            waiting_since = time.time()
+            with lock_for(os.path.join(dest_folder, file_name)):
+                if self._finished_elsewhere(url, dest_folder, file_name, job_id, waiting_since):
+                    return DownloadResult(True, os.path.join(dest_folder, file_name), None)
+                result = self._download_locked(url, dest_folder, file_name, expected_sha256, source, job_id)
+        if result and index_key:
+            self._record_in_index(index_key, url, dest_folder, result, expected_sha256)
+        return result
+
+    def _record_in_index(self, index_key, url, dest_folder, result, sha256=None):
+        """把下载好的文件及其压缩包元数据记录在 dest_folder 的仓库索引中"""
+        store = StoreIndex(dest_folder)
+        store.record(index_key, url, os.path.basename(result.path),
+                     sha256.lower() if sha256 else sha256_of_file(result.path), archive=result.archive)
+        try:
+            store.save()
+        except OSError as e:
+            self.signals.log_message.emit(f"无法更新仓库索引: {e}")
+
+    def _finished_elsewhere(self, url, dest_folder, file_name, job_id, since):
+        """等待文件锁期间，同一文件是否已由其他实例（或本实例的其他线程）下载完成"""
+        file_path = os.path.join(dest_folder, file_name)
+        if not os.path.isfile(file_path):
+            return False
+        job = self.journal.get(job_id) if job_id is not None else None
+        if not (job and job.status == JobJournal.COMPLETED) \
+                and not self.journal.completed_since(url, dest_folder, file_name, since):
+            return False
+        self.signals.log_message.emit(f"{file_name} 已由其他实例下载完成")
+        self.signals.download_finished.emit(file_path, True)
+        return True
+
+    def _download_locked(self, url, dest_folder, file_name, expected_sha256, source, job_id):
+        backend = self.backends.get(source) or self.bmcl_downloader
+        if job_id is None:
+            job_id = self.journal.add(url, dest_folder, file_name, expected_sha256, backend.NAME)
+        job = self.journal.get(job_id)
+        self.journal.mark_active(job_id)
+        token = current_token()
+        success = backend.download_file(
+            url, dest_folder, file_name, job.sha256, offset=job.offset,
+            progress=lambda offset, total, validator: self.journal.update_offset(job_id, offset, total, validator),
+            token=token, validator=job.validator,
+        )
+        cancelled = not success and token is not None and token.cancelled
+        if cancelled and token.resumable:
+            # 因程序退出而取消：保留为排队状态，下次启动时继续
+            self.journal.requeue(job_id)
+        else:
+            self.journal.finish(job_id, bool(success), "cancelled" if cancelled else None)
+        return success
+
+    def _copy_from_bundle(self, bundle, url, dest_folder, file_name):
+        """从离线资源包中取出文件，不访问网络"""
+        file_path = os.path.join(dest_folder, file_name)
+        self.signals.log_message.emit(f"从离线资源包获取: {file_name} ({os.path.basename(bundle.path)})")
+        try:
+            os.makedirs(dest_folder, exist_ok=True)
+            bundle.copy_artifact(
+                url, file_path,
+                progress=lambda done, total: self.signals.progress_update.emit(int(done * 100 / max(total, 1))),
+            )
+        except (OSError, ValueError) as e:
+            self.signals.log_message.emit(f"下载失败: {e}")
+            self.signals.download_finished.emit(file_path, False)
+            return False
+        self.signals.log_message.emit(f"下载完成: {file_name}")
+        self.signals.download_finished.emit(file_path, True)
+        # 导出资源包时记录的压缩包元数据
+        return DownloadResult(True, file_path, bundle.artifacts.get(url, {}).get("archive"))
+
+    def resume_pending(self):
+        """继续任务日志中所有未完成的下载，返回 (成功数, 失败数)"""
+        jobs = self.journal.unfinished()
+        if not jobs:
+            return 0, 0
+        self.signals.log_message.emit(f"发现 {len(jobs)} 个未完成的下载，正在继续...")
+        token = current_token()
+        succeeded = failed = 0
+        for job in jobs:
+            if token is not None and token.cancelled:
+                # 剩下的任务保持排队状态
+                break
+            if self.download_file(job.url, job.dest_folder, job.file_name, job.sha256, job.source, job_id=job.id):
+                succeeded += 1
+            elif token is None or not token.cancelled:
+                failed += 1
+        return succeeded, failed
+
+    def _probe(self, info):
+        """下载前 PROBE_BYTES 字节并测量吞吐量"""
+        backend = self.backends[info["source"]]
+        headers = dict(backend.headers)
+        headers['Range'] = f"bytes=0-{self.PROBE_BYTES - 1}"
+        check_cancelled()
+        start = time.monotonic()
+        response = requests.get(info["url"], headers=headers, stream=True, timeout=10)
+        try:
+            response.raise_for_status()
+            data = bytearray()
+            for chunk in response.iter_content(chunk_size=65536):
+                check_cancelled()
+                data += chunk
+                if len(data) >= self.PROBE_BYTES:
+                    break
+            elapsed = max(time.monotonic() - start, 1e-6)
+            ranged = response.status_code == 206
+            if ranged:
+                content_range = response.headers.get('Content-Range', '')
+                total = int(content_range.rsplit('/', 1)[-1]) if content_range.rsplit('/', 1)[-1].isdigit() else None
+            else:
+                total = int(response.headers.get('content-length', 0)) or None
+            validator = backend._validator(response)
+        finally:
+            response.close()
+        data = bytes(data[:self.PROBE_BYTES])
+        return {
+            "info": info, "data": data, "throughput": len(data) / elapsed, "ranged": ranged, "total": total,
+            "validator": validator,
+        }
+
+    def download_racing(self, mc_version, server_type, core_version_info, dest_folder, file_name=None):
+        """
+        竞速下载：向所有具备能力的镜像解析下载链接，每得到一个链接就开始下载该镜像的前 1MB，
+        选择吞吐量最高的镜像，保留已下载的部分并从该镜像继续下载剩余部分。
+        下载好的文件记录在 dest_folder 的仓库索引中。
+        整个竞速不超过 RACE_TIMEOUT 秒；第一个测速完成后最多再等 PROBE_GRACE 秒，
+        只在此前完成测速的镜像中选择，慢速或卡住的镜像不会拖慢下载。
+        """
+        race = CancellationToken(current_token())
+        try:
+            infos, probes = self._race_probes(mc_version, server_type, core_version_info, race)
+        finally:
+            # 结束仍在进行的查询和测速，不再占用线程池
+            race.cancel()
+        check_cancelled()
+
+        target_path = os.path.join(dest_folder, file_name or "")
+        if not infos:
+            self.signals.log_message.emit("没有镜像返回有效的下载链接")
+            self.signals.download_finished.emit(target_path, False)
+            return False
+        file_name = file_name or infos[0]["file_name"]
+        file_path = os.path.join(dest_folder, file_name)
+        os.makedirs(dest_folder, exist_ok=True)
+        for info in infos:
+            bundle = self.bundles.find_artifact(info["url"])
+            if bundle is not None:
+                result = self._copy_from_bundle(bundle, info["url"], dest_folder, file_name)
+                if result:
+                    index_key = StoreIndex.make_key(info["source"], server_type, mc_version, core_version_info)
+                    self._record_in_index(index_key, info["url"], dest_folder, result, info.get("sha256"))
+                return result
+        if self.offline:
+            self.signals.log_message.emit(f"下载失败: {OfflineError(infos[0]['url'])}")
+            self.signals.download_finished.emit(file_path, False)
+            return False
+        if not probes:
+            self.signals.log_message.emit("所有镜像测速均失败")
+            self.signals.download_finished.emit(file_path, False)
+            return False
+
+        best = max(probes, key=lambda probe: probe["throughput"])
+        info = best["info"]
+        backend = self.backends[info["source"]]
+        self.signals.log_message.emit(
+            f"选择 {backend.DISPLAY_NAME} 下载 (前 1MB 吞吐量 {best['throughput'] / 1024 / 1024:.2f} MB/s)"
+        )
+        waiting_since = time.time()
+        with lock_for(file_path):
+            if self._finished_elsewhere(info["url"], dest_folder, file_name, None, waiting_since):
+                return DownloadResult(True, file_path, None)
+            result = self._finish_racing(best, backend, dest_folder, file_name)
+        if result:
+            index_key = StoreIndex.make_key(info["source"], server_type, mc_version, core_version_info)
+            self._record_in_index(index_key, info["url"], dest_folder, result, info.get("sha256"))
+        return result
+
+    def _race_probes(self, mc_version, server_type, core_version_info, race):
+        """
+        并发解析下载链接并测速，返回 (有效的下载信息列表, 完成的测速结果列表)。
+        离线模式或链接在离线资源包中时不测速。
+        """
+        lookups = self._submit_download_info(
+            self._race_candidates(mc_version, server_type, core_version_info),
+            mc_version, server_type, core_version_info, race
+        )
+        pending = set(lookups)
+        probe_futures = {}
+        infos, probes = [], []
+        deadline = time.monotonic() + self.RACE_TIMEOUT
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            check_cancelled()
+            for future in done:
+                if future in lookups:
+                    info = self._valid_download_info(future, lookups[future])
+                    if not info:
+                        continue
+                    infos.append(info)
+                    if self.offline or self.bundles.find_artifact(info["url"]) is not None:
+                        # 不需要测速；资源包中的文件直接使用，不再等待其他镜像
+                        if not self.offline:
+                            return infos, probes
+                        continue
+                    probe = self._executor.submit(bind_token(self._probe, race), info)
+                    probe_futures[probe] = info
+                    pending.add(probe)
+                    continue
+                try:
+                    probes.append(future.result())
+                except Exception as e:
+                    self.signals.log_message.emit(f"{self.source_display_name(probe_futures[future]['source'])} 测速失败: {e}")
+                    continue
+                if len(probes) == 1:
+                    deadline = min(deadline, time.monotonic() + self.PROBE_GRACE)
+        if pending:
+            self.signals.log_message.emit(f"{len(pending)} 个镜像未在时限内完成解析或测速，已忽略")
+        return infos, probes
+
+    def _finish_racing(self, best, backend, dest_folder, file_name):
+        """在文件锁内写入测速时下载的数据，并继续下载剩余部分"""
+        info = best["info"]
+        file_path = os.path.join(dest_folder, file_name)
+        part_path = f"{file_path}.part"
+        total = best["total"]
+        if total is not None and len(best["data"]) >= total:
+            with open(part_path, 'wb') as file:
+                file.write(best["data"])
+        else:
+            # 保留测速时下载的部分作为断点，从同一镜像继续下载（整个过程记录在任务日志中）
+            job_id = self.journal.add(info["url"], dest_folder, file_name, info.get("sha256"), info["source"])
+            if best["ranged"]:
+                with open(part_path, 'wb') as file:
+                    file.write(best["data"])
+                self.journal.update_offset(job_id, len(best["data"]), total, best["validator"])
+            else:
+                self.journal.update_offset(job_id, 0)
+            return self._download_locked(info["url"], dest_folder, file_name, info.get("sha256"), info["source"], job_id)
+
+        if info.get("sha256") and hashlib.sha256(best["data"]).hexdigest() != info["sha256"].lower():
+            os.remove(part_path)
+            self.signals.log_message.emit(f"SHA256 校验失败: {file_name}")
+            self.signals.download_finished.emit(file_path, False)
+            return False
+        try:
+            archive = backend.check_archive(part_path, file_name)
+        except ValueError as e:
+            self.signals.log_message.emit(f"下载失败: {e}")
+            self.signals.download_finished.emit(file_path, False)
+            return False
+        os.replace(part_path, file_path)
+
+        self.signals.log_message.emit(f"下载完成: {file_name}")
+        self.signals.download_finished.emit(file_path, True)
+        return DownloadResult(True, file_path, archive)
@@ -0,0 +1,196 @@
+import os
+import json
+import shutil
+import zipfile
+import subprocess
+
+from src.libraries import LibraryArtifact, LibraryStore, DependencyResolver, maven_path
+
+
+DEFAULT_LIBRARY_REPO = "https://libraries.minecraft.net/"
+
+
+def _artifact_from_library(library):
+    """
+    将安装器清单中的库条目转换为 LibraryArtifact。
+    新格式 (1.13+) 带有 downloads.artifact；旧格式 (1.12.2 及更早) 只有 name、url 和 checksums。
+    """
+    artifact = library.get("downloads", {}).get("artifact")
+    if artifact:
+        return LibraryArtifact(artifact["path"], artifact.get("url", ""), artifact.get("sha1"), artifact.get("size"))
+    if "name" not in library:
+        return None
+    path = maven_path(library["name"])
+    repo = library.get("url") or DEFAULT_LIBRARY_REPO
+    if not repo.endswith('/'):
+        repo += '/'
+    checksums = library.get("checksums") or [None]
+    return LibraryArtifact(path, repo + path, checksums[0], None)
+
+
+class ServerInstaller:
+    """
+    下载后处理：把下载得到的服务端核心变成可以直接运行的服务端目录。
+
+    - Forge / NeoForge: 读取安装器中的 install_profile.json 与 version.json，
+      先用共享库仓库并行下载（并校验 SHA1）所有依赖库和原版服务端，放入服务端目录，
+      再以无界面模式 (--installServer) 运行安装器。安装器会校验已有文件，不再重复下载。
+    - Fabric: 放入服务端启动器和原版服务端 (server.jar)；已知加载器版本时，
+      通过 DependencyResolver 预先放入 Fabric 配置中列出的库。
+    - 原版: 将服务端放入目录并命名为 server.jar。
+
+    java 为 "auto" 时，运行安装器所用的 Java 按 MC 版本从共享运行时目录获取（需要时自动下载）。
+    """
+    INSTALLER_TYPES = ("forge", "neoforge")
+
+    def __init__(self, downloader, library_store=None, java="java"):
+        self.downloader = downloader
+        self.bmcl = downloader.bmcl_downloader
+        self.signals = downloader.signals
+        self.library_store = library_store or LibraryStore(
+            mirror_base=self.bmcl.BASE_URL, signals=self.signals, offline=downloader.offline
+        )
+        self.java = java
+
+    def read_installer_libraries(self, installer_path):
+        """
+        读取安装器内的清单，返回 (库文件列表, install_profile)。
+        文件不是有效的安装器（压缩包损坏或缺少 install_profile.json）时记录原因并返回 ([], None)。
+        """
+        try:
+            with zipfile.ZipFile(installer_path) as installer:
+                names = set(installer.namelist())
+                profile = json.loads(installer.read("install_profile.json"))
+                version = {}
+                version_json = profile.get("json", "/version.json").lstrip('/')
+                if "versionInfo" not in profile and version_json in names:
+                    version = json.loads(installer.read(version_json))
+        except KeyError:
+            self.signals.log_message.emit(f"{os.path.basename(installer_path)} 中没有 install_profile.json，不是有效的安装器")
+            return [], None
+        except (zipfile.BadZipFile, ValueError, OSError) as e:
+            self.signals.log_message.emit(f"无法读取安装器 {os.path.basename(installer_path)}: {e}")
+            return [], None
+
+        if "versionInfo" in profile:
+            # 旧格式：只有 serverreq 的库是服务端需要的
+            libraries = [library for library in profile["versionInfo"].get("libraries", []) if library.get("serverreq")]
+        else:
+            libraries = profile.get("libraries", []) + version.get("libraries", [])
+        artifacts = [_artifact_from_library(library) for library in libraries]
+        return [artifact for artifact in artifacts if artifact], profile
+
+    def vanilla_server_artifact(self, mc_version):
+        """原版服务端作为一个库文件，保存在共享仓库的 net/minecraft/server 下"""
+        detail = self.bmcl.get_version_detail(mc_version)
+        server = (detail or {}).get("downloads", {}).get("server")
+        if not server:
+            return None
+        path = f"net/minecraft/server/{mc_version}/server-{mc_version}.jar"
+        return LibraryArtifact(path, server["url"], server.get("sha1"), server.get("size"))
+
+    def _place(self, source, target):
+        if os.path.exists(target):
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+
+    def _prepare_vanilla(self, mc_version):
+        artifact = self.vanilla_server_artifact(mc_version)
+        if not artifact or not self.library_store.fetch(artifact):
+            self.signals.log_message.emit(f"无法获取 {mc_version} 的原版服务端")
+            return None
+        return artifact
+
+    def _java_for(self, mc_version):
+        if self.java != "auto":
+            return self.java
+        return self.downloader.ensure_java(mc_version)
+
+    def _install_with_installer(self, mc_version, installer_path, server_dir):
+        artifacts, profile = self.read_installer_libraries(installer_path)
+        if profile is None:
+            return False
+        mc_version = profile.get("minecraft") or profile.get("install", {}).get("minecraft") or mc_version
+        java = self._java_for(mc_version)
+        if not java:
+            self.signals.log_message.emit(f"无法准备 Minecraft {mc_version} 所需的 Java")
+            return False
+
+        vanilla = self._prepare_vanilla(mc_version)
+        if vanilla:
+            server_jar_path = profile.get("serverJarPath")
+            if server_jar_path:
+                relative = server_jar_path.replace("{LIBRARY_DIR}/", "").replace("{MINECRAFT_VERSION}", mc_version)
+                self._place(self.library_store.path_of(vanilla), os.path.join(server_dir, "libraries", relative))
+            else:
+                self._place(self.library_store.path_of(vanilla), os.path.join(server_dir, f"minecraft_server.{mc_version}.jar"))
+
+        failed = self.library_store.fetch_all(artifacts)
+        libraries_dir = os.path.join(server_dir, "libraries")
+        failed_paths = {artifact.path for artifact in failed}
+        for artifact in artifacts:
+            if artifact.url and artifact.path not in failed_paths:
+                self.library_store.link_into(artifact, libraries_dir)
+        if failed:
+            self.signals.log_message.emit(f"{len(failed)} 个库文件预取失败，将由安装器自行下载")
+
+        return self._run_installer(installer_path, server_dir, java)
+
+    def _run_installer(self, installer_path, server_dir, java):
+        command = [java, "-jar", os.path.abspath(installer_path), "--installServer", os.path.abspath(server_dir)]
+        self.signals.log_message.emit(f"正在运行安装器: {os.path.basename(installer_path)}")
+        try:
+            process = subprocess.Popen(
+                command, cwd=server_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                text=True, errors="replace"
+            )
+        except OSError as e:
+            self.signals.log_message.emit(f"无法启动 Java: {e}")
+            return False
+        for line in process.stdout:
+            line = line.rstrip()
+            if line:
+                self.signals.log_message.emit(line)
+        if process.wait() != 0:
+            self.signals.log_message.emit(f"安装器退出码: {process.returncode}")
+            return False
+        return True
+
+    def _install_fabric(self, mc_version, launcher_path, server_dir, loader_version=None):
+        vanilla = self._prepare_vanilla(mc_version)
+        if not vanilla:
+            return False
+        if loader_version:
+            resolver = DependencyResolver(self.downloader, self.library_store)
+            root = resolver.add_fabric(mc_version, loader_version)
+            if root:
+                resolver.fetch_missing()
+                resolver.link_into(root, os.path.join(server_dir, "libraries"))
+        self._place(launcher_path, os.path.join(server_dir, os.path.basename(launcher_path)))
+        self._place(self.library_store.path_of(vanilla), os.path.join(server_dir, "server.jar"))
+        with open(os.path.join(server_dir, "fabric-server-launcher.properties"), 'w', encoding='utf-8') as f:
+            f.write("serverJar=server.jar\n")
+        return True
+
+    def install(self, server_type, mc_version, jar_path, server_dir, core_version=None):
+        """
+        根据服务端类型，将已下载的 jar 处理为可运行的服务端目录，成功返回 True。
+        core_version 为核心版本（Fabric 为加载器版本），可选。
+        """
+        os.makedirs(server_dir, exist_ok=True)
+        server_type = server_type.lower()
+        if server_type in self.INSTALLER_TYPES:
+            success = self._install_with_installer(mc_version, jar_path, server_dir)
+        elif server_type == "fabric":
+            success = self._install_fabric(mc_version, jar_path, server_dir, core_version)
+        else:
+            self._place(jar_path, os.path.join(server_dir, "server.jar"))
+            success = True
+        self.signals.log_message.emit(
+            f"服务端目录{'已就绪' if success else '准备失败'}: {os.path.abspath(server_dir)}"
+        )
+        return success
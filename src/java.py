@@ -0,0 +1,348 @@
+import io
+import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+import tarfile
+import zipfile
+import platform
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from src.cancellation import bind_token, check_cancelled
+from src.locking import lock_for
+from src.paths import data_path
+from src.transport import OfflineError
+
+
+# 版本清单中没有 javaVersion 字段（旧版本或镜像未提供）时，按 MC 版本推断所需的 Java 主版本：
+# (最低 MC 版本, Java 主版本)，从新到旧排列
+JAVA_REQUIREMENTS = (
+    ((1, 20, 5), 21),
+    ((1, 18), 17),
+    ((1, 17), 16),
+    ((0,), 8),
+)
+
+
+def _version_tuple(mc_version):
+    match = re.match(r'^(\d+(?:\.\d+)*)', mc_version or "")
+    return tuple(int(part) for part in match.group(1).split('.')) if match else None
+
+
+def required_java_major(mc_version, version_detail=None):
+    """
+    返回运行 mc_version 服务端所需的 Java 主版本。
+    优先使用版本详情 (version.json) 中的 javaVersion.majorVersion，没有时查 JAVA_REQUIREMENTS；
+    快照等无法解析的版本号按最新要求处理。
+    """
+    major = ((version_detail or {}).get("javaVersion") or {}).get("majorVersion")
+    if major:
+        return int(major)
+    version = _version_tuple(mc_version)
+    if version is None:
+        return JAVA_REQUIREMENTS[0][1]
+    for minimum, major in JAVA_REQUIREMENTS:
+        if version >= minimum:
+            return major
+    return JAVA_REQUIREMENTS[-1][1]
+
+
+def parse_java_major(java_version):
+    """把 "Java17"、"17"、17 等写法转换为主版本号"""
+    match = re.search(r'(\d+)', str(java_version))
+    return int(match.group(1)) if match else None
+
+
+def current_platform():
+    """返回 Adoptium API 使用的 (操作系统, 架构)"""
+    if sys.platform.startswith("win"):
+        system = "windows"
+    elif sys.platform == "darwin":
+        system = "mac"
+    else:
+        system = "linux"
+    machine = platform.machine().lower()
+    arch = "aarch64" if machine in ("aarch64", "arm64") else "x64"
+    return system, arch
+
+
+class _ChunkReader(io.RawIOBase):
+    """把按顺序到达的数据块包装成只读文件对象，供 tarfile 流式读取，同时计算 SHA256"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self.digest.update(chunk)
+            self.size += len(chunk)
+            self._buffer = chunk
+        count = min(len(target), len(self._buffer))
+        target[:count] = self._buffer[:count]
+        self._buffer = self._buffer[count:]
+        return count
+
+    def close(self):
+        # 提前结束时停止仍在进行的分段下载
+        close = getattr(self._chunks, "close", None)
+        if close:
+            close()
+        super().close()
+
+
+class JavaRuntimeManager:
+    """
+    Java 运行时管理：按 Minecraft 版本确定所需的 Java 主版本，从 Adoptium (Eclipse Temurin) 获取对应的 JRE，
+    解压到共享的运行时目录 (runtimes/java-<主版本>-<系统>-<架构>)，多个服务端目录共用同一份运行时。
+
+    下载时把文件分成 SEGMENT_SIZE 大小的段，用 Range 请求并行获取，按顺序直接送入解压器，
+    同时计算 SHA256，不写临时压缩包；校验通过后才把解压目录改名为正式目录，
+    因此运行时目录中只会出现完整且校验过的运行时。服务器不支持 Range 时退回单连接流式下载。
+    """
+    ADOPTIUM_API = "https://api.adoptium.net/v3"
+    VENDOR = "eclipse"
+    SEGMENT_SIZE = 8 * 1024 * 1024
+    MARKER_FILE = ".runtime.json"
+
+    def __init__(self, get_json, root=None, log=None, max_workers=4, api_base=None, offline=False):
+        self.get_json = get_json
+        # 离线模式下只使用已安装的运行时，需要下载时直接失败
+        self.offline = offline
+        self.root = root or data_path("runtimes")
+        self.log = log or (lambda message: None)
+        self.max_workers = max(1, max_workers)
+        self.api_base = (api_base or self.ADOPTIUM_API).rstrip('/')
+        self.system, self.arch = current_platform()
+
+    # --- 查询 ---
+
+    def available_majors(self):
+        """Adoptium 提供的 Java 主版本列表（从新到旧），获取失败时返回空列表"""
+        data = self.get_json(f"{self.api_base}/info/available_releases")
+        if not data:
+            return []
+        return sorted(data.get("available_releases", []), reverse=True)
+
+    def _lts_majors(self):
+        data = self.get_json(f"{self.api_base}/info/available_releases")
+        return sorted((data or {}).get("available_lts_releases", []))
+
+    def _query_package(self, major, image_type):
+        data = self.get_json(
+            f"{self.api_base}/assets/latest/{major}/hotspot",
+            params={"architecture": self.arch, "image_type": image_type, "os": self.system, "vendor": self.VENDOR},
+        )
+        for asset in data or []:
+            package = asset.get("binary", {}).get("package")
+            if package and package.get("link"):
+                return {
+                    "major": major,
+                    "release": asset.get("release_name") or package["name"],
+                    "url": package["link"],
+                    "file_name": package["name"],
+                    "sha256": package.get("checksum"),
+                    "size": package.get("size"),
+                }
+        return None
+
+    def package(self, major):
+        """
+        返回当前平台上 major 版本的下载信息 (url、file_name、sha256、size、release)，优先 JRE，没有时用 JDK。
+        该版本没有构建时（例如某些平台上的 Java 16），改用更高的最近一个 LTS 版本。
+        """
+        candidates = [major] + [lts for lts in self._lts_majors() if lts > major][:1]
+        for candidate in candidates:
+            for image_type in ("jre", "jdk"):
+                package = self._query_package(candidate, image_type)
+                if package:
+                    if candidate != major:
+                        self.log(f"Adoptium 没有 Java {major} 的构建，改用 Java {candidate}")
+                    return package
+        return None
+
+    # --- 本地运行时 ---
+
+    def runtime_dir(self, major):
+        return os.path.join(self.root, f"java-{major}-{self.system}-{self.arch}")
+
+    @staticmethod
+    def _find_executable(directory):
+        name = "java.exe" if sys.platform.startswith("win") else "java"
+        for current, dirs, files in os.walk(directory):
+            if name in files and os.path.basename(current) == "bin":
+                return os.path.join(current, name)
+        return None
+
+    def installed(self, major):
+        """已安装时返回运行时信息（包含 java 可执行文件路径），否则返回 None"""
+        marker = os.path.join(self.runtime_dir(major), self.MARKER_FILE)
+        try:
+            with open(marker, 'r', encoding='utf-8') as f:
+                runtime = json.load(f)
+        except (OSError, ValueError):
+            return None
+        java = os.path.join(self.runtime_dir(major), runtime.get("java", ""))
+        return dict(runtime, java=java) if os.path.isfile(java) else None
+
+    def list_installed(self):
+        runtimes = []
+        if not os.path.isdir(self.root):
+            return runtimes
+        for name in sorted(os.listdir(self.root)):
+            match = re.match(rf'^java-(\d+)-{self.system}-{self.arch}$', name)
+            runtime = self.installed(int(match.group(1))) if match else None
+            if runtime:
+                runtimes.append(runtime)
+        return runtimes
+
+    def ensure(self, major):
+        """
+        确保 major 版本的运行时已安装，返回 java 可执行文件的路径；失败时返回 None。
+        以文件锁保护，多个实例同时需要同一个运行时时只有一个下载，其余等待后直接使用。
+        """
+        with lock_for(self.runtime_dir(major)):
+            runtime = self.installed(major)
+            if runtime:
+                return runtime["java"]
+            package = self.package(major)
+            if not package:
+                self.log(f"未找到适用于 {self.system}/{self.arch} 的 Java {major}")
+                return None
+            self.log(f"正在下载 Java {major} 运行时: {package['release']} "
+                     f"({(package['size'] or 0) / 1024 / 1024:.1f} MB)")
+            try:
+                java = self._install(major, package)
+            except (requests.exceptions.RequestException, OSError, ValueError, tarfile.TarError, zipfile.BadZipFile) as e:
+                self.log(f"Java {major} 运行时安装失败: {e}")
+                return None
+            self.log(f"Java {major} 运行时已就绪: {java}")
+            return java
+
+    # --- 下载与解压 ---
+
+    def _fetch_range(self, url, start, end):
+        response = requests.get(url, headers={"Range": f"bytes={start}-{end}"}, timeout=30)
+        response.raise_for_status()
+        if response.status_code != 206 or len(response.content) != end - start + 1:
+            raise ValueError(f"分段下载失败 (bytes={start}-{end})")
+        return response.content
+
+    def _segments(self, url, total):
+        """按顺序产出各段数据；同时最多有 max_workers 个段在下载"""
+        ranges = iter([(start, min(start + self.SEGMENT_SIZE, total) - 1) for start in range(0, total, self.SEGMENT_SIZE)])
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        pending = deque()
+        try:
+            for _ in range(self.max_workers):
+                span = next(ranges, None)
+                if span:
+                    pending.append(executor.submit(bind_token(self._fetch_range), url, *span))
+            while pending:
+                data = pending.popleft().result()
+                span = next(ranges, None)
+                if span:
+                    pending.append(executor.submit(bind_token(self._fetch_range), url, *span))
+                check_cancelled()
+                yield data
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _stream(self, url):
+        """单连接流式下载（服务器不支持 Range 时使用）"""
+        with requests.get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                check_cancelled()
+                yield chunk
+
+    def _chunks(self, package):
+        url, size = package["url"], package.get("size")
+        if self.offline:
+            raise OfflineError(url)
+        if size and size > self.SEGMENT_SIZE:
+            probe = requests.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=30)
+            probe.close()
+            if probe.status_code == 206:
+                # 后续分段直接请求重定向后的地址
+                return self._segments(probe.url, size)
+        return self._stream(url)
+
+    @staticmethod
+    def _safe_name(name):
+        parts = name.replace('\\', '/').split('/')
+        return not name.startswith(('/', '\\')) and ':' not in parts[0] and '..' not in parts
+
+    def _extract_tar(self, stream, staging):
+        options = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+        with tarfile.open(fileobj=stream, mode="r|gz") as archive:
+            for member in archive:
+                check_cancelled()
+                if not self._safe_name(member.name):
+                    raise ValueError(f"压缩包中包含不安全的路径: {member.name}")
+                archive.extract(member, staging, **options)
+        # 读完 tar 结尾的填充块，使校验覆盖整个文件
+        while stream.read(1024 * 1024):
+            pass
+
+    def _extract_zip(self, archive, staging):
+        for name in archive.namelist():
+            if not self._safe_name(name):
+                raise ValueError(f"压缩包中包含不安全的路径: {name}")
+        archive.extractall(staging)
+
+    @staticmethod
+    def _verify(reader, package):
+        if package["sha256"] and reader.digest.hexdigest() != package["sha256"].lower():
+            raise ValueError(f"SHA256 校验失败 (期望 {package['sha256']})")
+
+    def _install(self, major, package):
+        target = self.runtime_dir(major)
+        staging = f"{target}.staging-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        stream = None
+        try:
+            reader = _ChunkReader(self._chunks(package))
+            stream = io.BufferedReader(reader, buffer_size=1024 * 1024)
+            if package["file_name"].endswith(".zip"):
+                # zip 的目录在文件末尾，无法边下载边解压；数据保留在内存中，同样不写临时文件
+                with zipfile.ZipFile(io.BytesIO(stream.read())) as archive:
+                    self._verify(reader, package)
+                    self._extract_zip(archive, staging)
+            else:
+                # tar.gz 边下载边解压，校验在读完整个文件后进行；失败时解压目录会被删除
+                self._extract_tar(stream, staging)
+                self._verify(reader, package)
+
+            java = self._find_executable(staging)
+            if not java:
+                raise ValueError("运行时中没有找到 java 可执行文件")
+            runtime = {
+                "major": package["major"],
+                "release": package["release"],
+                "sha256": package["sha256"],
+                "java": os.path.relpath(java, staging),
+            }
+            with open(os.path.join(staging, self.MARKER_FILE), 'w', encoding='utf-8') as f:
+                json.dump(runtime, f, ensure_ascii=False, indent=1)
+            shutil.rmtree(target, ignore_errors=True)
+            os.replace(staging, target)
+        finally:
+            if stream is not None:
+                stream.close()
+            shutil.rmtree(staging, ignore_errors=True)
+        return os.path.join(target, runtime["java"])
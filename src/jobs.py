@@ -0,0 +1,153 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import namedtuple
+
+from src.paths import cache_path
+
+
+# 一个下载任务：目标位置、期望的 SHA256、当前状态、已写入 .part 文件的字节数，
+# 以及写入这些字节时服务器返回的 ETag 或 Last-Modified（继续下载时作为 If-Range 发送）
+Job = namedtuple(
+    "Job",
+    ["id", "url", "dest_folder", "file_name", "sha256", "source", "status", "offset", "total_size", "error", "updated_at",
+     "validator"],
+)
+
+
+class JobJournal:
+    """
+    下载任务日志：用 SQLite 持久化记录排队中、进行中和已完成的下载，
+    包括已写入的字节偏移和期望的校验码。
+    程序被关闭或崩溃后，再次启动（或命令行模式）时可以根据日志从中断处继续下载。
+
+    offset 只在 .part 文件刷新到磁盘之后才更新，因此 offset 之前的内容总是可信的。
+    """
+    QUEUED = "queued"
+    ACTIVE = "active"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    UNFINISHED = (QUEUED, ACTIVE)
+    _COLUMNS = "id, url, dest_folder, file_name, sha256, source, status, offset, total_size, error, updated_at, validator"
+
+    def __init__(self, path=None):
+        self.path = path = path or cache_path("jobs.db")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " url TEXT NOT NULL,"
+                " dest_folder TEXT NOT NULL,"
+                " file_name TEXT NOT NULL,"
+                " sha256 TEXT,"
+                " source TEXT,"
+                " status TEXT NOT NULL,"
+                " offset INTEGER NOT NULL DEFAULT 0,"
+                " total_size INTEGER,"
+                " error TEXT,"
+                " created_at INTEGER NOT NULL,"
+                " updated_at INTEGER NOT NULL,"
+                " validator TEXT)"
+            )
+            # 旧版本创建的日志没有 validator 列
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "validator" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN validator TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [Job(*row) for row in rows]
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params)
+
+    def add(self, url, dest_folder, file_name, sha256=None, source=None):
+        """
+        加入一个排队中的下载任务，返回任务 ID。
+        同一目标文件已有未完成或失败的任务时沿用该任务（并更新链接和校验码），
+        这样重试失败的下载也能从已写入的位置继续。
+        """
+        now = int(time.time())
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id, url, sha256 FROM jobs WHERE dest_folder = ? AND file_name = ? AND status IN (?, ?, ?)"
+                " ORDER BY id DESC",
+                (dest_folder, file_name, *self.UNFINISHED, self.FAILED),
+            ).fetchone()
+            if row:
+                job_id, old_url, old_sha256 = row
+                # 来源内容变了，之前写入的部分不能再用
+                reset = old_url != url or (sha256 and old_sha256 and sha256.lower() != old_sha256.lower())
+                self._conn.execute(
+                    "UPDATE jobs SET url = ?, sha256 = ?, source = ?, status = ?, updated_at = ?"
+                    + (", offset = 0, total_size = NULL, validator = NULL" if reset else "") + " WHERE id = ?",
+                    (url, sha256 or old_sha256, source, self.QUEUED, now, job_id),
+                )
+                return job_id
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (url, dest_folder, file_name, sha256, source, status, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, dest_folder, file_name, sha256, source, self.QUEUED, now, now),
+            )
+            return cursor.lastrowid
+
+    def get(self, job_id):
+        rows = self._query(f"SELECT {self._COLUMNS} FROM jobs WHERE id = ?", (job_id,))
+        return rows[0] if rows else None
+
+    def mark_active(self, job_id):
+        self._execute(
+            "UPDATE jobs SET status = ?, error = NULL, updated_at = ? WHERE id = ?",
+            (self.ACTIVE, int(time.time()), job_id),
+        )
+
+    def update_offset(self, job_id, offset, total_size=None, validator=None):
+        """记录已经刷新到磁盘的字节数，以及这些字节对应的 ETag 或 Last-Modified"""
+        self._execute(
+            "UPDATE jobs SET offset = ?, total_size = COALESCE(?, total_size), validator = COALESCE(?, validator),"
+            " updated_at = ? WHERE id = ?",
+            (offset, total_size, validator, int(time.time()), job_id),
+        )
+
+    def requeue(self, job_id):
+        """把任务放回队列（例如程序退出时被中断），下次启动时继续"""
+        self._execute(
+            "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+            (self.QUEUED, int(time.time()), job_id),
+        )
+
+    def finish(self, job_id, success, error=None):
+        self._execute(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+            (self.COMPLETED if success else self.FAILED, error, int(time.time()), job_id),
+        )
+
+    def completed_since(self, url, dest_folder, file_name, since):
+        """since（时间戳）之后是否有同一链接、同一目标文件的任务已完成（例如由另一个实例完成）"""
+        return bool(self._query(
+            f"SELECT {self._COLUMNS} FROM jobs WHERE url = ? AND dest_folder = ? AND file_name = ?"
+            " AND status = ? AND updated_at >= ? LIMIT 1",
+            (url, dest_folder, file_name, self.COMPLETED, int(since)),
+        ))
+
+    def unfinished(self):
+        """未完成（排队中或中断时仍在进行）的任务，按加入顺序排列"""
+        return self._query(
+            f"SELECT {self._COLUMNS} FROM jobs WHERE status IN (?, ?) ORDER BY id", self.UNFINISHED
+        )
+
+    def recent(self, limit=20):
+        return self._query(f"SELECT {self._COLUMNS} FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
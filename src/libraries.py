@@ -0,0 +1,283 @@
+import os
+import sys
+import shutil
+import hashlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from src.cancellation import bind_token, check_cancelled
+from src.locking import lock_for
+from src.paths import data_path
+from src.transport import OfflineError
+
+
+# 一个库文件：Maven 布局下的相对路径、下载链接、SHA1 与大小（未知时为 None）
+LibraryArtifact = namedtuple("LibraryArtifact", ["path", "url", "sha1", "size"])
+
+# 这些 Maven 仓库在 BMCL API 的 /maven 下有镜像
+MIRRORED_MAVEN_REPOS = (
+    "https://libraries.minecraft.net/",
+    "https://maven.minecraftforge.net/",
+    "https://files.minecraftforge.net/maven/",
+    "https://maven.neoforged.net/releases/",
+    "https://maven.fabricmc.net/",
+)
+
+
+def maven_path(coordinate):
+    """
+    将 Maven 坐标转换为仓库中的相对路径。
+    例如 "net.minecraftforge:forge:1.20.1-47.1.0:universal@zip"
+    -> "net/minecraftforge/forge/1.20.1-47.1.0/forge-1.20.1-47.1.0-universal.zip"
+    """
+    extension = "jar"
+    if '@' in coordinate:
+        coordinate, extension = coordinate.split('@', 1)
+    parts = coordinate.split(':')
+    group, artifact, version = parts[0], parts[1], parts[2]
+    classifier = f"-{parts[3]}" if len(parts) > 3 else ""
+    return f"{group.replace('.', '/')}/{artifact}/{version}/{artifact}-{version}{classifier}.{extension}"
+
+
+def sha1_of_file(file_path, chunk_size=1024 * 1024):
+    """计算文件的 SHA1 校验码"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LibraryStore:
+    """
+    共享库文件仓库：按 Maven 布局保存安装器和服务端依赖的库文件，
+    多个服务端目录共用同一份文件（通过硬链接放入各服务端目录，跨分区时复制）。
+    下载使用有上限的线程池并行进行，每个文件都会校验 SHA1。
+    """
+
+    def __init__(self, root=None, mirror_base=None, signals=None, max_workers=8, offline=False):
+        self.root = root or data_path("libraries")
+        # 离线模式下仓库中没有的库文件直接失败，不访问网络
+        self.offline = offline
+        self.mirror_base = mirror_base.rstrip('/') if mirror_base else None
+        self.signals = signals
+        self.max_workers = max_workers
+
+    def _log(self, message):
+        if self.signals:
+            self.signals.log_message.emit(message)
+
+    def path_of(self, artifact):
+        return os.path.join(self.root, *artifact.path.split('/'))
+
+    def candidate_urls(self, artifact):
+        """优先使用镜像地址，镜像失败时回退到原始地址"""
+        urls = []
+        if self.mirror_base:
+            for repo in MIRRORED_MAVEN_REPOS:
+                if artifact.url.startswith(repo):
+                    urls.append(f"{self.mirror_base}/maven/{artifact.url[len(repo):]}")
+                    break
+        urls.append(artifact.url)
+        return urls
+
+    def is_valid(self, artifact):
+        file_path = self.path_of(artifact)
+        if not os.path.isfile(file_path):
+            return False
+        if artifact.size is not None and os.path.getsize(file_path) != artifact.size:
+            return False
+        if artifact.sha1:
+            return sha1_of_file(file_path) == artifact.sha1.lower()
+        return True
+
+    def _download(self, url, file_path, expected_sha1):
+        if self.offline:
+            raise OfflineError(url)
+        part_path = f"{file_path}.part"
+        digest = hashlib.sha1()
+        check_cancelled()
+        try:
+            with requests.get(url, stream=True, timeout=30) as response:
+                response.raise_for_status()
+                with open(part_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=65536):
+                        check_cancelled()
+                        if chunk:
+                            f.write(chunk)
+                            digest.update(chunk)
+            if expected_sha1 and digest.hexdigest() != expected_sha1.lower():
+                raise ValueError(f"SHA1 不匹配 (期望 {expected_sha1}, 实际 {digest.hexdigest()})")
+            os.replace(part_path, file_path)
+        except BaseException:
+            # 库文件很小，失败或取消时不保留 .part，下次重新下载
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+            raise
+
+    def fetch(self, artifact):
+        """确保库文件存在且校验通过，返回其在仓库中的路径；失败时返回 None"""
+        file_path = self.path_of(artifact)
+        # 同一个库可能同时出现在多个清单中，也可能被其他实例同时获取，保证只下载一次
+        with lock_for(file_path):
+            if self.is_valid(artifact):
+                return file_path
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            for url in self.candidate_urls(artifact):
+                try:
+                    self._download(url, file_path, artifact.sha1)
+                    return file_path
+                except (requests.exceptions.RequestException, ValueError, OSError) as e:
+                    self._log(f"下载库文件失败: {url} - {e}")
+        return None
+
+    def fetch_all(self, artifacts):
+        """
+        并行获取一组库文件（按路径去重），返回获取失败的库文件列表。
+        """
+        unique = list({artifact.path: artifact for artifact in artifacts if artifact.url}.values())
+        if not unique:
+            return []
+        self._log(f"正在并行获取 {len(unique)} 个库文件...")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(bind_token(self.fetch), unique))
+        failed = [artifact for artifact, result in zip(unique, results) if result is None]
+        self._log(f"库文件获取完成: 成功 {len(unique) - len(failed)} 个, 失败 {len(failed)} 个")
+        return failed
+
+    def link_into(self, artifact, libraries_dir):
+        """将仓库中的库文件放入服务端目录的 libraries 下（优先硬链接）"""
+        source = self.path_of(artifact)
+        target = os.path.join(libraries_dir, *artifact.path.split('/'))
+        if os.path.exists(target):
+            return target
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+        return target
+
+
+def _current_os_name():
+    if sys.platform.startswith("win"):
+        return "windows"
+    if sys.platform == "darwin":
+        return "osx"
+    return "linux"
+
+
+def rules_allow(rules, os_name=None):
+    """按照 Mojang 版本清单的 rules 规则判断库是否适用于当前系统（忽略带 features 的规则）"""
+    if not rules:
+        return True
+    os_name = os_name or _current_os_name()
+    allowed = False
+    for rule in rules:
+        if rule.get("features"):
+            continue
+        rule_os = rule.get("os", {}).get("name")
+        if rule_os and rule_os != os_name:
+            continue
+        allowed = rule.get("action") == "allow"
+    return allowed
+
+
+class DependencyResolver:
+    """
+    依赖解析：遍历原版版本清单和 Fabric 服务端配置中的库列表，构建完整的依赖图，
+    对多个版本之间共用的库去重，然后交给 LibraryStore 以有上限的线程池下载缺失的库。
+
+    依赖图以 "根" (例如 "vanilla:1.20.1"、"fabric:1.20.1:0.15.0") 为起点，
+    graph 记录 根 -> 库路径集合，artifacts 记录 库路径 -> LibraryArtifact。
+    """
+
+    def __init__(self, downloader, library_store=None):
+        self.bmcl = downloader.bmcl_downloader
+        self.signals = downloader.signals
+        self.library_store = library_store or LibraryStore(
+            mirror_base=self.bmcl.BASE_URL, signals=self.signals, offline=downloader.offline
+        )
+        self.graph = {}
+        self.artifacts = {}
+
+    def _add(self, root, artifact):
+        if not artifact or not artifact.url:
+            return
+        known = self.artifacts.get(artifact.path)
+        # 同一个库在不同清单中出现时，保留带有校验信息的那一条
+        if known is None or (not known.sha1 and artifact.sha1):
+            self.artifacts[artifact.path] = artifact
+        self.graph.setdefault(root, set()).add(artifact.path)
+
+    def add_vanilla(self, mc_version):
+        """加入原版服务端及其版本清单中适用于当前系统的库"""
+        root = f"vanilla:{mc_version}"
+        detail = self.bmcl.get_version_detail(mc_version)
+        if not detail:
+            self.signals.log_message.emit(f"无法获取 {mc_version} 的版本清单")
+            return None
+        self.graph.setdefault(root, set())
+        server = detail.get("downloads", {}).get("server")
+        if server:
+            path = f"net/minecraft/server/{mc_version}/server-{mc_version}.jar"
+            self._add(root, LibraryArtifact(path, server["url"], server.get("sha1"), server.get("size")))
+        for library in detail.get("libraries", []):
+            if not rules_allow(library.get("rules")):
+                continue
+            artifact = library.get("downloads", {}).get("artifact")
+            if artifact:
+                self._add(root, LibraryArtifact(artifact["path"], artifact["url"], artifact.get("sha1"), artifact.get("size")))
+        return root
+
+    def add_fabric(self, mc_version, loader_version):
+        """加入 Fabric 服务端配置 (profile JSON) 中列出的库"""
+        root = f"fabric:{mc_version}:{loader_version}"
+        profile = self.bmcl._get_json(
+            f"{self.bmcl.BASE_URL}/fabric-meta/v2/versions/loader/{mc_version}/{loader_version}/server/json"
+        )
+        if not profile:
+            self.signals.log_message.emit(f"无法获取 Fabric {mc_version} {loader_version} 的配置")
+            return None
+        self.graph.setdefault(root, set())
+        for library in profile.get("libraries", []):
+            path = maven_path(library["name"])
+            repo = library.get("url") or "https://maven.fabricmc.net/"
+            if not repo.endswith('/'):
+                repo += '/'
+            self._add(root, LibraryArtifact(path, repo + path, library.get("sha1"), library.get("size")))
+        return root
+
+    def libraries_of(self, root):
+        return [self.artifacts[path] for path in sorted(self.graph.get(root, ()))]
+
+    def shared_count(self):
+        """被两个及以上根共用的库数量"""
+        counts = {}
+        for paths in self.graph.values():
+            for path in paths:
+                counts[path] = counts.get(path, 0) + 1
+        return sum(1 for count in counts.values() if count > 1)
+
+    def missing(self):
+        """共享仓库中尚不存在（或校验失败）的库"""
+        return [artifact for artifact in self.artifacts.values() if not self.library_store.is_valid(artifact)]
+
+    def fetch_missing(self):
+        """下载所有缺失的库，返回下载失败的库列表"""
+        missing = self.missing()
+        self.signals.log_message.emit(
+            f"依赖图: {len(self.graph)} 个根, {len(self.artifacts)} 个不同的库 "
+            f"(其中 {self.shared_count()} 个被共用), 缺失 {len(missing)} 个"
+        )
+        return self.library_store.fetch_all(missing)
+
+    def link_into(self, root, libraries_dir):
+        """将某个根的所有库放入服务端目录的 libraries 下"""
+        for artifact in self.libraries_of(root):
+            if self.library_store.is_valid(artifact):
+                self.library_store.link_into(artifact, libraries_dir)
@@ -0,0 +1,87 @@
+import os
+import time
+import hashlib
+
+from src.cancellation import check_cancelled
+from src.paths import data_path
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+class LockTimeout(Exception):
+    """在指定时间内没有获得文件锁"""
+
+
+class FileLock:
+    """
+    跨进程的排他文件锁（Windows 上使用 msvcrt.locking，其他平台使用 fcntl.flock）。
+    每次 acquire 都打开新的文件描述符，因此同一进程内的不同线程之间也互斥。
+    等待期间以 POLL_INTERVAL 轮询，并检查当前操作是否已取消。
+
+    只有写入方需要加锁；读取方依赖写入方 "写临时文件再原子替换" 的约定，不加锁也总能读到完整的文件。
+    """
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, path, timeout=None):
+        self.path = path
+        self.timeout = timeout
+        self._fd = None
+
+    def _try_lock(self, fd):
+        try:
+            if os.name == "nt":
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        try:
+            while not self._try_lock(fd):
+                check_cancelled()
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise LockTimeout(f"等待文件锁超时: {self.path}")
+                time.sleep(self.POLL_INTERVAL)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return self
+
+    def release(self):
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+        try:
+            if os.name == "nt":
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def lock_for(path, timeout=None):
+    """
+    返回保护 path（文件或目录）的文件锁。锁文件集中放在数据目录的 locks/ 下，按绝对路径的哈希命名，
+    不会在仓库、库文件目录中留下多余的文件。
+    """
+    digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:20]
+    return FileLock(data_path("locks", f"{digest}.lock"), timeout)
@@ -1,9 +1,9 @@
 import os
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox,
-    QPushButton, QTextEdit, QProgressBar, QGroupBox, QMessageBox, QSizePolicy
+    QPushButton, QTextEdit, QProgressBar, QGroupBox, QMessageBox, QSizePolicy, QCheckBox
 )
-from PyQt5.QtCore import Qt, pyqtSignal, QObject, QThread
+from PyQt5.QtCore import pyqtSignal, QObject, QThread
 from PyQt5.QtGui import QFont, QIcon
 from src.downloader import (
     UnifiedDownloader,
@@ -12,8 +12,13 @@ from src.downloader import (
     DataLoaderWorker,
     ServerTypeLoaderWorker,
     CoreVersionLoaderWorker,
-    DownloadWorker
+    DownloadWorker,
+    ResumeWorker
 )
+from src.widgets import FilterableComboBox
+from src.paths import data_path
+from src.store import StoreIndex
+from src.versions import RELEASE, CHANNEL_DISPLAY_NAMES
 
 class MinecraftServerDownloaderApp(QWidget):
     def __init__(self):
@@ -55,8 +60,15 @@ class MinecraftServerDownloaderApp(QWidget):
         self.core_version_loader_thread = None
         self.core_version_loader_worker = None
 
+        self.resume_thread = None
+        self.resume_worker = None
+        self._resuming = False
+        # 已取消但还在收尾的线程
+        self._retired_threads = []
+
         self.init_ui()
         self.load_initial_data()
+        self.resume_unfinished_downloads()
 
     def init_ui(self):
         main_layout = QVBoxLayout()
@@ -73,17 +85,31 @@ class MinecraftServerDownloaderApp(QWidget):
         source_layout.addWidget(QLabel("下载源:"))
         self.source_combo = QComboBox()
         self.source_combo.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
-        self.source_combo.addItems(["BMCL API", "MSL API"])
+        # 下载源列表来自已注册的镜像后端，最后一项为并发查询所有镜像
+        for name, backend in self.downloader.backends.items():
+            self.source_combo.addItem(backend.DISPLAY_NAME, name)
+        self.source_combo.addItem("全部镜像 (并发查询)", UnifiedDownloader.ALL_SOURCES)
         self.source_combo.setCurrentIndex(0)  # 默认选择BMCL API
-        self.source_combo.setToolTip("选择下载镜像源\nBMCL API: 支持原版、Forge、Fabric、NeoForge、LiteLoader\nMSL API: 支持原版、Forge、Fabric、NeoForge、Bukkit、Paper、Spigot等")
+        self.source_combo.setToolTip("选择下载镜像源\nBMCL API: 支持原版、Forge、Fabric、NeoForge、LiteLoader\nMSL API: 支持原版、Forge、Fabric、NeoForge、Bukkit、Paper、Spigot等\n官方源: Mojang (原版)、PaperMC (Paper/Folia)、Fabric\n全部镜像: 并发查询所有镜像并合并结果")
         self.source_combo.currentIndexChanged.connect(self.on_source_changed)
         source_layout.addWidget(self.source_combo)
+        # 竞速模式：并发询问所有镜像，使用最先返回的链接和前 1MB 最快的镜像下载
+        self.race_checkbox = QCheckBox("竞速模式")
+        self.race_checkbox.setToolTip("并发向所有支持该核心的镜像解析下载链接，\n并选择前 1MB 下载速度最快的镜像进行下载")
+        self.race_checkbox.toggled.connect(self.on_race_mode_toggled)
+        source_layout.addWidget(self.race_checkbox)
         options_layout.addLayout(source_layout)
 
         # Minecraft 版本选择
         mc_version_layout = QHBoxLayout()
         mc_version_layout.addWidget(QLabel("Minecraft 版本:"))
-        self.mc_version_combo = QComboBox()
+        # 版本通道：正式版 / 快照 / 远古版本，切换时复用已解析的版本清单
+        self.channel_combo = QComboBox()
+        self.channel_combo.setToolTip("选择版本通道\n快照和远古版本只提供原版（快照另有 Fabric）服务端")
+        self._populate_channels()
+        self.channel_combo.currentIndexChanged.connect(self.on_channel_changed)
+        mc_version_layout.addWidget(self.channel_combo)
+        self.mc_version_combo = FilterableComboBox()
         self.mc_version_combo.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
         # 连接信号，避免在加载数据时触发
         self.mc_version_combo.currentIndexChanged.connect(self.on_mc_version_selected)
@@ -102,7 +128,7 @@ class MinecraftServerDownloaderApp(QWidget):
         # 核心版本选择
         core_version_layout = QHBoxLayout()
         core_version_layout.addWidget(QLabel("核心版本:"))
-        self.core_version_combo = QComboBox()
+        self.core_version_combo = FilterableComboBox()
         self.core_version_combo.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
         core_version_layout.addWidget(self.core_version_combo)
         options_layout.addLayout(core_version_layout)
@@ -112,7 +138,22 @@ class MinecraftServerDownloaderApp(QWidget):
         self.download_button.setFont(QFont("Segoe UI", 10, QFont.Bold))
         self.download_button.setFixedHeight(40)
         self.download_button.clicked.connect(self.start_download_process)
-        options_layout.addWidget(self.download_button, alignment=Qt.AlignCenter)
+        # 暂停 / 取消当前下载；暂停时保持连接和已下载的位置
+        self.pause_button = QPushButton("暂停")
+        self.pause_button.setFixedHeight(40)
+        self.pause_button.setEnabled(False)
+        self.pause_button.clicked.connect(self.toggle_pause_download)
+        self.cancel_button = QPushButton("取消")
+        self.cancel_button.setFixedHeight(40)
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_download)
+        download_layout = QHBoxLayout()
+        download_layout.addStretch()
+        download_layout.addWidget(self.download_button)
+        download_layout.addWidget(self.pause_button)
+        download_layout.addWidget(self.cancel_button)
+        download_layout.addStretch()
+        options_layout.addLayout(download_layout)
 
         main_layout.addWidget(options_group)
 
@@ -146,9 +187,8 @@ class MinecraftServerDownloaderApp(QWidget):
 
     def on_source_changed(self):
         """当下载源选择改变时触发"""
-        source_index = self.source_combo.currentIndex()
-        source_name = "bmcl" if source_index == 0 else "msl"
-        source_display = "BMCL API" if source_index == 0 else "MSL API"
+        source_name = self.source_combo.currentData()
+        source_display = self.downloader.source_display_name(source_name)
         
         self.downloader.switch_source(source_name)
         self.signals.log_message.emit(f"已切换到 {source_display} 镜像源")
@@ -156,34 +196,91 @@ class MinecraftServerDownloaderApp(QWidget):
         # 清空现有选择
         self.server_type_combo.clear()
         self.core_version_combo.clear()
+        self._populate_channels()
         
         # 重新加载数据
         self.load_initial_data()
 
+    def _populate_channels(self):
+        """按当前下载源能提供的通道填充通道下拉框，尽量保留原来的选择"""
+        previous = self.channel_combo.currentData() or RELEASE
+        self.channel_combo.blockSignals(True)
+        self.channel_combo.clear()
+        for channel in self.downloader.get_channels():
+            self.channel_combo.addItem(CHANNEL_DISPLAY_NAMES.get(channel, channel), channel)
+        index = self.channel_combo.findData(previous)
+        self.channel_combo.setCurrentIndex(index if index >= 0 else 0)
+        self.channel_combo.blockSignals(False)
+
+    def on_channel_changed(self):
+        """切换版本通道后重新列出 Minecraft 版本"""
+        self.server_type_combo.clear()
+        self.core_version_combo.clear()
+        self.load_initial_data()
+
+    def resume_unfinished_downloads(self):
+        """启动时在后台继续上次关闭前未完成的下载"""
+        if not self.downloader.journal.unfinished():
+            return
+        self._resuming = True
+        self.download_button.setEnabled(False)
+
+        self.resume_thread = QThread()
+        self.resume_worker = ResumeWorker(self.downloader)
+        self.resume_worker.moveToThread(self.resume_thread)
+
+        self.resume_thread.started.connect(self.resume_worker.run)
+        self.resume_worker.resume_finished.connect(self.on_resume_finished)
+        self.resume_worker.finished.connect(self.resume_thread.quit)
+        self.resume_worker.finished.connect(self.resume_worker.deleteLater)
+        self.resume_thread.finished.connect(self.resume_thread.deleteLater)
+
+        self.resume_thread.start()
+
+    def on_resume_finished(self, succeeded, failed):
+        self._resuming = False
+        self.resume_thread = None
+        self.resume_worker = None
+        self.signals.log_message.emit(f"未完成的下载已处理: 成功 {succeeded} 个, 失败 {failed} 个")
+        self.download_button.setEnabled(self.source_combo.isEnabled())
+
+    def on_race_mode_toggled(self, checked):
+        """切换下载链接的解析模式"""
+        self.downloader.set_resolution_mode(
+            UnifiedDownloader.MODE_RACE if checked else UnifiedDownloader.MODE_PRIORITY
+        )
+
     def update_progress(self, value):
         """更新进度条"""
         self.progress_bar.setValue(value)
 
-    def _stop_and_cleanup_thread(self, thread_attr_name, worker_attr_name):
+    def _stop_and_cleanup_thread(self, thread_attr_name, worker_attr_name, wait_ms=2000, resumable=False):
         """
         通用函数，用于停止线程并清理 worker。
-        此函数主要用于在应用程序关闭时强制停止线程，或在启动新任务前停止旧任务。
+        此函数主要用于在应用程序关闭时停止线程，或在启动新任务前停止旧任务。
+        先通过取消标记让 worker 在下一个检查点自行结束（关闭连接和文件），不会强制终止线程；
+        在 wait_ms 内没有结束的线程（例如正在等待某个请求超时）会被保留引用，结束后自动清理。
+        resumable 为 True 时，被取消的下载在下次启动时继续。
+        wait_ms 为 None 时一直等到线程结束（程序退出时使用：取消检查只在数据块之间进行，
+        阻塞在读取中的下载可能要等到读取超时才结束，线程在运行中被销毁会导致程序异常终止）。
         对于正常完成的线程，应通过信号和deleteLater()进行清理。
         """
         thread_ref = getattr(self, thread_attr_name, None)
         worker_ref = getattr(self, worker_attr_name, None)
 
+        if worker_ref is not None:
+            worker_ref.cancel(resumable)
+
         if thread_ref is not None: 
             try:
                 # 尝试检查线程是否在运行。如果C++对象已被删除，这里会引发RuntimeError
                 if thread_ref.isRunning():
                     self.signals.log_message.emit(f"正在停止现有线程: {thread_attr_name}...")
                     thread_ref.quit()
-                    thread_ref.wait(2000) 
-                    if thread_ref.isRunning():
-                        self.signals.log_message.emit(f"线程 {thread_attr_name} 未在规定时间内结束，可能需要强制终止。")
-                        thread_ref.terminate() 
-                        thread_ref.wait(1000) 
+                    finished = thread_ref.wait() if wait_ms is None else thread_ref.wait(wait_ms)
+                    if not finished:
+                        self.signals.log_message.emit(f"线程 {thread_attr_name} 将在当前请求结束后退出")
+                        self._retire_thread(thread_ref, worker_ref)
             except RuntimeError as e:
                 # 捕获并记录RuntimeError，这意味着底层C++对象可能已被删除
                 self.signals.log_message.emit(f"清理线程 {thread_attr_name} 时发生运行时错误 (可能对象已删除): {e}")
@@ -198,6 +295,14 @@ class MinecraftServerDownloaderApp(QWidget):
                 setattr(self, worker_attr_name, None)
                 
 
+    def _retire_thread(self, thread_ref, worker_ref):
+        """保留仍在收尾的线程的引用，避免线程对象在运行中被销毁"""
+        self._retired_threads.append((thread_ref, worker_ref))
+
+        def forget():
+            self._retired_threads[:] = [(t, w) for t, w in self._retired_threads if t is not thread_ref]
+        thread_ref.finished.connect(forget)
+
     def load_initial_data(self):
         """在单独线程中加载初始数据（Minecraft 版本列表）"""
         self.signals.log_message.emit("正在加载初始数据...")
@@ -207,30 +312,36 @@ class MinecraftServerDownloaderApp(QWidget):
         self._stop_and_cleanup_thread('data_loader_thread', 'data_loader_worker')
 
         self.data_loader_thread = QThread()
-        self.data_loader_worker = DataLoaderWorker(self.downloader)
+        self.data_loader_worker = DataLoaderWorker(self.downloader, self.channel_combo.currentData() or RELEASE)
         self.data_loader_worker.moveToThread(self.data_loader_thread)
 
+        # 版本列表分批到达，边接收边显示
+        self.mc_version_combo.clear()
+        self.data_loader_worker.batch_loaded.connect(self.on_mc_versions_batch)
         self.data_loader_worker.data_loaded.connect(self.on_initial_data_loaded)
         self.data_loader_thread.started.connect(self.data_loader_worker.run)
 
         self.data_loader_thread.start()
 
+    def on_mc_versions_batch(self, batch):
+        """追加一批 Minecraft 版本（忽略已被替换的旧加载线程发来的数据）"""
+        if self.sender() is self.data_loader_worker:
+            self.mc_version_combo.append_items(batch)
+
     def on_initial_data_loaded(self, mc_versions):
-        """初始数据加载完成后更新UI"""
-        # 断开连接，防止在 clear() 或 addItems() 时再次触发 on_mc_version_selected
+        """初始数据加载完成后更新UI（列表内容已由 on_mc_versions_batch 分批填充）"""
+        # 断开连接，防止在 setCurrentIndex() 时再次触发 on_mc_version_selected
         self.mc_version_combo.currentIndexChanged.disconnect(self.on_mc_version_selected)
 
-        self.mc_version_combo.clear()
-        self.mc_version_combo.addItems(mc_versions)
         if mc_versions:
             self.mc_version_combo.setCurrentIndex(0)
         else:
-            source_name = "BMCL API" if self.downloader.current_source == "bmcl" else "MSL API"
+            source_name = self.downloader.source_display_name()
             self.signals.log_message.emit(f"从 {source_name} 未能加载 Minecraft 版本列表，请检查网络连接或稍后重试。")
 
         self.mc_version_combo.currentIndexChanged.connect(self.on_mc_version_selected)
         
-        source_name = "BMCL API" if self.downloader.current_source == "bmcl" else "MSL API"
+        source_name = self.downloader.source_display_name()
         self.signals.log_message.emit(f"使用 {source_name} 初始数据加载完成。")
         self.set_ui_enabled(True) 
         # 自动触发选择第一个版本，加载核心类型
@@ -245,7 +356,7 @@ class MinecraftServerDownloaderApp(QWidget):
             self.core_version_combo.clear()
             return
 
-        source_name = "BMCL API" if self.downloader.current_source == "bmcl" else "MSL API"
+        source_name = self.downloader.source_display_name()
         self.signals.log_message.emit(f"你选择了 Minecraft 版本: {selected_mc_version} (使用 {source_name})")
         self.set_ui_enabled(False, exclude_mc_version=True) 
 
@@ -291,7 +402,7 @@ class MinecraftServerDownloaderApp(QWidget):
             self.core_version_combo.clear()
             return
 
-        source_name = "BMCL API" if self.downloader.current_source == "bmcl" else "MSL API"
+        source_name = self.downloader.source_display_name()
         self.signals.log_message.emit(f"你选择了服务端核心类型: {selected_server_type.capitalize()} (使用 {source_name})")
         self.set_ui_enabled(False, exclude_mc_version=True, exclude_server_type=True) 
         # 停止并清理旧的核心版本加载线程
@@ -301,15 +412,20 @@ class MinecraftServerDownloaderApp(QWidget):
         self.core_version_loader_worker = CoreVersionLoaderWorker(self.downloader, selected_mc_version, selected_server_type)
         self.core_version_loader_worker.moveToThread(self.core_version_loader_thread)
 
+        self.core_version_combo.clear()
+        self.core_version_loader_worker.batch_loaded.connect(self.on_core_versions_batch)
         self.core_version_loader_worker.core_versions_loaded.connect(self.on_core_versions_loaded)
         self.core_version_loader_thread.started.connect(self.core_version_loader_worker.run)
 
         self.core_version_loader_thread.start()
 
+    def on_core_versions_batch(self, batch):
+        """追加一批核心版本（忽略已被替换的旧加载线程发来的数据）"""
+        if self.sender() is self.core_version_loader_worker:
+            self.core_version_combo.append_items(batch)
+
     def on_core_versions_loaded(self, core_versions):
-        """核心版本加载完成后更新UI"""
-        self.core_version_combo.clear()
-        self.core_version_combo.addItems(core_versions)
+        """核心版本加载完成后更新UI（列表内容已由 on_core_versions_batch 分批填充）"""
         if core_versions:
             self.core_version_combo.setCurrentIndex(0)
         else:
@@ -332,24 +448,39 @@ class MinecraftServerDownloaderApp(QWidget):
         self.set_ui_enabled(False)
         self.progress_bar.setValue(0) 
 
-        download_link, file_name = self.downloader.get_download_url_and_filename(
-            selected_mc_version, selected_server_type, selected_core_version_info
-        )
-
-        if not download_link:
-            self.signals.log_message.emit("未能获取到下载链接，请检查你的选择或稍后重试。")
-            QMessageBox.critical(self, "获取链接失败", "未能获取到下载链接，请检查你的选择或稍后重试。")
-            self.set_ui_enabled(True) 
-
-        download_dir = "server_cores"
+        race_target = None
+        info = {}
+        if self.downloader.resolution_mode == UnifiedDownloader.MODE_RACE:
+            # 竞速模式下由下载线程并发解析链接并选择最快的镜像
+            download_link, file_name = None, None
+            race_target = (selected_mc_version, selected_server_type, selected_core_version_info)
+        else:
+            info = self.downloader.get_download_info(
+                selected_mc_version, selected_server_type, selected_core_version_info
+            ) or {}
+            download_link, file_name = info.get("url"), info.get("file_name")
+
+            if not download_link:
+                self.signals.log_message.emit("未能获取到下载链接，请检查你的选择或稍后重试。")
+                QMessageBox.critical(self, "获取链接失败", "未能获取到下载链接，请检查你的选择或稍后重试。")
+                self.set_ui_enabled(True) 
+                return
+
+        # 下载到数据目录下的共享仓库，多个实例（不论从哪个目录启动）共用已下载的文件
+        download_dir = data_path("server_cores")
         os.makedirs(download_dir, exist_ok=True)
-        file_path = os.path.join(download_dir, file_name)
 
         # 在新线程中启动下载
         self._stop_and_cleanup_thread('download_thread', 'download_worker')
 
         self.download_thread = QThread()
-        self.download_worker = DownloadWorker(self.downloader, download_link, download_dir, file_name)
+        self.download_worker = DownloadWorker(
+            self.downloader, download_link, download_dir, file_name, race_target,
+            expected_sha256=info.get("sha256"), source=info.get("source"),
+            index_key=StoreIndex.make_key(
+                info["source"], selected_server_type, selected_mc_version, selected_core_version_info
+            ) if info else None,
+        )
         self.download_worker.moveToThread(self.download_thread)
 
         self.download_thread.started.connect(self.download_worker.run)
@@ -359,12 +490,42 @@ class MinecraftServerDownloaderApp(QWidget):
         self.download_thread.finished.connect(self.download_thread.deleteLater) 
         
         self.download_thread.start()
+        self._set_download_controls(True)
+
+    def _set_download_controls(self, downloading):
+        self.pause_button.setEnabled(downloading)
+        self.cancel_button.setEnabled(downloading)
+        self.pause_button.setText("暂停")
+
+    def toggle_pause_download(self):
+        """暂停或继续当前下载"""
+        worker = self.download_worker
+        if worker is None:
+            return
+        if worker.token.paused:
+            worker.resume()
+            self.pause_button.setText("暂停")
+            self.signals.log_message.emit("下载已继续")
+        else:
+            worker.pause()
+            self.pause_button.setText("继续")
+            self.signals.log_message.emit("下载已暂停")
+
+    def cancel_download(self):
+        """取消当前下载，已下载的部分保留，重新下载同一文件时从断点继续"""
+        if self.download_worker is not None:
+            self.download_worker.cancel()
+            self._set_download_controls(False)
 
     def on_download_finished(self, file_path, success):
         """下载完成后的处理槽函数"""
         self.progress_bar.setValue(0) 
         self.set_ui_enabled(True) 
+        self._set_download_controls(False)
 
+        worker = self.download_worker
+        if worker is not None and worker.token.cancelled:
+            return
         if success:
             QMessageBox.information(self, "下载完成", f"服务端核心下载成功！\n文件位置: {file_path}")
         else:
@@ -375,21 +536,38 @@ class MinecraftServerDownloaderApp(QWidget):
     def set_ui_enabled(self, enabled, exclude_mc_version=False, exclude_server_type=False):
         """统一控制UI元素的启用/禁用状态"""
         self.source_combo.setEnabled(enabled)
+        self.channel_combo.setEnabled(enabled)
+        self.race_checkbox.setEnabled(enabled)
         if not exclude_mc_version:
             self.mc_version_combo.setEnabled(enabled)
         if not exclude_server_type:
             self.server_type_combo.setEnabled(enabled)
         self.core_version_combo.setEnabled(enabled)
-        self.download_button.setEnabled(enabled)
+        self.download_button.setEnabled(enabled and not self._resuming)
 
     def closeEvent(self, event):
         """在窗口关闭时，确保所有线程都被安全停止"""
         self.signals.log_message.emit("应用程序即将关闭，正在清理后台任务...")
 
-        # 通过字符串名称停止所有正在运行的线程
-        self._stop_and_cleanup_thread('data_loader_thread', 'data_loader_worker')
-        self._stop_and_cleanup_thread('server_type_loader_thread', 'server_type_loader_worker')
-        self._stop_and_cleanup_thread('core_version_loader_thread', 'core_version_loader_worker')
-        self._stop_and_cleanup_thread('download_thread', 'download_worker')
+        # 先同时取消所有任务，让它们并行收尾；下载中的任务保留为排队状态，下次启动时继续
+        for worker_attr_name, resumable in (('data_loader_worker', False), ('server_type_loader_worker', False),
+                                            ('core_version_loader_worker', False), ('download_worker', True),
+                                            ('resume_worker', True)):
+            worker = getattr(self, worker_attr_name, None)
+            if worker is not None:
+                worker.cancel(resumable)
+
+        # 通过字符串名称停止所有正在运行的线程；退出前必须等每个线程真正结束
+        self._stop_and_cleanup_thread('data_loader_thread', 'data_loader_worker', wait_ms=None)
+        self._stop_and_cleanup_thread('server_type_loader_thread', 'server_type_loader_worker', wait_ms=None)
+        self._stop_and_cleanup_thread('core_version_loader_thread', 'core_version_loader_worker', wait_ms=None)
+        self._stop_and_cleanup_thread('download_thread', 'download_worker', wait_ms=None, resumable=True)
+        self._stop_and_cleanup_thread('resume_thread', 'resume_worker', wait_ms=None, resumable=True)
+        # 之前被替换、仍在收尾的线程
+        for thread_ref, _ in list(self._retired_threads):
+            try:
+                thread_ref.wait()
+            except RuntimeError:
+                pass
 
         super().closeEvent(event)
\ No newline at end of file
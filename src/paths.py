@@ -0,0 +1,39 @@
+import os
+import sys
+import threading
+
+
+APP_NAME = "MinecraftServerDownloader"
+# 设置该环境变量可以指定数据目录（例如在容器或 CI 中使用项目内的目录）
+DATA_DIR_ENV = "MSD_DATA_DIR"
+
+
+def _default_data_dir():
+    if sys.platform.startswith("win"):
+        base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+        return os.path.join(base, APP_NAME)
+    if sys.platform == "darwin":
+        return os.path.join(os.path.expanduser("~"), "Library", "Application Support", APP_NAME)
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "minecraft-server-downloader")
+
+
+def data_dir():
+    """
+    当前用户的数据目录，保存元数据缓存、任务日志、服务端仓库、Java 运行时和设备ID。
+    同一用户的所有实例（不论从哪个工作目录启动）共用这些文件。
+    """
+    return os.path.abspath(os.environ.get(DATA_DIR_ENV) or _default_data_dir())
+
+
+def data_path(*parts):
+    return os.path.join(data_dir(), *parts)
+
+
+def cache_path(*parts):
+    return data_path("cache", *parts)
+
+
+def unique_tmp_path(path):
+    """同一文件可能被多个进程、线程同时写入，临时文件名中带上进程和线程标识，写完后再原子替换"""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
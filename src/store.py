@@ -0,0 +1,218 @@
+import os
+import json
+import threading
+import time
+import hashlib
+from urllib.parse import urlsplit, unquote, quote
+
+from src.paths import data_path, cache_path, unique_tmp_path
+from src.locking import lock_for
+
+
+def sha256_of_file(file_path, chunk_size=1024 * 1024):
+    """计算文件的 SHA256 校验码"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StoreIndex:
+    """
+    本地服务端核心仓库 (server_cores) 的索引。
+    以 "来源/服务端类型/MC版本/核心版本" 为键，记录每个已下载文件的来源链接、文件名、大小和校验码，
+    用于镜像同步时判断哪些文件是新增或已变更的。
+    索引以 JSON 形式保存在仓库目录下，写入时先写临时文件再原子替换，读取不需要加锁。
+    多个进程可能同时使用同一个仓库：保存时在文件锁内重新读取磁盘上的索引，只合并本进程改动的条目，
+    不会覆盖其他进程刚写入的记录。
+    """
+    INDEX_FILE = "index.json"
+
+    def __init__(self, store_dir=None):
+        self.store_dir = store_dir or data_path("server_cores")
+        self.index_path = os.path.join(self.store_dir, self.INDEX_FILE)
+        self._lock = threading.Lock()
+        self._entries = {}
+        # 本进程记录、尚未写入磁盘的条目
+        self._pending = {}
+        self.load()
+
+    @staticmethod
+    def make_key(source, server_type, mc_version, core_version):
+        return f"{source}/{server_type}/{mc_version}/{core_version}"
+
+    def _read_disk(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get("artifacts", {})
+        except (OSError, ValueError):
+            return {}
+
+    def load(self):
+        """从磁盘读取索引（包括其他进程写入的记录），本进程尚未保存的记录保留在最上层"""
+        entries = self._read_disk()
+        with self._lock:
+            entries.update(self._pending)
+            self._entries = entries
+
+    def save(self):
+        """在文件锁内与磁盘上的索引合并后原子地写回"""
+        with self._lock:
+            if not self._pending:
+                return
+            pending = dict(self._pending)
+        os.makedirs(self.store_dir, exist_ok=True)
+        with lock_for(self.index_path):
+            entries = self._read_disk()
+            entries.update(pending)
+            tmp_path = unique_tmp_path(self.index_path)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"artifacts": entries}, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.index_path)
+        with self._lock:
+            for key, entry in pending.items():
+                if self._pending.get(key) is entry:
+                    del self._pending[key]
+            entries.update(self._pending)
+            self._entries = entries
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return dict(entry) if entry else None
+
+    def entries(self):
+        """返回索引条目的快照 (键, 记录)"""
+        with self._lock:
+            return [(key, dict(entry)) for key, entry in self._entries.items()]
+
+    def record(self, key, url, file_name, sha256=None, **extra):
+        """记录（或更新）一个已存储的文件"""
+        file_path = os.path.join(self.store_dir, file_name)
+        entry = {
+            "url": url,
+            "file_name": file_name,
+            "size": os.path.getsize(file_path) if os.path.exists(file_path) else 0,
+            "sha256": sha256,
+            "stored_at": int(time.time()),
+        }
+        entry.update(extra)
+        with self._lock:
+            self._entries[key] = entry
+            self._pending[key] = entry
+        return entry
+
+    def previous_build(self, key):
+        """
+        返回同一 来源/服务端类型/MC版本 下最近存入的另一个 jar 的路径（用作增量更新的基础），
+        没有时返回 None。
+        """
+        prefix = key.rsplit('/', 1)[0] + '/'
+        candidates = [
+            entry for other, entry in self.entries()
+            if other != key and other.startswith(prefix) and entry["file_name"].endswith(".jar")
+            and os.path.exists(os.path.join(self.store_dir, entry["file_name"]))
+        ]
+        if not candidates:
+            return None
+        latest = max(candidates, key=lambda entry: entry.get("stored_at", 0))
+        return os.path.join(self.store_dir, latest["file_name"])
+
+    def is_current(self, key, url, sha256=None):
+        """
+        判断索引中的文件是否仍是最新的：
+        文件存在、大小一致，且来源链接（或远端给出的 SHA256）未发生变化。
+        """
+        entry = self.get(key)
+        if not entry:
+            return False
+        file_path = os.path.join(self.store_dir, entry["file_name"])
+        if not os.path.exists(file_path) or os.path.getsize(file_path) != entry.get("size"):
+            return False
+        if sha256 and entry.get("sha256"):
+            return sha256.lower() == entry["sha256"].lower()
+        return entry.get("url") == url
+
+
+class MetadataCache:
+    """
+    元数据缓存：按 URL 路径把镜像源返回的 JSON 保存到磁盘，
+    目录结构与 BMCL API 的 URL 结构一致，便于本地缓存服务器原样提供。
+    例如 https://bmclapi2.bangbang93.com/forge/minecraft/1.20.1
+    保存为 <cache_dir>/forge/minecraft/1.20.1.json
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or cache_path("metadata")
+
+    @staticmethod
+    def key_for(url):
+        """
+        返回 URL（或以 / 开头的请求路径）在缓存目录中的相对路径（以 / 分隔），
+        例如 "forge/minecraft/1.20.1.json"；离线资源包也以此作为元数据的键。
+        """
+        parts = urlsplit(url)
+        segments = [unquote(s) for s in parts.path.split('/') if s]
+        # 拒绝路径穿越，缓存服务器会直接用请求路径查询缓存
+        if not segments or any(s in ('.', '..') or '/' in s or '\\' in s for s in segments):
+            return None
+        if parts.query:
+            segments[-1] += "@" + quote(parts.query, safe='')
+        return '/'.join(segments) + ".json"
+
+    def path_for(self, url):
+        """返回 URL（或以 / 开头的请求路径）对应的缓存文件路径"""
+        key = self.key_for(url)
+        return os.path.join(self.cache_dir, *key.split('/')) if key else None
+
+    def keys(self):
+        """遍历缓存中的所有条目，返回 (相对路径, 文件路径)"""
+        for current, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(current, name)
+                    yield os.path.relpath(path, self.cache_dir).replace(os.sep, '/'), path
+
+    def get(self, url):
+        """读取缓存的 JSON，不存在时返回 None"""
+        path = self.path_for(url)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get_validators(self, url):
+        """读取缓存时记录的 ETag / Last-Modified，用于条件请求"""
+        path = self.path_for(url)
+        if not path or not os.path.exists(path) or not os.path.exists(path + ".headers"):
+            return {}
+        try:
+            with open(path + ".headers", 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_atomic(self, path, data):
+        tmp_path = unique_tmp_path(path)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def put(self, url, data, validators=None):
+        """原子地写入缓存，validators 为响应中的 ETag / Last-Modified"""
+        path = self.path_for(url)
+        if not path:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._write_atomic(path, data)
+            if validators:
+                self._write_atomic(path + ".headers", validators)
+            elif os.path.exists(path + ".headers"):
+                os.remove(path + ".headers")
+        except OSError:
+            pass
@@ -0,0 +1,225 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import namedtuple
+
+from src.store import StoreIndex, sha256_of_file
+from src.delta import JarDelta, DeltaUnavailable
+from src.versions import RELEASE
+from src.locking import lock_for
+
+
+SyncTarget = namedtuple("SyncTarget", ["source", "mc_version", "server_type", "core_version"])
+
+
+class MirrorSync:
+    """
+    镜像同步：在 UnifiedDownloader 之上枚举各镜像后端（默认 BMCL 与 MSL）的
+    (MC版本 × 服务端类型 × 最新 N 个核心版本) 组合，与本地仓库索引比对，
+    只并发下载新增或已变更的文件。
+
+    枚举过程是惰性的生成器，提交给线程池的任务数量有上限，
+    因此即使组合数达到数千个，也不会把所有列表同时保存在内存中。
+    每个完成的组合都会追加写入检查点文件，中断后再次运行会跳过已完成的组合。
+    仓库中已有同一 MC 版本的上一个构建时，优先以它为基础增量更新 (JarDelta)，只下载变化的条目。
+    """
+    CHECKPOINT_FILE = ".sync_checkpoint.jsonl"
+
+    def __init__(self, downloader, store_dir=None, sources=("bmcl", "msl"),
+                 mc_versions=None, server_types=None, latest_n=1, max_workers=4, channels=None, delta=True):
+        self.downloader = downloader
+        self.signals = downloader.signals
+        self.store = StoreIndex(store_dir)
+        self.store_dir = store_dir = self.store.store_dir
+        self.sources = list(sources)
+        self.mc_versions = set(mc_versions) if mc_versions else None
+        self.channels = list(channels) if channels else [RELEASE]
+        self.server_types = set(s.lower() for s in server_types) if server_types else None
+        self.latest_n = max(1, latest_n)
+        self.max_workers = max(1, max_workers)
+        self.delta = delta
+        self.checkpoint_path = os.path.join(store_dir, self.CHECKPOINT_FILE)
+        self._checkpoint_lock = threading.Lock()
+        self.stats = {"downloaded": 0, "skipped": 0, "failed": 0, "unavailable": 0}
+        self.delta_updates = 0
+
+    # --- 枚举 ---
+
+    def _backend(self, source):
+        return self.downloader.backends[source]
+
+    def _wanted_version(self, mc_version):
+        return self.mc_versions is None or mc_version in self.mc_versions
+
+    def _wanted_type(self, server_type):
+        return self.server_types is None or server_type.lower() in self.server_types
+
+    def _iter_backend_targets(self, source):
+        backend = self._backend(source)
+        # 能力描述中 server_types 为 None 的后端，其类型列表与版本无关，只需获取一次
+        shared_types = backend.get_server_types() if backend.CAPABILITIES.server_types is None else None
+        for channel in self.channels:
+            if channel not in backend.CAPABILITIES.channels:
+                continue
+            for mc_version in backend.get_minecraft_versions(channel):
+                if not self._wanted_version(mc_version):
+                    continue
+                for server_type in shared_types or backend.get_server_types(mc_version):
+                    if not self._wanted_type(server_type) or not backend.supports(server_type, mc_version):
+                        continue
+                    for core_version in backend.get_core_versions(mc_version, server_type)[:self.latest_n]:
+                        yield SyncTarget(source, mc_version, server_type, core_version)
+
+    def iter_targets(self):
+        """惰性地枚举所有需要同步的组合"""
+        for source in self.sources:
+            if source in self.downloader.backends:
+                yield from self._iter_backend_targets(source)
+            else:
+                self.signals.log_message.emit(f"不支持的同步来源: {source}")
+
+    @staticmethod
+    def target_key(target):
+        return StoreIndex.make_key(target.source, target.server_type, target.mc_version, target.core_version)
+
+    # --- 检查点 ---
+
+    def _load_checkpoint(self):
+        """读取检查点中已完成的组合键"""
+        done = set()
+        if not os.path.exists(self.checkpoint_path):
+            return done
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 中断时最后一行可能只写了一半
+                    continue
+                if record.get("status") in ("downloaded", "skipped", "unavailable"):
+                    done.add(record["key"])
+        return done
+
+    def _append_checkpoint(self, key, status):
+        with self._checkpoint_lock:
+            with open(self.checkpoint_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"key": key, "status": status}) + "\n")
+
+    # --- 同步 ---
+
+    def _resolve(self, target):
+        return self._backend(target.source).get_download_info(
+            target.mc_version, target.server_type, target.core_version
+        )
+
+    def _sync_one(self, target):
+        """同步单个组合，返回状态字符串"""
+        key = self.target_key(target)
+        info = self._resolve(target)
+        if not info:
+            return "unavailable"
+        if self.store.is_current(key, info["url"], info["sha256"]):
+            return "skipped"
+
+        # 按 来源/服务端类型 分目录存放，避免不同镜像的同名文件互相覆盖
+        rel_dir = os.path.join(target.source, target.server_type)
+        file_path = os.path.join(self.store_dir, rel_dir, info["file_name"])
+        # 其他实例可能正在同步同一个仓库：加锁后重新读取索引，已由其他实例下载的文件直接跳过
+        with lock_for(file_path):
+            self.store.load()
+            if self.store.is_current(key, info["url"], info["sha256"]):
+                self.signals.log_message.emit(f"{info['file_name']} 已由其他实例同步，跳过")
+                return "skipped"
+            status = self._fetch(target, key, info, rel_dir)
+            if status == "downloaded":
+                self.store.save()
+            return status
+
+    def _fetch(self, target, key, info, rel_dir):
+        dest_folder = os.path.join(self.store_dir, rel_dir)
+        file_path = os.path.join(dest_folder, info["file_name"])
+        base_path = self.store.previous_build(key) if self.delta and info["file_name"].endswith(".jar") else None
+        if base_path and self._delta_update(target, info, base_path, file_path):
+            self.store.record(key, info["url"], os.path.join(rel_dir, info["file_name"]), sha256_of_file(file_path),
+                              archive=self._backend(target.source).check_archive(file_path, info["file_name"]))
+            return "downloaded"
+
+        # download_file 写入 .part 并在 SHA256 和压缩包检查通过后改名，同时返回压缩包元数据
+        result = self._backend(target.source).download_file(info["url"], dest_folder, info["file_name"],
+                                                            expected_sha256=info["sha256"])
+        if not result:
+            return "failed"
+
+        # 已校验过的文件不再重新计算 SHA256；索引中记录 Main-Class、实现版本等元数据，便于之后识别和去重
+        sha256 = info["sha256"].lower() if info["sha256"] else sha256_of_file(file_path)
+        self.store.record(key, info["url"], os.path.join(rel_dir, info["file_name"]), sha256, archive=result.archive)
+        return "downloaded"
+
+    def _delta_update(self, target, info, base_path, file_path):
+        """以上一个构建为基础增量更新，不可行时返回 False 由调用者完整下载"""
+        backend = self._backend(target.source)
+        if backend.offline:
+            return False
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        try:
+            with JarDelta(backend.headers, log=self.signals.log_message.emit) as delta:
+                delta.update(info["url"], base_path, file_path, info["sha256"])
+        except DeltaUnavailable as e:
+            self.signals.log_message.emit(f"无法增量更新 {info['file_name']} ({e})，改为完整下载")
+            return False
+        with self._checkpoint_lock:
+            self.delta_updates += 1
+        return True
+
+    def _collect(self, futures, keys):
+        for future in futures:
+            key = keys.pop(future)
+            try:
+                status = future.result()
+            except Exception as e:
+                self.signals.log_message.emit(f"同步 {key} 失败: {e}")
+                status = "failed"
+            self.stats[status] += 1
+            self._append_checkpoint(key, status)
+
+    def run(self, resume=True):
+        """
+        执行一次同步。resume 为 True 时跳过检查点中已完成的组合；
+        全部成功后删除检查点，使下一次同步重新与远端比对。
+        """
+        os.makedirs(self.store_dir, exist_ok=True)
+        if not resume and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        # 服务端类型按兼容性矩阵枚举，避免为没有构建的类型逐个查询核心版本
+        self.downloader.refresh_compatibility()
+        done = self._load_checkpoint()
+        if done:
+            self.signals.log_message.emit(f"从检查点恢复，跳过 {len(done)} 个已完成的组合")
+
+        pending = set()
+        keys = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for target in self.iter_targets():
+                key = self.target_key(target)
+                if key in done:
+                    continue
+                future = executor.submit(self._sync_one, target)
+                keys[future] = key
+                pending.add(future)
+                # 限制排队任务的数量，枚举速度不会把内存撑满
+                if len(pending) >= self.max_workers * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self._collect(finished, keys)
+            finished, _ = wait(pending)
+            self._collect(finished, keys)
+
+        self.store.save()
+        if self.stats["failed"] == 0 and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+        self.signals.log_message.emit(
+            f"同步完成: 新下载 {self.stats['downloaded']} 个 (其中增量更新 {self.delta_updates} 个), 已是最新 {self.stats['skipped']} 个, "
+            f"不可用 {self.stats['unavailable']} 个, 失败 {self.stats['failed']} 个"
+        )
+        return dict(self.stats)
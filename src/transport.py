@@ -0,0 +1,146 @@
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    # 可选依赖：安装 httpx[http2] 后元数据请求使用 HTTP/2
+    import httpx
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+except ImportError:
+    httpx = None
+
+
+HTTP2_AVAILABLE = httpx is not None
+
+
+class OfflineError(requests.exceptions.ConnectionError):
+    """离线模式下拒绝访问网络。是 requests 的连接错误，已有的网络错误处理会记录并返回失败"""
+
+    def __init__(self, url):
+        super().__init__(f"离线模式：{url} 不在本地缓存或已导入的离线资源包中")
+        self.url = url
+
+
+class OfflineTransport:
+    """离线模式使用的传输：不建立任何连接，每个请求都立即以 OfflineError 失败"""
+    NAME = "offline"
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        raise OfflineError(url)
+
+    def close(self):
+        pass
+
+
+class PooledTransport:
+    """
+    HTTP/1.1 连接池：所有元数据请求共用一个 requests.Session，
+    同一镜像的连接在请求之间保持并复用（每个镜像最多 pool_size 个连接），省去重复的 TCP / TLS 握手。
+    """
+    NAME = "HTTP/1.1"
+
+    def __init__(self, pool_size=16):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        return self.session.get(url, headers=headers, params=params, timeout=timeout)
+
+    def close(self):
+        self.session.close()
+
+
+class _Http2Response:
+    """把 httpx 的响应包装成 _fetch_json 使用的 requests 响应接口，错误统一为 requests 的异常"""
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.content = response.content
+        self.http_version = response.http_version
+
+    def json(self):
+        try:
+            return self._response.json()
+        except ValueError as e:
+            # 与 requests 一致：非 JSON 的响应体（例如认证页面、镜像的错误页）抛出 RequestException 的子类
+            raise requests.exceptions.JSONDecodeError(str(e), getattr(e, "doc", ""), getattr(e, "pos", 0))
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} Error: {self._response.reason_phrase} for url: {self._response.url}", response=self
+            )
+
+
+class Http2Transport:
+    """
+    HTTP/2 传输（需要 httpx 和 h2）：每个镜像（scheme://host:port）一个 httpx.Client，
+    多个线程的并发请求在同一个连接上多路复用，请求头经过 HPACK 压缩。
+    服务器不支持 HTTP/2 时 httpx 通过 ALPN 协商自动使用 HTTP/1.1；
+    连接出现协议错误时，该镜像之后的请求改用 HTTP/1.1 连接池。
+    """
+    NAME = "HTTP/2"
+
+    def __init__(self, max_connections=16):
+        self.max_connections = max_connections
+        self.fallback = PooledTransport(max_connections)
+        self._clients = {}
+        self._fallback_origins = set()
+        self._lock = threading.Lock()
+
+    def _client(self, origin):
+        with self._lock:
+            client = self._clients.get(origin)
+            if client is None:
+                client = httpx.Client(
+                    http2=True, follow_redirects=True,
+                    limits=httpx.Limits(max_connections=self.max_connections),
+                )
+                self._clients[origin] = client
+            return client
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            fallback = origin in self._fallback_origins
+        if fallback:
+            return self.fallback.get(url, headers=headers, params=params, timeout=timeout)
+        try:
+            response = self._client(origin).get(url, headers=headers, params=params, timeout=timeout)
+        except httpx.ProtocolError:
+            with self._lock:
+                self._fallback_origins.add(origin)
+            return self.fallback.get(url, headers=headers, params=params, timeout=timeout)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e))
+        except httpx.HTTPError as e:
+            raise requests.exceptions.ConnectionError(str(e))
+        return _Http2Response(response)
+
+    def close(self):
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            client.close()
+        self.fallback.close()
+
+
+def create_transport(http2=None, pool_size=16, offline=False):
+    """
+    创建元数据请求使用的传输。http2 为 None 时在已安装 httpx[http2] 的情况下使用 HTTP/2，
+    否则（或 http2 为 False 时）使用 HTTP/1.1 连接池；offline 为 True 时返回拒绝所有请求的 OfflineTransport。
+    """
+    if offline:
+        return OfflineTransport()
+    if http2 is None:
+        http2 = HTTP2_AVAILABLE
+    if http2 and HTTP2_AVAILABLE:
+        return Http2Transport(pool_size)
+    return PooledTransport(pool_size)
@@ -0,0 +1,88 @@
+import re
+from datetime import datetime, timezone
+
+
+# 版本通道，与 Mojang 版本清单中的 type 字段一致
+RELEASE = "release"
+SNAPSHOT = "snapshot"
+OLD_BETA = "old_beta"
+OLD_ALPHA = "old_alpha"
+CHANNELS = (RELEASE, SNAPSHOT, OLD_BETA, OLD_ALPHA)
+
+CHANNEL_DISPLAY_NAMES = {
+    RELEASE: "正式版",
+    SNAPSHOT: "快照 / 预览版",
+    OLD_BETA: "远古 Beta",
+    OLD_ALPHA: "远古 Alpha",
+}
+
+_EPOCH = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def guess_channel(version_id):
+    """
+    没有版本清单信息时，根据版本号的格式推断所属通道：
+    1.20.1 -> release；23w31a、1.20-pre1、1.20-rc1 -> snapshot；b1.7.3 -> old_beta；a1.0.4 -> old_alpha
+    """
+    if re.match(r'^\d+(\.\d+)*$', version_id):
+        return RELEASE
+    if re.match(r'^b\d', version_id):
+        return OLD_BETA
+    if re.match(r'^(a|inf-|c|rd-)\d', version_id):
+        return OLD_ALPHA
+    return SNAPSHOT
+
+
+def _parse_release_time(value):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return _EPOCH
+
+
+class VersionManifest:
+    """
+    解析后的版本清单 (version_manifest.json) 索引。
+    构建时只遍历一次清单：按 id 建立查找表，并为每个通道预先计算按发布时间（新的在前）排序的版本列表，
+    之后切换通道、查询版本详情地址都不需要重新下载或解析清单。
+    """
+
+    def __init__(self, data):
+        self.latest = dict(data.get("latest", {}))
+        self._entries = {}
+        self._release_times = {}
+        grouped = {channel: [] for channel in CHANNELS}
+        for entry in data.get("versions", []):
+            version_id = entry["id"]
+            self._entries[version_id] = entry
+            self._release_times[version_id] = _parse_release_time(entry.get("releaseTime"))
+            grouped.setdefault(entry.get("type", RELEASE), []).append(version_id)
+        self._views = {
+            channel: tuple(sorted(ids, key=self._release_times.__getitem__, reverse=True))
+            for channel, ids in grouped.items()
+        }
+
+    def __contains__(self, version_id):
+        return version_id in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def versions(self, channel=RELEASE):
+        """返回某个通道的版本列表（新的在前）"""
+        return list(self._views.get(channel, ()))
+
+    def channels(self):
+        """清单中实际存在版本的通道"""
+        return [channel for channel, ids in self._views.items() if ids]
+
+    def channel_of(self, version_id):
+        entry = self._entries.get(version_id)
+        return entry.get("type", RELEASE) if entry else None
+
+    def release_time(self, version_id):
+        return self._release_times.get(version_id)
+
+    def detail_url(self, version_id):
+        entry = self._entries.get(version_id)
+        return entry.get("url") if entry else None
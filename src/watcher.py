@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import threading
+from PyQt5.QtCore import pyqtSignal, QObject
+
+from src.downloader import REQUEST_FLIGHTS
+from src.paths import cache_path, unique_tmp_path
+from src.store import StoreIndex
+
+
+class BuildWatcher(QObject):
+    """
+    新构建监视器：定期（以条件请求）获取关注的核心版本列表，与上一次的快照比对，
+    发现新构建时通过 new_build 信号、回调函数发出结构化事件，并可选自动下载。
+
+    监视目标为 (来源, 服务端类型, MC版本) 三元组，来源为已注册的镜像后端名称；
+    比对的构建列表由后端的 watch_builds 提供（通常是完整的核心版本列表，MSL 只比对最新构建的文件名）。
+    第一次轮询只建立基线快照，不发出事件。
+    """
+    new_build = pyqtSignal(dict)
+
+    def __init__(self, downloader, targets, snapshot_path=None,
+                 interval=600, download_dir=None, callback=None):
+        super().__init__()
+        self.downloader = downloader
+        self.signals = downloader.signals
+        self.targets = [tuple(t) for t in targets]
+        unknown = sorted({source for source, _, _ in self.targets if source not in downloader.backends})
+        if unknown:
+            raise ValueError(f"未知的下载源: {', '.join(unknown)}")
+        self.snapshot_path = snapshot_path or cache_path("watch_snapshot.json")
+        self.interval = interval
+        self.download_dir = download_dir
+        self.callback = callback
+        self.snapshot = self._load_snapshot()
+
+    @staticmethod
+    def target_key(source, server_type, mc_version):
+        return f"{source}/{server_type}/{mc_version}"
+
+    def _load_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return {}
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_snapshot(self):
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = unique_tmp_path(self.snapshot_path)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _list_builds(self, source, server_type, mc_version):
+        """返回 (构建列表, {构建: 下载信息})"""
+        return self.downloader.backends[source].watch_builds(mc_version, server_type)
+
+    def _download(self, event, info):
+        backend = self.downloader.backends[event["source"]]
+        info = info or backend.get_download_info(event["mc_version"], event["server_type"], event["core_version"])
+        if not info:
+            return None
+        index_key = StoreIndex.make_key(backend.NAME, event["server_type"], event["mc_version"], event["core_version"])
+        if self.downloader.download_file(info["url"], self.download_dir, info["file_name"],
+                                         expected_sha256=info["sha256"], source=backend.NAME, index_key=index_key):
+            return os.path.join(self.download_dir, info["file_name"])
+        return None
+
+    def poll_once(self):
+        """轮询一次所有监视目标，返回本次发现的新构建事件列表"""
+        # 每次轮询都要向镜像确认，不使用请求去重层的短期缓存
+        REQUEST_FLIGHTS.forget()
+        events = []
+        for source, server_type, mc_version in self.targets:
+            key = self.target_key(source, server_type, mc_version)
+            builds, infos = self._list_builds(source, server_type, mc_version)
+            if not builds:
+                # 请求失败或暂无构建时保留旧快照，避免恢复后把所有构建误报为新构建
+                continue
+
+            previous = self.snapshot.get(key)
+            self.snapshot[key] = builds
+            if previous is None:
+                self.signals.log_message.emit(f"已建立 {key} 的基线快照 ({len(builds)} 个构建)")
+                continue
+
+            known = set(previous)
+            for build in builds:
+                if build in known:
+                    continue
+                event = {
+                    "event": "new_build",
+                    "source": source,
+                    "server_type": server_type,
+                    "mc_version": mc_version,
+                    "core_version": build,
+                    "detected_at": int(time.time()),
+                }
+                if self.download_dir:
+                    event["file_path"] = self._download(event, infos.get(build))
+                self.signals.log_message.emit(f"发现新构建: {server_type} {mc_version} {build}")
+                events.append(event)
+                self.new_build.emit(event)
+                if self.callback:
+                    self.callback(event)
+
+        self._save_snapshot()
+        return events
+
+    def run(self, stop_event=None, iterations=None):
+        """按 interval 持续轮询，直到 stop_event 被设置或达到 iterations 次"""
+        stop_event = stop_event or threading.Event()
+        count = 0
+        while not stop_event.is_set():
+            self.poll_once()
+            count += 1
+            if iterations is not None and count >= iterations:
+                break
+            stop_event.wait(self.interval)
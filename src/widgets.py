@@ -0,0 +1,256 @@
+from bisect import bisect_left
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QTimer
+from PyQt5.QtWidgets import QComboBox
+
+
+class VersionIndex:
+    """
+    版本列表的搜索索引，随数据到达增量构建：
+    - 前缀索引: 按小写字符串排序的 (键, 位置) 列表，用二分查找定位前缀范围
+    - 子串索引: 1~3 字符的 n-gram -> 位置集合，查询时取各 n-gram 的交集再验证
+    搜索结果保持原列表顺序，前缀匹配排在子串匹配之前。
+    """
+    MAX_GRAM = 3
+
+    def __init__(self):
+        self.items = []
+        self._keys = []
+        self._sorted = []
+        self._grams = {}
+        self._positions = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def extend(self, items):
+        added = []
+        for item in items:
+            position = len(self.items)
+            key = item.lower()
+            self.items.append(item)
+            self._keys.append(key)
+            self._positions.setdefault(item, position)
+            added.append((key, position))
+            for size in range(1, self.MAX_GRAM + 1):
+                for start in range(len(key) - size + 1):
+                    self._grams.setdefault(key[start:start + size], set()).add(position)
+        # 每批只合并一次：两段都已有序，排序时按归并处理，避免逐条插入的平方复杂度
+        added.sort()
+        self._sorted += added
+        self._sorted.sort()
+
+    def position_of(self, item):
+        return self._positions.get(item, -1)
+
+    def _prefix_matches(self, query):
+        start = bisect_left(self._sorted, (query, -1))
+        matches = []
+        for key, position in self._sorted[start:]:
+            if not key.startswith(query):
+                break
+            matches.append(position)
+        return matches
+
+    def search(self, query):
+        """返回匹配 query 的位置列表；query 为空时返回全部"""
+        query = query.strip().lower()
+        if not query:
+            return list(range(len(self.items)))
+        prefix = sorted(self._prefix_matches(query))
+
+        size = min(len(query), self.MAX_GRAM)
+        candidates = None
+        for start in range(len(query) - size + 1):
+            postings = self._grams.get(query[start:start + size])
+            if not postings:
+                return prefix
+            candidates = set(postings) if candidates is None else candidates & postings
+        prefix_set = set(prefix)
+        substring = sorted(
+            position for position in candidates
+            if position not in prefix_set and query in self._keys[position]
+        )
+        return prefix + substring
+
+
+class VersionListModel(QAbstractListModel):
+    """
+    版本列表模型：数据可以分批追加，视图只按需 (fetchMore) 展示若干页，
+    因此即使有上千个版本，插入和过滤也不会阻塞界面。
+    """
+    PAGE_SIZE = 200
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._index = VersionIndex()
+        self._filter = ""
+        self._rows = []
+        self._row_of_position = {}
+        self._loaded = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self._loaded:
+            return None
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return self._index.items[self._rows[index.row()]]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._rows)
+
+    def fetchMore(self, parent=QModelIndex()):
+        self._expose(self.PAGE_SIZE)
+
+    def _expose(self, count):
+        count = min(count, len(self._rows) - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def total_count(self):
+        return len(self._index)
+
+    def item_at(self, row):
+        if 0 <= row < self._loaded:
+            return self._index.items[self._rows[row]]
+        return None
+
+    def row_of(self, item):
+        """返回 item 在当前过滤结果中的行号，必要时加载到该行；不在结果中返回 -1"""
+        row = self._row_of_position.get(self._index.position_of(item), -1)
+        if row >= self._loaded:
+            self._expose(row - self._loaded + 1)
+        return row
+
+    def clear(self):
+        self.beginResetModel()
+        self._index = VersionIndex()
+        self._rows = []
+        self._row_of_position = {}
+        self._loaded = 0
+        self.endResetModel()
+
+    def append_items(self, items):
+        """
+        追加一批数据，只把符合当前过滤条件的新数据加入结果。
+        有过滤条件时按 VersionIndex.search 重新排序（前缀匹配在前），与 set_filter 的结果一致；
+        已展示的行顺序变化时重置模型。
+        """
+        start = len(self._index)
+        self._index.extend(items)
+        if not self._filter.strip():
+            for position in range(start, len(self._index)):
+                self._row_of_position[position] = len(self._rows)
+                self._rows.append(position)
+        else:
+            rows = self._index.search(self._filter)
+            if rows[:self._loaded] == self._rows[:self._loaded]:
+                self._rows = rows
+                self._row_of_position = {position: row for row, position in enumerate(rows)}
+            else:
+                self.beginResetModel()
+                self._rows = rows
+                self._row_of_position = {position: row for row, position in enumerate(rows)}
+                self._loaded = min(max(self._loaded, self.PAGE_SIZE), len(rows))
+                self.endResetModel()
+        # 第一页立即展示，其余的等视图滚动时再加载
+        if self._loaded < self.PAGE_SIZE:
+            self._expose(self.PAGE_SIZE - self._loaded)
+
+    def set_filter(self, text):
+        if text == self._filter:
+            return
+        self.beginResetModel()
+        self._filter = text
+        self._rows = self._index.search(text)
+        self._row_of_position = {position: row for row, position in enumerate(self._rows)}
+        self._loaded = min(self.PAGE_SIZE, len(self._rows))
+        self.endResetModel()
+
+
+class FilterableComboBox(QComboBox):
+    """
+    支持输入过滤的版本下拉框，基于 VersionListModel。
+    在编辑框中输入时按前缀/子串过滤下拉列表；currentText() 始终返回已选中的版本，
+    而不是编辑框中尚未完成的输入。
+    """
+    FILTER_DELAY_MS = 150
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._model = VersionListModel(self)
+        self.setModel(self._model)
+        self.setEditable(True)
+        self.setInsertPolicy(QComboBox.NoInsert)
+        self.setCompleter(None)
+        self.setMaxVisibleItems(20)
+        self.lineEdit().setPlaceholderText("输入以筛选...")
+        self._selected = ""
+
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(self.FILTER_DELAY_MS)
+        self._filter_timer.timeout.connect(self._apply_filter)
+        self.lineEdit().textEdited.connect(lambda _: self._filter_timer.start())
+        self.lineEdit().editingFinished.connect(self._restore_selection_text)
+        self.currentIndexChanged.connect(self._remember_selection)
+
+    def _remember_selection(self, row):
+        item = self._model.item_at(row)
+        if item is not None:
+            self._selected = item
+
+    def currentText(self):
+        item = self._model.item_at(self.currentIndex())
+        return item if item is not None else self._selected
+
+    def count_all(self):
+        return self._model.total_count()
+
+    def clear(self):
+        self.blockSignals(True)
+        self._model.set_filter("")
+        self._model.clear()
+        self._selected = ""
+        self.lineEdit().clear()
+        self.blockSignals(False)
+
+    def append_items(self, items):
+        """分批追加数据；插入时不发出 currentIndexChanged，选中哪一项由调用者决定"""
+        self.blockSignals(True)
+        had_selection = self.currentIndex() >= 0
+        self._model.append_items(items)
+        if not had_selection:
+            self.setCurrentIndex(-1)
+            self.lineEdit().setText(self._selected)
+        self.blockSignals(False)
+
+    def addItems(self, items):
+        self.append_items(list(items))
+
+    def _apply_filter(self):
+        text = self.lineEdit().text()
+        self.blockSignals(True)
+        self._model.set_filter(text)
+        self.setCurrentIndex(self._model.row_of(self._selected) if self._selected else -1)
+        self.lineEdit().setText(text)
+        self.blockSignals(False)
+        if self._model.rowCount():
+            self.showPopup()
+
+    def _restore_selection_text(self):
+        """输入结束但没有选择新版本时，编辑框恢复显示当前选中的版本"""
+        if self.view().isVisible():
+            return
+        if self.lineEdit().text() != self._selected:
+            self.blockSignals(True)
+            self._model.set_filter("")
+            self.setCurrentIndex(self._model.row_of(self._selected) if self._selected else -1)
+            self.lineEdit().setText(self._selected)
+            self.blockSignals(False)
@@ -0,0 +1,314 @@
+import re
+import json
+import mmap
+import struct
+import zlib
+from collections import namedtuple
+
+
+# 中央目录中的一个条目。header_offset 为本地文件头在压缩包中的位置，
+# dos_time / dos_date 为条目的修改时间（两个文件的同名条目时间不同，说明内容可能不同）
+ZipEntry = namedtuple(
+    "ZipEntry",
+    ["name", "method", "crc32", "compressed_size", "file_size", "header_offset", "dos_time", "dos_date", "flags"],
+)
+
+# 中央目录的位置：cd_offset 为中央目录起始位置，cd_size 为长度，entry_count 为条目数
+Directory = namedtuple("Directory", ["cd_offset", "cd_size", "entry_count"])
+
+
+class ZipFormatError(ValueError):
+    """压缩包结构无效（找不到目录结尾记录、中央目录损坏等）"""
+
+
+_EOCD = struct.Struct("<4s4H2LH")
+_EOCD_SIGNATURE = b"PK\x05\x06"
+_ZIP64_LOCATOR = struct.Struct("<4sLQL")
+_ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+_ZIP64_EOCD = struct.Struct("<4sQ2H2L4Q")
+_ZIP64_EOCD_SIGNATURE = b"PK\x06\x06"
+_CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5H2L")
+_CENTRAL_HEADER_SIGNATURE = b"PK\x01\x02"
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+_ZIP64_EXTRA_ID = 0x0001
+_STORED = 0
+_DEFLATED = 8
+
+# 目录结尾记录 (22 字节) + 最长注释 (65535 字节) + ZIP64 定位记录 (20 字节)
+TAIL_SIZE = _EOCD.size + 0xFFFF + _ZIP64_LOCATOR.size
+
+
+def find_directory(tail, tail_offset):
+    """
+    在压缩包末尾的数据 tail（从文件的 tail_offset 处开始）中查找目录结尾记录，
+    返回 (Directory, 目录结尾记录在文件中的位置)。
+    ZIP64 压缩包的中央目录位置记录在 ZIP64 目录结尾记录中，要求它也在 tail 范围内。
+    """
+    position = len(tail)
+    while True:
+        position = tail.rfind(_EOCD_SIGNATURE, 0, position)
+        if position < 0:
+            raise ZipFormatError("找不到目录结尾记录，文件不是有效的压缩包")
+        if len(tail) - position >= _EOCD.size:
+            fields = _EOCD.unpack_from(tail, position)
+            # 注释长度必须与记录之后剩余的字节数一致，否则是数据中偶然出现的签名
+            if position + _EOCD.size + fields[7] == len(tail):
+                break
+
+    _, _, _, _, entry_count, cd_size, cd_offset, _ = fields
+    eocd_offset = tail_offset + position
+    if 0xFFFFFFFF in (cd_size, cd_offset) or entry_count == 0xFFFF:
+        locator = position - _ZIP64_LOCATOR.size
+        if locator < 0 or tail[locator:locator + 4] != _ZIP64_LOCATOR_SIGNATURE:
+            raise ZipFormatError("缺少 ZIP64 定位记录")
+        zip64_offset = _ZIP64_LOCATOR.unpack_from(tail, locator)[2] - tail_offset
+        if zip64_offset < 0 or tail[zip64_offset:zip64_offset + 4] != _ZIP64_EOCD_SIGNATURE:
+            raise ZipFormatError("ZIP64 目录结尾记录无效")
+        fields = _ZIP64_EOCD.unpack_from(tail, zip64_offset)
+        entry_count, cd_size, cd_offset = fields[7], fields[8], fields[9]
+        eocd_offset = tail_offset + zip64_offset
+
+    if cd_offset + cd_size > eocd_offset:
+        raise ZipFormatError("中央目录位置超出文件范围")
+    return Directory(cd_offset, cd_size, entry_count), eocd_offset
+
+
+def _zip64_values(extra, file_size, compressed_size, header_offset):
+    """从 ZIP64 扩展字段中取出被 0xFFFFFFFF 占位的大小和偏移"""
+    position = 0
+    while position + 4 <= len(extra):
+        header_id, size = struct.unpack_from("<2H", extra, position)
+        if header_id == _ZIP64_EXTRA_ID:
+            values = list(struct.unpack_from(f"<{size // 8}Q", extra, position + 4))
+            if file_size == 0xFFFFFFFF and values:
+                file_size = values.pop(0)
+            if compressed_size == 0xFFFFFFFF and values:
+                compressed_size = values.pop(0)
+            if header_offset == 0xFFFFFFFF and values:
+                header_offset = values.pop(0)
+            break
+        position += 4 + size
+    return file_size, compressed_size, header_offset
+
+
+def parse_central_directory(data, entry_count=None):
+    """解析中央目录的原始数据，返回 ZipEntry 列表（保持目录中的顺序）"""
+    entries = []
+    position = 0
+    while position < len(data):
+        if data[position:position + 4] != _CENTRAL_HEADER_SIGNATURE:
+            raise ZipFormatError(f"中央目录在第 {position} 字节处损坏")
+        if position + _CENTRAL_HEADER.size > len(data):
+            raise ZipFormatError("中央目录被截断")
+        (_, _, _, _, _, flags, method, dos_time, dos_date, crc32, compressed_size, file_size,
+         name_length, extra_length, comment_length, _, _, _, header_offset) = _CENTRAL_HEADER.unpack_from(data, position)
+        name_start = position + _CENTRAL_HEADER.size
+        extra_start = name_start + name_length
+        end = extra_start + extra_length + comment_length
+        if end > len(data):
+            raise ZipFormatError("中央目录被截断")
+        name = bytes(data[name_start:extra_start]).decode("utf-8" if flags & 0x800 else "cp437")
+        file_size, compressed_size, header_offset = _zip64_values(
+            bytes(data[extra_start:extra_start + extra_length]), file_size, compressed_size, header_offset
+        )
+        entries.append(ZipEntry(name, method, crc32, compressed_size, file_size, header_offset, dos_time, dos_date, flags))
+        position = end
+    if entry_count is not None and len(entries) != entry_count:
+        raise ZipFormatError(f"中央目录条目数不一致 (记录 {entry_count}, 实际 {len(entries)})")
+    return entries
+
+
+def read_central_directory(path):
+    """读取本地压缩包的中央目录，返回 (Directory, ZipEntry 列表)"""
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        size = f.tell()
+        tail_offset = max(0, size - TAIL_SIZE)
+        f.seek(tail_offset)
+        directory, _ = find_directory(f.read(), tail_offset)
+        f.seek(directory.cd_offset)
+        data = f.read(directory.cd_size)
+    return directory, parse_central_directory(data, directory.entry_count)
+
+
+def entry_spans(entries, cd_offset):
+    """
+    按本地文件头的位置排序，返回 [(条目, 起始位置, 结束位置)]。
+    每个条目占据从本地文件头到下一个条目（或中央目录）之前的全部字节，
+    包括本地文件头、压缩数据和数据描述符。
+    """
+    ordered = sorted(entries, key=lambda entry: entry.header_offset)
+    spans = []
+    for index, entry in enumerate(ordered):
+        end = ordered[index + 1].header_offset if index + 1 < len(ordered) else cd_offset
+        spans.append((entry, entry.header_offset, end))
+    return spans
+
+
+def data_offset(view, entry):
+    """返回条目的（压缩）数据在压缩包中的起始位置"""
+    position = entry.header_offset
+    if view[position:position + 4] != _LOCAL_HEADER_SIGNATURE:
+        raise ZipFormatError(f"{entry.name} 的本地文件头无效")
+    name_length, extra_length = _LOCAL_HEADER.unpack_from(view, position)[9:11]
+    return position + _LOCAL_HEADER.size + name_length + extra_length
+
+
+LOCAL_HEADER_SIZE = _LOCAL_HEADER.size
+
+
+def local_header_matches(header, entry):
+    """
+    本地文件头（header 为其固定长度部分）是否与中央目录中的条目相符：签名、压缩方式、修改时间，
+    以及 CRC32 和大小（使用数据描述符或 ZIP64 占位时本地文件头中没有这些值，不比较）。
+    """
+    if len(header) < _LOCAL_HEADER.size or header[:4] != _LOCAL_HEADER_SIGNATURE:
+        return False
+    _, _, flags, method, dos_time, dos_date, crc32, compressed_size, file_size, _, _ = _LOCAL_HEADER.unpack_from(header)
+    if (method, dos_time, dos_date) != (entry.method, entry.dos_time, entry.dos_date):
+        return False
+    if flags & 0x08:
+        return True
+    if crc32 != entry.crc32:
+        return False
+    if 0xFFFFFFFF not in (compressed_size, file_size):
+        return (compressed_size, file_size) == (entry.compressed_size, entry.file_size)
+    return True
+
+
+def read_entry(view, entry, limit=1024 * 1024):
+    """读取一个（较小的）条目的内容，只支持存储和 Deflate 压缩"""
+    if limit is not None and entry.file_size > limit:
+        raise ZipFormatError(f"{entry.name} 过大")
+    start = data_offset(view, entry)
+    data = view[start:start + entry.compressed_size]
+    if entry.method == _DEFLATED:
+        try:
+            data = zlib.decompress(data, -15)
+        except zlib.error as e:
+            raise ZipFormatError(f"{entry.name} 解压失败: {e}")
+    elif entry.method != _STORED:
+        raise ZipFormatError(f"{entry.name} 使用了不支持的压缩方式 {entry.method}")
+    if zlib.crc32(data) != entry.crc32:
+        raise ZipFormatError(f"{entry.name} 的 CRC32 校验失败")
+    return data
+
+
+# MANIFEST.MF 的主属性段与条目属性段之间的空行
+_MANIFEST_SECTION_BREAK = re.compile(rb"\r?\n\r?\n|\r\r")
+# 主属性段的长度上限；签名 jar 的条目属性段（每个文件的摘要）可能远大于此，但不会被读取
+MANIFEST_MAIN_LIMIT = 1024 * 1024
+_MANIFEST_CHUNK = 16 * 1024
+
+
+def read_manifest_main(view, entry, limit=MANIFEST_MAIN_LIMIT):
+    """
+    只读取 MANIFEST.MF 开头的主属性段：按块解压，遇到第一个空行即停止。
+    签名 jar 的清单中每个文件都有一段摘要，整个文件可能有数 MB，这里不会读取这些条目属性段。
+    只读了一部分，因此不做 CRC32 校验。
+    """
+    start = data_offset(view, entry)
+    end = start + entry.compressed_size
+    if entry.method == _DEFLATED:
+        decompressor = zlib.decompressobj(-15)
+    elif entry.method == _STORED:
+        decompressor = None
+    else:
+        raise ZipFormatError(f"{entry.name} 使用了不支持的压缩方式 {entry.method}")
+    data = b""
+    position = start
+    while position < end:
+        chunk = view[position:min(position + _MANIFEST_CHUNK, end)]
+        position += len(chunk)
+        if decompressor is not None:
+            try:
+                chunk = decompressor.decompress(chunk)
+            except zlib.error as e:
+                raise ZipFormatError(f"{entry.name} 解压失败: {e}")
+        data += chunk
+        section_break = _MANIFEST_SECTION_BREAK.search(data)
+        if section_break:
+            return data[:section_break.start()]
+        if len(data) > limit:
+            raise ZipFormatError(f"{entry.name} 的主属性段过大")
+    return data
+
+
+def parse_manifest(text):
+    """解析 META-INF/MANIFEST.MF 的主属性段（以空格开头的行是上一行的续行）"""
+    attributes = {}
+    key = None
+    for line in text.splitlines():
+        if not line:
+            # 空行之后是各个条目的属性段
+            break
+        if line.startswith(" ") and key:
+            attributes[key] += line[1:]
+        elif ":" in line:
+            key, _, value = line.partition(":")
+            attributes[key] = value.strip()
+    return attributes
+
+
+def read_directory(view):
+    """从整个压缩包的数据（bytes 或 mmap）中读取中央目录，返回 (Directory, ZipEntry 列表)"""
+    tail_offset = max(0, len(view) - TAIL_SIZE)
+    directory, _ = find_directory(view[tail_offset:], tail_offset)
+    entries = parse_central_directory(view[directory.cd_offset:directory.cd_offset + directory.cd_size],
+                                      directory.entry_count)
+    return directory, entries
+
+
+def inspect_archive(path):
+    """
+    检查下载的 jar / zip 的结构并读取其中的元数据，不解压整个文件。
+    以 mmap 只读取文件末尾、中央目录、各条目的本地文件头签名，以及 MANIFEST.MF 和 version.json 两个小条目，
+    大型 jar 也只需几毫秒。结构无效（例如下载到的是 HTML 错误页面）时抛出 ZipFormatError。
+
+    返回可以直接写入索引的字典：
+      entries            条目数
+      main_class         MANIFEST.MF 中的 Main-Class
+      implementation_version / implementation_title
+      version            version.json 中的 id 等字段（没有该文件时为 None）
+    """
+    with open(path, 'rb') as f:
+        try:
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ZipFormatError("文件为空")
+    with view:
+        directory, entries = read_directory(view)
+        by_name = {}
+        for entry in entries:
+            if entry.header_offset + _LOCAL_HEADER.size > directory.cd_offset \
+                    or view[entry.header_offset:entry.header_offset + 4] != _LOCAL_HEADER_SIGNATURE:
+                raise ZipFormatError(f"{entry.name} 的本地文件头无效")
+            by_name[entry.name] = entry
+
+        info = {
+            "entries": len(entries),
+            "main_class": None,
+            "implementation_version": None,
+            "implementation_title": None,
+            "version": None,
+        }
+        manifest_entry = by_name.get("META-INF/MANIFEST.MF")
+        if manifest_entry:
+            manifest = parse_manifest(read_manifest_main(view, manifest_entry).decode("utf-8", "replace"))
+            info["main_class"] = manifest.get("Main-Class")
+            info["implementation_version"] = manifest.get("Implementation-Version")
+            info["implementation_title"] = manifest.get("Implementation-Title")
+        version_entry = by_name.get("version.json")
+        if version_entry:
+            try:
+                version = json.loads(read_entry(view, version_entry).decode("utf-8"))
+            except ValueError:
+                version = None
+            if isinstance(version, dict):
+                # 原版服务端 jar 中的 version.json 还包含世界版本、协议版本等，只保留用于识别的字段
+                info["version"] = {
+                    key: version[key] for key in ("id", "name", "java_version", "protocol_version", "world_version")
+                    if key in version
+                }
+        return info
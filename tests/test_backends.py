@@ -0,0 +1,94 @@
+import pytest
+
+from src.downloader import BACKEND_REGISTRY, BackendCapabilities, MirrorBackend, UnifiedDownloader
+from src.jobs import JobJournal
+from src.store import MetadataCache
+
+
+class _FakeBackend(MirrorBackend):
+    CORE_VERSIONS = {}
+
+    def get_server_types(self, mc_version=None):
+        return list(self.CAPABILITIES.server_types)
+
+    def get_core_versions(self, mc_version, server_type):
+        versions = self.CORE_VERSIONS.get(server_type)
+        if isinstance(versions, Exception):
+            raise versions
+        return versions or []
+
+
+class _Primary(_FakeBackend):
+    NAME = "primary"
+    DISPLAY_NAME = "Primary"
+    CAPABILITIES = BackendCapabilities(server_types=("vanilla", "fabric"))
+    CORE_VERSIONS = {"fabric": ["0.15.0", "0.14.22"]}
+
+
+class _Secondary(_FakeBackend):
+    NAME = "secondary"
+    DISPLAY_NAME = "Secondary"
+    CAPABILITIES = BackendCapabilities(server_types=("fabric", "paper"))
+    CORE_VERSIONS = {"fabric": ["0.15.1", "0.15.0"], "paper": ["196"]}
+
+
+class _Legacy(_FakeBackend):
+    NAME = "legacy"
+    DISPLAY_NAME = "Legacy"
+    CAPABILITIES = BackendCapabilities(server_types=("fabric",), max_mc_version="1.16.5")
+    CORE_VERSIONS = {"fabric": ["0.11.0"]}
+
+
+class _Broken(_FakeBackend):
+    NAME = "broken"
+    DISPLAY_NAME = "Broken"
+    CAPABILITIES = BackendCapabilities(server_types=("fabric",))
+    CORE_VERSIONS = {"fabric": ConnectionError("502 Bad Gateway")}
+
+
+@pytest.fixture
+def downloader(tmp_path):
+    downloader = UnifiedDownloader(max_workers=4, journal=JobJournal(str(tmp_path / "jobs.db")), offline=True)
+    downloader.backends = {}
+    for backend_class in (_Primary, _Secondary, _Legacy, _Broken):
+        backend = backend_class(MetadataCache(str(tmp_path / backend_class.NAME)))
+        backend.signals = downloader.signals
+        downloader.backends[backend.NAME] = backend
+    downloader.current_source = UnifiedDownloader.ALL_SOURCES
+    messages = []
+    downloader.signals.log_message.connect(messages.append)
+    downloader.messages = messages
+    yield downloader
+    downloader.journal.close()
+
+
+def test_registry_contains_builtin_backends():
+    assert {"bmcl", "msl", "mojang", "papermc", "fabric-meta"} <= set(BACKEND_REGISTRY)
+    assert "adoptium" not in BACKEND_REGISTRY
+    assert all(issubclass(cls, MirrorBackend) and cls.NAME == name for name, cls in BACKEND_REGISTRY.items())
+
+
+def test_fan_out_merges_capable_backends(downloader):
+    assert downloader.get_core_versions("1.20.1", "fabric") == ["0.15.0", "0.14.22", "0.15.1"]
+    assert downloader.get_core_versions("1.16.5", "fabric") == ["0.15.0", "0.14.22", "0.15.1", "0.11.0"]
+    assert downloader.get_server_types("1.20.1") == ["vanilla", "fabric", "paper"]
+
+
+def test_fan_out_skips_failed_backends(downloader):
+    assert downloader.get_core_versions("1.20.1", "fabric")
+    assert any(message.startswith("Broken 查询失败") for message in downloader.messages)
+
+
+def test_download_candidates_prefer_listing_backends(downloader):
+    downloader.get_core_versions("1.20.1", "fabric")
+    candidates = downloader._download_candidates("1.20.1", "fabric", "0.15.1")
+    assert [backend.NAME for backend in candidates] == ["secondary", "primary", "broken"]
+    # 询问过却没有列出该版本的后端不参与竞速；查询失败的后端仍然参与
+    assert [backend.NAME for backend in downloader._race_candidates("1.20.1", "fabric", "0.15.1")] == \
+        ["secondary", "broken"]
+
+
+def test_single_source(downloader):
+    downloader.switch_source("secondary")
+    assert downloader.get_core_versions("1.20.1", "fabric") == ["0.15.1", "0.15.0"]
+    assert downloader.get_core_versions("1.20.1", "vanilla") == []
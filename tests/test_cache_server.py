@@ -0,0 +1,83 @@
+import os
+import threading
+
+import pytest
+import requests
+
+from src.cache_server import CacheServer
+from src.store import MetadataCache, StoreIndex
+
+
+BODY = bytes(range(256)) * 40
+PATH = "/version/1.20.1/server"
+
+
+@pytest.fixture(scope="module")
+def base_url(tmp_path_factory):
+    store_dir = str(tmp_path_factory.mktemp("server_cores"))
+    with open(os.path.join(store_dir, "server-1.20.1.jar"), "wb") as f:
+        f.write(BODY)
+    store = StoreIndex(store_dir)
+    store.record("bmcl/vanilla/1.20.1/1.20.1", f"https://bmclapi2.bangbang93.com{PATH}", "server-1.20.1.jar")
+    store.save()
+
+    metadata_cache = MetadataCache(str(tmp_path_factory.mktemp("metadata")))
+    server = CacheServer(("127.0.0.1", 0), store_dir=store_dir, metadata_cache=metadata_cache)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _get(base_url, headers=None):
+    return requests.get(base_url + PATH, headers=headers, timeout=5)
+
+
+def test_full_file(base_url):
+    response = _get(base_url)
+    assert response.status_code == 200
+    assert response.content == BODY
+    assert response.headers["Accept-Ranges"] == "bytes"
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=100-199", 100, 199),
+    ("bytes=10000-", 10000, len(BODY) - 1),
+    ("bytes=-24", len(BODY) - 24, len(BODY) - 1),
+    ("bytes=10200-99999", 10200, len(BODY) - 1),
+])
+def test_range(base_url, header, start, end):
+    response = _get(base_url, {"Range": header})
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == f"bytes {start}-{end}/{len(BODY)}"
+    assert response.content == BODY[start:end + 1]
+
+
+@pytest.mark.parametrize("header", [f"bytes={len(BODY)}-", "bytes=-0", "bytes=300-200"])
+def test_unsatisfiable_range(base_url, header):
+    response = _get(base_url, {"Range": header})
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{len(BODY)}"
+    assert response.content == b""
+
+
+def test_multipart_range_returns_full_file(base_url):
+    response = _get(base_url, {"Range": "bytes=0-1,5-6"})
+    assert response.status_code == 200
+    assert response.content == BODY
+
+
+def test_if_range(base_url):
+    etag = _get(base_url).headers["ETag"]
+    response = _get(base_url, {"Range": "bytes=100-", "If-Range": etag})
+    assert response.status_code == 206
+    assert response.content == BODY[100:]
+
+    # 文件已变化：忽略 Range，返回完整文件
+    response = _get(base_url, {"Range": "bytes=100-", "If-Range": '"0-0"'})
+    assert response.status_code == 200
+    assert response.content == BODY
+
+
+def test_not_cached(base_url):
+    assert requests.get(base_url + "/version/0.0/server", timeout=5).status_code == 404
@@ -0,0 +1,106 @@
+import hashlib
+import io
+import os
+import random
+import threading
+import zipfile
+
+import pytest
+
+from src.cache_server import CacheServer
+from src.delta import DeltaUnavailable, JarDelta
+from src.store import MetadataCache, StoreIndex
+
+
+PATH = "/version/1.20.2/server"
+DATE_TIME = (2023, 9, 20, 12, 0, 0)
+
+
+def _jar(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data, compress_type in entries:
+            archive.writestr(zipfile.ZipInfo(name, DATE_TIME), data, compress_type=compress_type)
+    return buffer.getvalue()
+
+
+def _entries(version):
+    rng = random.Random(1)
+    libraries = [(f"lib/L{i}.class", rng.randbytes(20000), zipfile.ZIP_STORED) for i in range(10)]
+    changed = [
+        ("version.json", f'{{"id": "{version}"}}'.encode(), zipfile.ZIP_DEFLATED),
+        ("net/minecraft/server/Main.class", version.encode() * 2000, zipfile.ZIP_DEFLATED),
+    ]
+    return libraries + changed
+
+
+BASE = _jar(_entries("1.20.1"))
+NEW = _jar(_entries("1.20.2"))
+
+
+@pytest.fixture
+def remote(tmp_path):
+    store_dir = str(tmp_path / "remote")
+    os.makedirs(store_dir)
+    with open(os.path.join(store_dir, "server-1.20.2.jar"), "wb") as f:
+        f.write(NEW)
+    store = StoreIndex(store_dir)
+    store.record("bmcl/vanilla/1.20.2/1.20.2", f"https://bmclapi2.bangbang93.com{PATH}", "server-1.20.2.jar")
+    store.save()
+    server = CacheServer(("127.0.0.1", 0), store_dir=store_dir, metadata_cache=MetadataCache(str(tmp_path / "metadata")))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}{PATH}"
+    server.shutdown()
+    server.server_close()
+
+
+def _base(tmp_path, data=BASE):
+    path = str(tmp_path / "server-1.20.1.jar")
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+@pytest.mark.parametrize("sha256", [hashlib.sha256(NEW).hexdigest(), None])
+def test_reassembles_new_build(tmp_path, remote, sha256):
+    dest = str(tmp_path / "server-1.20.2.jar")
+    with JarDelta() as delta:
+        downloaded = delta.update(remote, _base(tmp_path), dest, sha256)
+    with open(dest, "rb") as f:
+        assert f.read() == NEW
+    # 只下载了变化的条目和中央目录
+    assert downloaded < len(NEW) * 0.2
+    assert not os.path.exists(f"{dest}.delta")
+
+
+def test_plan_reuses_unchanged_entries(tmp_path, remote):
+    with JarDelta() as delta:
+        total, cd_offset, _, entries = delta.remote_directory(remote)
+        reuse, fetch = delta.plan(_base(tmp_path), entries, cd_offset)
+    assert total == len(NEW)
+    assert len(reuse) == 10
+    assert len(fetch) == 1
+
+
+def test_sha256_mismatch(tmp_path, remote):
+    dest = str(tmp_path / "server-1.20.2.jar")
+    with JarDelta() as delta, pytest.raises(DeltaUnavailable):
+        delta.update(remote, _base(tmp_path), dest, "00" * 32)
+    assert not os.path.exists(dest)
+    assert not os.path.exists(f"{dest}.delta")
+
+
+def test_corrupt_base_without_sha256(tmp_path, remote):
+    # 本地文件的数据损坏但中央目录不变：没有 SHA256 时也不能产生错误的文件
+    data = bytearray(BASE)
+    data[1000] ^= 0xFF
+    dest = str(tmp_path / "server-1.20.2.jar")
+    with JarDelta() as delta, pytest.raises(DeltaUnavailable):
+        delta.update(remote, _base(tmp_path, bytes(data)), dest)
+    assert not os.path.exists(dest)
+
+
+def test_too_many_changes(tmp_path, remote):
+    base = _jar([(f"other/O{i}.class", bytes(20000), zipfile.ZIP_STORED) for i in range(10)])
+    with JarDelta() as delta, pytest.raises(DeltaUnavailable):
+        delta.update(remote, _base(tmp_path, base), str(tmp_path / "server-1.20.2.jar"))
@@ -0,0 +1,168 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.downloader import BMCLAPIDownloader
+from src.jobs import JobJournal
+from src.store import MetadataCache
+
+
+BODY = bytes(range(256)) * 64
+ETAG = '"build-2"'
+URL = "https://bmclapi2.bangbang93.com/version/1.20.1/server"
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = JobJournal(str(tmp_path / "jobs.db"))
+    yield journal
+    journal.close()
+
+
+def test_resume_offsets(journal, tmp_path):
+    dest = str(tmp_path)
+    job_id = journal.add(URL, dest, "server.jar", "AB" * 32, "bmcl")
+    journal.mark_active(job_id)
+    journal.update_offset(job_id, 4096, len(BODY), ETAG)
+    journal.update_offset(job_id, 8192)
+    journal.requeue(job_id)
+
+    job = journal.get(job_id)
+    assert (job.status, job.offset, job.total_size, job.validator) == (JobJournal.QUEUED, 8192, len(BODY), ETAG)
+    assert journal.unfinished() == [job]
+
+
+def test_retry_keeps_offset(journal, tmp_path):
+    dest = str(tmp_path)
+    job_id = journal.add(URL, dest, "server.jar", "ab" * 32)
+    journal.update_offset(job_id, 4096, len(BODY), ETAG)
+    journal.finish(job_id, False, "timeout")
+
+    # 同一目标文件重新下载时沿用失败的任务，从已写入的位置继续
+    assert journal.add(URL, dest, "server.jar", "AB" * 32) == job_id
+    job = journal.get(job_id)
+    assert (job.status, job.offset, job.validator) == (JobJournal.QUEUED, 4096, ETAG)
+
+
+@pytest.mark.parametrize("url, sha256", [(URL + "?v=2", "ab" * 32), (URL, "cd" * 32)])
+def test_changed_source_resets_offset(journal, tmp_path, url, sha256):
+    dest = str(tmp_path)
+    job_id = journal.add(URL, dest, "server.jar", "ab" * 32)
+    journal.update_offset(job_id, 4096, len(BODY), ETAG)
+
+    assert journal.add(url, dest, "server.jar", sha256) == job_id
+    job = journal.get(job_id)
+    assert (job.offset, job.total_size, job.validator) == (0, None, None)
+
+
+def test_completed_jobs_start_over(journal, tmp_path):
+    dest = str(tmp_path)
+    job_id = journal.add(URL, dest, "server.jar")
+    journal.finish(job_id, True)
+    assert journal.add(URL, dest, "server.jar") != job_id
+    assert journal.completed_since(URL, dest, "server.jar", 0)
+
+
+def test_adds_validator_column_to_old_journal(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL, dest_folder TEXT NOT NULL,"
+        " file_name TEXT NOT NULL, sha256 TEXT, source TEXT, status TEXT NOT NULL, offset INTEGER NOT NULL DEFAULT 0,"
+        " total_size INTEGER, error TEXT, created_at INTEGER NOT NULL, updated_at INTEGER NOT NULL)"
+    )
+    conn.execute(
+        "INSERT INTO jobs (url, dest_folder, file_name, status, offset, created_at, updated_at)"
+        " VALUES (?, ?, ?, 'active', 100, 0, 0)",
+        (URL, str(tmp_path), "server.jar"),
+    )
+    conn.commit()
+    conn.close()
+
+    journal = JobJournal(path)
+    try:
+        [job] = journal.unfinished()
+        assert (job.offset, job.validator) == (100, None)
+    finally:
+        journal.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = []
+
+    def do_GET(self):
+        byte_range, if_range = self.headers.get("Range"), self.headers.get("If-Range")
+        self.requests.append((byte_range, if_range))
+        if byte_range and if_range in (None, ETAG):
+            start = int(byte_range[len("bytes="):-1])
+            body = BODY[start:]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(BODY) - 1}/{len(BODY)}")
+        else:
+            body = BODY
+            self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("validator, part, if_range", [
+    (ETAG, BODY[:4096], ETAG),
+    # 服务器上的文件已变化：If-Range 不匹配，返回完整文件并从头写入
+    ('"build-1"', b"\x00" * 4096, '"build-1"'),
+])
+def test_resume_sends_if_range(tmp_path, base_url, validator, part, if_range):
+    backend = BMCLAPIDownloader(MetadataCache(str(tmp_path / "metadata")))
+    dest = str(tmp_path / "server_cores")
+    os.makedirs(dest)
+    with open(os.path.join(dest, "server.bin.part"), "wb") as f:
+        f.write(part)
+    checkpoints = []
+
+    result = backend.download_file(
+        f"{base_url}/server.bin", dest, "server.bin", offset=len(part), validator=validator,
+        progress=lambda offset, total, validator: checkpoints.append((offset, total, validator)),
+    )
+
+    assert result.success
+    assert _Handler.requests[-1] == (f"bytes={len(part)}-", if_range)
+    with open(result.path, "rb") as f:
+        assert f.read() == BODY
+    assert checkpoints[-1] == (len(BODY), len(BODY), ETAG)
+
+
+def test_no_resume_without_validator_or_sha256(tmp_path, base_url):
+    backend = BMCLAPIDownloader(MetadataCache(str(tmp_path / "metadata")))
+    dest = str(tmp_path)
+    with open(os.path.join(dest, "server.bin.part"), "wb") as f:
+        f.write(b"\x00" * 4096)
+
+    result = backend.download_file(f"{base_url}/server.bin", dest, "server.bin", offset=4096)
+    assert result.success
+    assert _Handler.requests[-1] == (None, None)
+
+    with open(os.path.join(dest, "server.bin.part"), "wb") as f:
+        f.write(BODY[:4096])
+    result = backend.download_file(
+        f"{base_url}/server.bin", dest, "server.bin", hashlib.sha256(BODY).hexdigest(), offset=4096,
+    )
+    assert result.success
+    assert _Handler.requests[-1] == ("bytes=4096-", None)
@@ -0,0 +1,74 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.downloader import SingleFlight
+
+
+def test_concurrent_calls_share_one_request():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return {"versions": ["1.20.1"]}
+
+    with ThreadPoolExecutor(8) as executor:
+        futures = [executor.submit(flights.do, "versions", fetch) for _ in range(8)]
+        while flights.snapshot()["shared"] < 7:
+            time.sleep(0.01)
+        release.set()
+        results = [future.result(5) for future in futures]
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flights.snapshot() == {"requests": 1, "shared": 7, "memo_hits": 0}
+
+
+def test_different_keys_are_independent():
+    flights = SingleFlight()
+    assert flights.do("a", lambda: 1) == 1
+    assert flights.do("b", lambda: 2) == 2
+    assert flights.snapshot()["requests"] == 2
+
+
+def test_memo_and_forget():
+    flights = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return len(calls)
+
+    assert flights.do("versions", fetch) == 1
+    assert flights.do("versions", fetch) == 1
+    assert flights.snapshot()["memo_hits"] == 1
+    flights.forget("versions")
+    assert flights.do("versions", fetch) == 2
+    flights.forget()
+    assert flights.do("versions", fetch) == 3
+
+
+def test_memo_disabled():
+    flights = SingleFlight(memo_ttl=0)
+    calls = []
+    flights.do("versions", lambda: calls.append(1) or "ok")
+    flights.do("versions", lambda: calls.append(1) or "ok")
+    assert len(calls) == 2
+
+
+def test_failures_are_not_remembered():
+    flights = SingleFlight()
+
+    def fail():
+        raise ValueError("502")
+
+    with pytest.raises(ValueError):
+        flights.do("versions", fail)
+    assert flights.do("versions", lambda: None) is None
+    assert flights.do("versions", lambda: "ok") == "ok"
+    assert flights.snapshot()["requests"] == 3
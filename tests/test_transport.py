@@ -0,0 +1,71 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from src.transport import HTTP2_AVAILABLE, OfflineError, PooledTransport, Http2Transport, create_transport
+
+
+class _Handler(BaseHTTPRequestHandler):
+    BODIES = {
+        "/json": (b'{"versions": ["1.20.1"]}', "application/json"),
+        "/html": (b"<html><body>Login required</body></html>", "text/html"),
+    }
+
+    def do_GET(self):
+        body, content_type = self.BODIES[self.path]
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+TRANSPORTS = [
+    PooledTransport,
+    pytest.param(Http2Transport, marks=pytest.mark.skipif(not HTTP2_AVAILABLE, reason="需要 httpx[http2]")),
+]
+
+
+@pytest.fixture(params=TRANSPORTS)
+def transport(request):
+    transport = request.param()
+    yield transport
+    transport.close()
+
+
+def test_json_body(transport, base_url):
+    response = transport.get(f"{base_url}/json", timeout=5)
+    response.raise_for_status()
+    assert response.json() == {"versions": ["1.20.1"]}
+
+
+def test_non_json_body_raises_request_exception(transport, base_url):
+    response = transport.get(f"{base_url}/html", timeout=5)
+    response.raise_for_status()
+    with pytest.raises(requests.exceptions.RequestException):
+        response.json()
+    with pytest.raises(json.JSONDecodeError):
+        response.json()
+
+
+def test_offline_transport_refuses_requests(base_url):
+    transport = create_transport(offline=True)
+    with pytest.raises(requests.exceptions.RequestException):
+        transport.get(f"{base_url}/json", timeout=5)
+    with pytest.raises(OfflineError):
+        transport.get(f"{base_url}/json", timeout=5)
@@ -0,0 +1,91 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+from src.zipindex import (
+    TAIL_SIZE, ZipFormatError, entry_spans, find_directory, inspect_archive, local_header_matches,
+    parse_central_directory, read_central_directory,
+)
+
+
+MANIFEST = "Manifest-Version: 1.0\r\nMain-Class: net.minecraft.server.Main\r\nImplementation-Version: 1.20.1\r\n\r\n"
+VERSION = {"id": "1.20.1", "name": "1.20.1", "java_version": 17, "build_time": "2023-06-12T12:00:00+00:00"}
+
+
+def _jar(comment=b""):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("META-INF/MANIFEST.MF", MANIFEST)
+        archive.writestr("version.json", json.dumps(VERSION))
+        archive.writestr("net/minecraft/server/Main.class", b"\xca\xfe\xba\xbe" + b"\x00" * 500)
+        archive.writestr(zipfile.ZipInfo("data/stored.txt"), b"stored" * 10, compress_type=zipfile.ZIP_STORED)
+        archive.comment = comment
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("comment", [b"", b"x" * 1000])
+def test_central_directory_matches_zipfile(comment):
+    data = _jar(comment)
+    tail_offset = max(0, len(data) - TAIL_SIZE)
+    directory, _ = find_directory(data[tail_offset:], tail_offset)
+    entries = parse_central_directory(data[directory.cd_offset:directory.cd_offset + directory.cd_size],
+                                      directory.entry_count)
+
+    infos = zipfile.ZipFile(io.BytesIO(data)).infolist()
+    assert [entry.name for entry in entries] == [info.filename for info in infos]
+    for entry, info in zip(entries, infos):
+        assert (entry.method, entry.crc32, entry.compressed_size, entry.file_size, entry.header_offset) == \
+            (info.compress_type, info.CRC, info.compress_size, info.file_size, info.header_offset)
+
+
+def test_entry_spans_cover_file(tmp_path):
+    path = tmp_path / "server.jar"
+    path.write_bytes(_jar())
+    directory, entries = read_central_directory(str(path))
+    spans = entry_spans(entries, directory.cd_offset)
+    assert [entry.name for entry, _, _ in spans] == [entry.name for entry in entries]
+    assert spans[0][1] == 0
+    for (_, _, end), (_, start, _) in zip(spans, spans[1:]):
+        assert end == start
+    assert spans[-1][2] == directory.cd_offset
+
+
+def test_local_header_matches(tmp_path):
+    data = _jar()
+    path = tmp_path / "server.jar"
+    path.write_bytes(data)
+    _, entries = read_central_directory(str(path))
+    for entry in entries:
+        assert local_header_matches(data[entry.header_offset:entry.header_offset + 30], entry)
+    assert not local_header_matches(data[entries[1].header_offset:entries[1].header_offset + 30], entries[0])
+
+
+def test_inspect_archive(tmp_path):
+    path = tmp_path / "server.jar"
+    path.write_bytes(_jar())
+    info = inspect_archive(str(path))
+    assert info["entries"] == 4
+    assert info["main_class"] == "net.minecraft.server.Main"
+    assert info["implementation_version"] == "1.20.1"
+    assert info["version"] == {"id": "1.20.1", "name": "1.20.1", "java_version": 17}
+
+
+def test_inspect_archive_reads_only_main_manifest_section(tmp_path):
+    # 签名 jar 的 MANIFEST.MF 中每个条目都有一段摘要，可能远大于 1MB
+    sections = "".join(f"Name: a/C{i}.class\r\nSHA-256-Digest: {'A' * 44}\r\n\r\n" for i in range(30000))
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("META-INF/MANIFEST.MF", MANIFEST + sections)
+    path = tmp_path / "signed.jar"
+    path.write_bytes(buffer.getvalue())
+    assert inspect_archive(str(path))["main_class"] == "net.minecraft.server.Main"
+
+
+@pytest.mark.parametrize("body", [b"", b"<html><body>502 Bad Gateway</body></html>", b"PK\x05\x06" + b"\x00" * 10])
+def test_inspect_archive_rejects_invalid_files(tmp_path, body):
+    path = tmp_path / "server.jar"
+    path.write_bytes(body)
+    with pytest.raises(ZipFormatError):
+        inspect_archive(str(path))